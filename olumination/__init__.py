@@ -43,11 +43,23 @@ from .sunlit_rig import (OLuminSL_CreateRig, OLuminSL_FixRigVisibility, OLuminSL
     OLuminSL_BakeRigSensors, OLuminSL_SensorImagePack, OLuminSL_SetSelectSunColor, OLuminSL_SetRigSunColor,
     OLuminSL_SetSelectSunAngle, OLuminSL_SetRigSunAngle, OLuminSL_SelectVisibleRigs, OLuminSL_SelectAllRigs,
     OLuminSL_SelectRigRegularSensors, OLuminSL_SelectRigODiskSensors, OLuminSL_SelectRigRegularLights,
-    OLuminSL_SelectRigODiskLights, OLuminSL_PointRegularFromView, OLuminSL_PointODiskFromView, OLuminSL_PointCamAtODisk)
+    OLuminSL_SelectRigODiskLights, OLuminSL_PointRegularFromView, OLuminSL_PointODiskFromView, OLuminSL_PointCamAtODisk,
+    OLuminSL_CreateSensorAtlas, OLuminSL_UpdateVoronoiBlinds, OLuminSL_ConvertLegacyRigs, OLuminSL_MeasurePerfMode,
+    OLuminSL_CompactSunKeyframes)
+from .sunlit_template import OLuminSL_ClearRigTemplates
 from .proxy_metric import (OLuminPM_CreateSimpleHumanProxy, OLuminPM_DropVertex)
 from .light_color import OLuminLC_ColorMath
 from .light_energy import OLuminLE_MathLightEnergy
 from .world_envo import OLuminWE_MobileBackground
+from .sunlit_rig import (is_sunlit_armature, register_voronoi_blinds_handlers, unregister_voronoi_blinds_handlers,
+    update_sunlit_perf_mode, register_perf_mode_handlers, unregister_perf_mode_handlers)
+from .sunlit_bake_farm import OLuminSL_BakeFarmRigSensors
+from .sunlit_freeze import (OLuminSL_FreezeRigs, OLuminSL_ThawRigs)
+from .sunlit_drivers import (OLuminSL_BakeDrivers, OLuminSL_RestoreDrivers)
+from .sunlit_animated import OLuminSL_SetRigSunColorAnimated
+from .sunlit_frame_cache import OLuminSL_ClearEnvFrameCache
+from .sunlit_sample import (register_image_cache_handlers, unregister_image_cache_handlers)
+from .sunlit_index import (register_object_children_index_handlers, unregister_object_children_index_handlers)
 from .xyz_to_uvw import (OLuminXTU_ObjectShaderXYZMap, OLuminXTU_FixXYZCameras,
     XTU_CAMERA_NAME_XY, XTU_CAMERA_NAME_XZ, XTU_XY_MAP_NAME, XTU_XZ_MAP_NAME)
 
@@ -81,9 +93,11 @@ class OLUMIN_PT_SunlitRigCreate(bpy.types.Panel):
         box.prop(scn, "OLuminSL_SunEnergy")
         box.prop(scn, "OLuminSL_SunInitAngle")
         if scn.OLuminSL_CreateAdvancedOptions:
+            box.prop(scn, "OLuminSL_SensorBakeTarget")
             box.prop(scn, "OLuminSL_SunImageWidth")
             box.prop(scn, "OLuminSL_SunImageHeight")
             box.prop(scn, "OLuminSL_SunBlindsLen")
+            box.prop(scn, "OLuminSL_BlindsMode")
         box.prop(scn, "OLuminSL_ODiskCount")
         box.prop(scn, "OLuminSL_ODiskIncludeSun")
         box.prop(scn, "OLuminSL_ODiskSunEnergy")
@@ -93,6 +107,8 @@ class OLUMIN_PT_SunlitRigCreate(bpy.types.Panel):
             box.prop(scn, "OLuminSL_ODiskSunImageHeight")
             box.prop(scn, "OLuminSL_ODiskSunBlindsLen")
             box.prop(scn, "OLuminSL_AllowDrivers")
+            box.prop(scn, "OLuminSL_UseRigTemplates")
+            box.operator("olumin_sl.clear_rig_templates")
 
 class OLUMIN_PT_SunlitRigOther(bpy.types.Panel):
     bl_label = "Sunlit Rig Other"
@@ -107,6 +123,16 @@ class OLUMIN_PT_SunlitRigOther(bpy.types.Panel):
         box = layout.box()
         box.operator("olumin_sl.fix_rig_visibility")
         box.prop(scn, "OLuminSL_HideBlindsToo")
+        box.operator("olumin_sl.convert_legacy_rigs")
+        box.operator("olumin_sl.update_voronoi_blinds")
+        box.prop(scn, "OLuminSL_VoronoiAutoUpdate")
+        box.prop(scn, "OLuminSL_PerfMode")
+        box.prop(scn, "OLuminSL_PerfModeOnPlayback")
+        box.operator("olumin_sl.measure_perf_mode")
+        box.operator("olumin_sl.freeze_rigs")
+        box.operator("olumin_sl.thaw_rigs")
+        box.operator("olumin_sl.bake_drivers")
+        box.operator("olumin_sl.restore_drivers")
         box = layout.box()
         box.prop(scn, "OLuminSL_OtherAdvancedOptions")
         box = layout.box()
@@ -124,23 +150,54 @@ class OLUMIN_PT_SunlitRigOther(bpy.types.Panel):
         box.label(text="Rig Sensor Input")
         box.operator("olumin_sl.bake_selected_sensors")
         box.operator("olumin_sl.bake_rig_sensors")
+        box.operator("olumin_sl.bake_farm_rig_sensors")
+        box.prop(scn, "OLuminSL_BakeFarmWorkers")
         box.prop(scn, "OLuminSL_BakeSamples")
         box.prop(scn, "OLuminSL_BakeHideAllLights")
+        box.prop(scn, "OLuminSL_Incremental")
+        box.prop(scn, "OLuminSL_BakeDenoise")
+        if scn.OLuminSL_BakeDenoise != "NONE":
+            box.prop(scn, "OLuminSL_DenoiseRadius")
+            box.prop(scn, "OLuminSL_DenoiseStrength")
         box.operator("olumin_sl.image_pack")
+        box.operator("olumin_sl.create_sensor_atlas")
         box = layout.box()
         box.label(text="Rig Sun Output")
         box.operator("olumin_sl.select_sensors_to_sun_color")
         box.operator("olumin_sl.rig_sensors_to_sun_color")
+        box.prop(scn, "OLuminSL_SunColorSource")
         box.prop(scn, "OLuminSL_KeyframeColor")
-        if scn.OLuminSL_OtherAdvancedOptions:
+        box.prop(scn, "OLuminSL_KeyframeFrameRange")
+        box.operator("olumin_sl.rig_sun_color_animated")
+        box.prop(scn, "OLuminSL_AnimatedSmoothFrames")
+        box.prop(scn, "OLuminSL_UseEnvFrameCache")
+        box.operator("olumin_sl.clear_env_frame_cache")
+        if scn.OLuminSL_OtherAdvancedOptions and scn.OLuminSL_SunColorSource == "BAKE":
             box.prop(scn, "OLuminSL_SensorSampleWidthPct")
             box.prop(scn, "OLuminSL_SensorSampleHeightPct")
             box.prop(scn, "OLuminSL_ODiskSensorSampleWidthPct")
             box.prop(scn, "OLuminSL_ODiskSensorSampleHeightPct")
+            box.prop(scn, "OLuminSL_SensorSampleKernel")
+            box.prop(scn, "OLuminSL_ODiskSensorSampleKernel")
+        # color estimator is a setting of each rig, shown for the active Sunlit Rig
+        act_ob = context.active_object
+        if scn.OLuminSL_SunColorSource == "BAKE" and is_sunlit_armature(act_ob):
+            box.label(text="Active Rig Color Estimator")
+            box.prop(act_ob, "OLuminSL_ColorEstimator")
+            if act_ob.OLuminSL_ColorEstimator == "TRIMMED":
+                box.prop(act_ob, "OLuminSL_EstimatorTrimPct")
+            elif act_ob.OLuminSL_ColorEstimator == "MEDIAN_OF_MEANS":
+                box.prop(act_ob, "OLuminSL_EstimatorGroups")
+            elif act_ob.OLuminSL_ColorEstimator == "LUMA_CLAMP":
+                box.prop(act_ob, "OLuminSL_EstimatorClampPct")
         if AngularDiameterEnabled:
             box.operator("olumin_sl.select_blinds_angle_to_sun_angle")
             box.operator("olumin_sl.rig_blinds_angle_to_sun_angle")
             box.prop(scn, "OLuminSL_KeyframeAngle")
+            if scn.OLuminSL_OtherAdvancedOptions:
+                box.prop(scn, "OLuminSL_AngleBruteForce")
+        box.operator("olumin_sl.compact_sun_keyframes")
+        box.prop(scn, "OLuminSL_CompactTolerance")
         box = layout.box()
         box.label(text="Sunlit Rig Select")
         box.operator("olumin_sl.select_visible_rigs")
@@ -274,15 +331,28 @@ def menu_MT_func(self, context):
 classes = [
     OLUMIN_PT_SunlitRigCreate,
     OLuminSL_CreateRig,
+    OLuminSL_ClearRigTemplates,
     OLUMIN_PT_SunlitRigOther,
     OLuminSL_FixRigVisibility,
+    OLuminSL_ConvertLegacyRigs,
     OLuminSL_BakeSelectedSensors,
     OLuminSL_BakeRigSensors,
+    OLuminSL_BakeFarmRigSensors,
     OLuminSL_SensorImagePack,
+    OLuminSL_CreateSensorAtlas,
+    OLuminSL_UpdateVoronoiBlinds,
+    OLuminSL_MeasurePerfMode,
+    OLuminSL_FreezeRigs,
+    OLuminSL_ThawRigs,
+    OLuminSL_BakeDrivers,
+    OLuminSL_RestoreDrivers,
     OLuminSL_SetSelectSunColor,
     OLuminSL_SetRigSunColor,
+    OLuminSL_SetRigSunColorAnimated,
+    OLuminSL_ClearEnvFrameCache,
     OLuminSL_SetSelectSunAngle,
     OLuminSL_SetRigSunAngle,
+    OLuminSL_CompactSunKeyframes,
     OLuminSL_SelectVisibleRigs,
     OLuminSL_SelectAllRigs,
     OLuminSL_SelectRigRegularSensors,
@@ -312,8 +382,16 @@ def register():
     for cls in classes:
         bpy.utils.register_class(cls)
     register_props()
+    register_image_cache_handlers()
+    register_voronoi_blinds_handlers()
+    register_perf_mode_handlers()
+    register_object_children_index_handlers()
 
 def unregister():
+    unregister_object_children_index_handlers()
+    unregister_perf_mode_handlers()
+    unregister_voronoi_blinds_handlers()
+    unregister_image_cache_handlers()
     bpy.types.VIEW3D_MT_object.remove(menu_MT_func)
     for cls in classes:
         bpy.utils.unregister_class(cls)
@@ -345,8 +423,30 @@ def register_props():
         "sensor image to use for color image baking", default=16, min=0, subtype="PIXEL")
     bts.OLuminSL_SunImageHeight = bp.IntProperty(name="Sun Image Height", description="Height (in pixels) of regular " +
         "sensor image to use for color image baking", default=16, min=0, subtype="PIXEL")
+    bts.OLuminSL_SensorBakeTarget = bp.EnumProperty(
+        items = [
+            ("IMAGE", "Image", "Bake each sensor to its own packed image"),
+            ("COLOR_ATTRIBUTE", "Color Attribute", "Bake each sensor to a color attribute of a subdivided sensor " +
+                "mesh (vertex count set by sensor image width/height), no images are created or packed. Needs " +
+                "Blender 2.92 or later, HDR (float) colors need Blender 3.2 or later"),
+        ],
+        name = "Sensor Bake Target",
+        description = "Where sensor bakes are stored, for rigs created with these options",
+        default = 'IMAGE')
     bts.OLuminSL_SunBlindsLen = bp.FloatProperty(name="Sun Blinds Length", description="Length (in meters) of dark " +
         "blinds used when baking sensor images", default=15.0, min=0.0, subtype="DISTANCE")
+    bts.OLuminSL_BlindsMode = bp.EnumProperty(
+        items = [
+            ("BOOLEAN", "Boolean", "Regular sun blinds are carved from a base sphere by boolean modifiers (slow to " +
+                "evaluate with many suns)"),
+            ("VORONOI", "Voronoi", "Regular sun blinds are plain meshes, walls along the edges of each sun's " +
+                "spherical Voronoi cell, computed directly from sun directions. No boolean modifiers. Needs Blender " +
+                "2.81 or later"),
+        ],
+        name = "Blinds Mode",
+        description = "How regular sun blinds are made, for rigs created with these options. ODisk blinds are " +
+            "not changed",
+        default = 'BOOLEAN')
 
     bts.OLuminSL_ODiskCount = bp.IntProperty(name="ODisk Count", description="Number of Occluding Disks (ODisks) " +
         "to create. ODisks are used to block out the bright sun area of an HDRI, and add a specialized sun object to " +
@@ -366,6 +466,20 @@ def register_props():
         " of dark Occluding Disk (ODisk) sun blinds used when baking sensor images", default=1.0, min=0.0,
         subtype="DISTANCE")
 
+    bts.OLuminSL_UseRigTemplates = bp.BoolProperty(name="Use Rig Templates", description="Save each new set of " +
+        "Sunlit Rig create options as a template file (in the user config folder), and create rigs with the same " +
+        "options from that file, which is much faster than building the rig again", default=True)
+
+    bts.OLuminSL_VoronoiAutoUpdate = bp.BoolProperty(name="Auto Update Blinds", description="Rebuild Voronoi " +
+        "blinds of Sunlit Rigs whenever suns are moved", default=True)
+
+    bts.OLuminSL_PerfMode = bp.BoolProperty(name="Performance Mode", description="Turn off viewport modifiers of " +
+        "Sunlit Rig blinds, and disable blinds, diff cubes and base spheres in viewports, so they are not evaluated. " +
+        "They are evaluated again while angular diameters are set", default=False, update=update_sunlit_perf_mode)
+    bts.OLuminSL_PerfModeOnPlayback = bp.BoolProperty(name="Performance Mode on Playback", description="Turn on " +
+        "Performance Mode while animation is playing, and print frames per second gained to console. Needs " +
+        "animation playback handlers (newer Blender versions)", default=True)
+
     bts.OLuminSL_OtherAdvancedOptions = bp.BoolProperty(name="Advanced Options", description="Show advanced options " +
         "for Sunlig Rig Other panel", default=False)
 
@@ -377,7 +491,27 @@ def register_props():
         default=128, min=1)
     bts.OLuminSL_BakeHideAllLights = bp.BoolProperty(name="Bake Hide All Lights", description="Hide all lights (not " +
         "just lights attached to Sunlit Rig) before baking sensor images", default=True)
-
+    bts.OLuminSL_Incremental = bp.BoolProperty(name="Skip Unchanged Suns", description="Bake and Set Sun Color " +
+        "skip suns whose inputs are unchanged since their last bake / color update (pose of the sun's bones, world " +
+        "shader and images, bake samples, sensor resolution, sample settings)", default=False)
+    bts.OLuminSL_BakeFarmWorkers = bp.IntProperty(name="Parallel Bake Workers", description="Number of background " +
+        "Blender processes used by Bake Rig Sensors in Parallel. CPU threads are shared equally between workers",
+        default=4, min=1, max=64)
+
+    bts.OLuminSL_BakeDenoise = bp.EnumProperty(
+        items = [
+            ("NONE", "None", "Use baked sensor images as they are"),
+            ("BILATERAL", "Bilateral", "Edge preserving bilateral filter, applied to sensor images just after bake, " +
+                "removes bake noise / fireflies so that lower Custom Bake Samples can be used"),
+        ],
+        name = "Bake Denoise",
+        description = "Denoise sensor images after baking, before sun colors are computed from them",
+        default = 'NONE')
+    bts.OLuminSL_DenoiseRadius = bp.IntProperty(name="Denoise Radius", description="Radius (in pixels) of " +
+        "denoise filter", default=2, min=1, max=8, subtype="PIXEL")
+    bts.OLuminSL_DenoiseStrength = bp.FloatProperty(name="Denoise Strength", description="Brightness difference " +
+        "(in log luminance) between pixels that are still blended by denoise filter. Higher values remove more " +
+        "noise, and blur more edges", default=0.5, min=0.01)
     bts.OLuminSL_KeyframeColor = bp.BoolProperty(name="Keyframe Color", description="Add keyframe when setting " +
         "sun color, to enable animation of suns. E.g. Add keyframes when major changes in environment lighting " +
         "occur, such as lightning strikes, day to night changes, etc", default=False)
@@ -385,6 +519,32 @@ def register_props():
         "sun angular diameter, to enable animation of suns. E.g. Add keyframes when a bright light gets " +
         "larger/smaller in the environment's lighting, like a sun going supernova, etc",
         default=False)
+    bts.OLuminSL_KeyframeFrameRange = bp.BoolProperty(name="Keyframe Frame Range", description="Set Rig Sun " +
+        "Color (Direct source only) and Set Rig Angular Diameter set suns at every frame of the scene frame range, " +
+        "and keyframe all frames at once. Keyframes outside the frame range are kept. For Bake source, use Set Rig " +
+        "Sun Color Animated", default=False)
+    bts.OLuminSL_AnimatedSmoothFrames = bp.IntProperty(name="Animated Smooth Frames", description="Set Rig Sun " +
+        "Color Animated averages each sun color with the colors of this many frames before and after it, to hide " +
+        "bake noise. 0 is no smoothing", default=0, min=0, max=100)
+    bts.OLuminSL_UseEnvFrameCache = bp.BoolProperty(name="Use Animated Color Cache", description="Set Rig Sun " +
+        "Color Animated caches sun colors of each environment image frame on disk, and uses cached colors of suns " +
+        "that are unchanged instead of sampling them again. Packed and generated images are not cached", default=True)
+    bts.OLuminSL_CompactTolerance = bp.FloatProperty(name="Compact Tolerance", description="Max difference " +
+        "of sun color / angular diameter (radians) between compacted and original keyframes, when removing " +
+        "keyframes with Compact Sun Keyframes", default=0.001, min=0.0, precision=4, step=0.01)
+    bts.OLuminSL_AngleBruteForce = bp.BoolProperty(name="Brute Force Angle", description="Compare every pair " +
+        "of blinds vertexes when setting angular diameter (slow, O(n^2)). Use to verify the default spherical " +
+        "convex hull solver", default=False)
+    bts.OLuminSL_SunColorSource = bp.EnumProperty(
+        items = [
+            ("BAKE", "Sensor Bake", "Sample sun colors from baked sensor images (use Bake Rig Sensors first)"),
+            ("DIRECT", "Direct", "Sample sun colors directly from the world's Environment Texture image, inside " +
+                "each sun's angular diameter cone, no sensor bake needed. Mapping nodes in the world shader are " +
+                "ignored"),
+        ],
+        name = "Color Source",
+        description = "Source of the pixels used to compute sun colors",
+        default = 'BAKE')
     bts.OLuminSL_SensorSampleWidthPct = bp.FloatProperty(name="Width Sample Pct", description="Regular sun sensor " +
         "image width (in percent of image width) to sample when computing regular sun object's color",
         subtype="PERCENTAGE", default=0.75, min=0.0, max=1.0)
@@ -398,6 +558,44 @@ def register_props():
         description="Occluding Disk sun sensor image height (in percent of image height) to sample when computing " +
         "ODisk sun object's color", subtype="PERCENTAGE", default=0.5, min=0.0, max=1.0)
 
+    sample_kernel_items = [
+        ("BOX", "Box", "All pixels in sample rectangle have equal weight"),
+        ("DISK", "Disk", "Equal weight for pixels inside the disk that fits in the sample rectangle, pixels in the " +
+            "corners are ignored"),
+        ("GAUSSIAN", "Gaussian", "Gaussian falloff from center of sample disk"),
+        ("COSINE", "Cosine", "Cosine weighted falloff from center of sample disk"),
+    ]
+    bts.OLuminSL_SensorSampleKernel = bp.EnumProperty(items=sample_kernel_items, name="Sample Kernel",
+        description="Weighting of regular sun sensor image pixels when computing regular sun object's color",
+        default='BOX')
+    bts.OLuminSL_ODiskSensorSampleKernel = bp.EnumProperty(items=sample_kernel_items, name="ODisk Sample Kernel",
+        description="Weighting of Occluding Disk sun sensor image pixels when computing ODisk sun object's color",
+        default='BOX')
+
+    bto = bpy.types.Object
+    bto.OLuminSL_ColorEstimator = bp.EnumProperty(
+        items = [
+            ("MEAN", "Mean", "Plain (weighted) average of sensor pixels"),
+            ("TRIMMED", "Trimmed Mean", "Average after dropping the darkest and brightest sensor pixels, removes " +
+                "fireflies from low sample bakes"),
+            ("MEDIAN_OF_MEANS", "Median of Means", "Split sensor pixels into groups, and use the group average with " +
+                "median brightness, removes fireflies from low sample bakes"),
+            ("LUMA_CLAMP", "Luminance Clamp", "Scale down sensor pixels brighter than a luminance percentile before " +
+                "averaging, removes fireflies from low sample bakes"),
+        ],
+        name = "Color Estimator",
+        description = "Sunlit Rig setting: method used to compute sun color from baked sensor pixels. Robust methods " +
+            "give stable sun colors from low Custom Bake Samples bakes",
+        default = 'MEAN')
+    bto.OLuminSL_EstimatorTrimPct = bp.FloatProperty(name="Trim Pct", description="Sunlit Rig setting: fraction of " +
+        "sensor pixels dropped from each end (darkest and brightest) before averaging", subtype="PERCENTAGE",
+        default=0.1, min=0.0, max=0.49)
+    bto.OLuminSL_EstimatorGroups = bp.IntProperty(name="Groups", description="Sunlit Rig setting: number of groups " +
+        "of sensor pixels for Median of Means", default=8, min=1)
+    bto.OLuminSL_EstimatorClampPct = bp.FloatProperty(name="Clamp Percentile", description="Sunlit Rig setting: " +
+        "sensor pixels brighter than this luminance percentile are scaled down to it", subtype="PERCENTAGE",
+        default=0.99, min=0.0, max=1.0)
+
     bts.OLuminSL_ReverseLightPointDirection = bp.BoolProperty(name="Reverse Light Point Direction",
         description="Reverse the regular 'point at' direction, so light points away from view/camera center",
         default=False)
@@ -18,6 +18,7 @@
 
 import bpy
 import bmesh
+import numpy as np
 
 COLOR_TEXTURE_TYPES = [
     ("Unconnected", "Unconnected", "Color, Shader, Material Output nodes will not be generated", 1),
@@ -38,8 +39,22 @@ COLOR_TEXTURE_TYPES = [
 def matrix_vector_mult(m, v):
     return m * v
 
-def get_mesh_post_modifiers(context, obj):
-    return obj.to_mesh(context.scene, True, 'PREVIEW')
+# Blender 2.79 has no depsgraph API, meshes after modifiers are made from the scene
+def get_evaluated_depsgraph(context):
+    return context.scene
+
+# Blender 2.79 evaluates animation and drivers on the original data
+def get_evaluated_id(depsgraph, id_data):
+    return id_data
+
+def get_mesh_post_modifiers_coords(depsgraph, obj):
+    obj_mod_mesh = obj.to_mesh(depsgraph, True, 'PREVIEW')
+    try:
+        v_co = np.empty(len(obj_mod_mesh.vertices) * 3, dtype=np.float64)
+        obj_mod_mesh.vertices.foreach_get("co", v_co)
+    finally:
+        bpy.data.meshes.remove(obj_mod_mesh)
+    return v_co
 
 def create_object_cube(context, cube_name, cube_size, cube_loc):
     bpy.ops.mesh.primitive_cube_add(radius=cube_size, location=cube_loc)
@@ -81,6 +96,13 @@ def set_object_list_hide_view(obj_list, hide_state):
     for obj in obj_list:
         set_object_hide_view(obj, hide_state)
 
+# Blender 2.79 has no "disable in viewports", so object is hidden
+def set_object_disable_view(obj, disable_state):
+    obj.hide = disable_state
+
+def get_object_disable_view(obj):
+    return obj.hide
+
 def set_object_display_type(obj, display_type):
     obj.draw_type = display_type
 
@@ -101,9 +123,23 @@ def deselect_objects(ob_list):
     for ob in ob_list:
         deselect_object(ob)
 
+def new_light_data(light_name, light_type):
+    return bpy.data.lamps.new(light_name, type=light_type)
+
+def link_object_list(context, obj_list):
+    for ob in obj_list:
+        context.scene.objects.link(ob)
+
 def scene_link_object(context, ob):
     context.scene.objects.link(ob)
 
+# Blender 2.79 has no collections, so objects are linked to scene and hidden
+def link_hidden_object_list(context, collection_name, obj_list):
+    for ob in obj_list:
+        context.scene.objects.link(ob)
+        ob.hide = True
+        ob.hide_render = True
+
 def set_object_hide(obj, hide_val):
     obj.hide = hide_val
 
@@ -150,8 +186,27 @@ def image_pack_image(img):
 def create_object_uv_map(obj, xy_map_name):
     return obj.data.uv_textures.new(name=xy_map_name)
 
+def create_mesh_uv_map(mesh, xy_map_name):
+    return mesh.uv_textures.new(name=xy_map_name)
+
 def get_object_uv_map(obj, base_map_name):
     return obj.data.uv_textures.get(base_map_name)
 
 def bmesh_delete_verts(bm, bm_verts):
     bmesh.ops.delete(bm, geom=bm_verts, context=1)
+
+def create_object_color_attribute(obj, attr_name):
+    print("Bake to color attributes not supported in Blender 2.79")
+    return None
+
+def get_object_color_attribute(obj, attr_name):
+    return None
+
+def get_color_attribute_domain(attr):
+    return "CORNER"
+
+def bake_selected_to_color_attributes(bake_type):
+    print("Bake to color attributes not supported in Blender 2.79")
+
+def set_mesh_pydata(mesh, verts, faces):
+    print("Voronoi blinds not supported in Blender 2.79")
@@ -18,6 +18,7 @@
 
 import bpy
 import bmesh
+import numpy as np
 
 COLOR_TEXTURE_TYPES = [
     ("Unconnected", "Unconnected", "Color, Shader, Material Output nodes will not be generated", 1),
@@ -42,10 +43,27 @@ COLOR_TEXTURE_TYPES = [
 def matrix_vector_mult(m, v):
     return m @ v
 
-def get_mesh_post_modifiers(context, obj):
-    depsgraph = context.evaluated_depsgraph_get()
+# depsgraph to evaluate once, and then read many objects' meshes after modifiers
+def get_evaluated_depsgraph(context):
+    return context.evaluated_depsgraph_get()
+
+# get evaluated copy of ID, with animated and driven values of the current frame
+def get_evaluated_id(depsgraph, id_data):
+    return id_data.evaluated_get(depsgraph)
+
+# get flat array of vertex coordinates (object space) of object's mesh after modifiers, read from the evaluated
+# object's temporary mesh, so no mesh datablock is added to blend data
+def get_mesh_post_modifiers_coords(depsgraph, obj):
     object_eval = obj.evaluated_get(depsgraph)
-    return bpy.data.meshes.new_from_object(object_eval)
+    eval_mesh = object_eval.to_mesh()
+    try:
+        if eval_mesh is None:
+            return np.empty(0, dtype=np.float64)
+        v_co = np.empty(len(eval_mesh.vertices) * 3, dtype=np.float64)
+        eval_mesh.vertices.foreach_get("co", v_co)
+    finally:
+        object_eval.to_mesh_clear()
+    return v_co
 
 def create_object_cube(context, cube_name, cube_size, cube_loc):
     bpy.ops.mesh.primitive_cube_add(size=cube_size*2, location=cube_loc)
@@ -88,6 +106,13 @@ def set_object_list_hide_view(obj_list, hide_state):
     for obj in obj_list:
         set_object_hide_view(obj, hide_state)
 
+# "disable in viewports", object is not evaluated by viewport depsgraph
+def set_object_disable_view(obj, disable_state):
+    obj.hide_viewport = disable_state
+
+def get_object_disable_view(obj):
+    return obj.hide_viewport
+
 def set_object_display_type(obj, display_type):
     obj.display_type = display_type
 
@@ -108,9 +133,33 @@ def deselect_objects(ob_list):
     for ob in ob_list:
         deselect_object(ob)
 
+def new_light_data(light_name, light_type):
+    return bpy.data.lights.new(light_name, type=light_type)
+
+# link objects to active collection (like operators that add objects), all objects then sync to view layer together
+def link_object_list(context, obj_list):
+    collection = context.collection
+    if collection is None:
+        collection = context.scene.collection
+    for ob in obj_list:
+        collection.objects.link(ob)
+
 def scene_link_object(context, ob):
     context.scene.collection.objects.link(ob)
 
+# Link objects to collection that is hidden in viewports and renders, e.g. objects only used as bone custom shapes.
+# Collection is created if needed, and linked to the scene so that it is shown in the Outliner.
+def link_hidden_object_list(context, collection_name, obj_list):
+    collection = bpy.data.collections.get(collection_name)
+    if collection is None:
+        collection = bpy.data.collections.new(collection_name)
+        collection.hide_viewport = True
+        collection.hide_render = True
+    if context.scene.collection.children.get(collection_name) is None:
+        context.scene.collection.children.link(collection)
+    for ob in obj_list:
+        collection.objects.link(ob)
+
 def get_all_objects_list(context):
     a_list = []
     for c in range(len(bpy.data.collections)):
@@ -155,8 +204,43 @@ def image_pack_image(img):
 def create_object_uv_map(obj, xy_map_name):
     return obj.data.uv_layers.new(name=xy_map_name)
 
+def create_mesh_uv_map(mesh, xy_map_name):
+    return mesh.uv_layers.new(name=xy_map_name)
+
 def get_object_uv_map(obj, base_map_name):
     return obj.data.uv_layers.get(base_map_name)
 
 def bmesh_delete_verts(bm, bm_verts):
     bmesh.ops.delete(bm, geom=bm_verts, context="VERTS")
+
+# create float color attribute on object's mesh, on vertexes, and make it the active color (bake target)
+def create_object_color_attribute(obj, attr_name):
+    mesh = obj.data
+    if hasattr(mesh, "color_attributes"):
+        attr = mesh.color_attributes.new(name=attr_name, type="FLOAT_COLOR", domain="POINT")
+        mesh.color_attributes.active_color = attr
+        return attr
+    # before Blender 3.2 only byte color (face corner) vertex colors are available
+    attr = mesh.vertex_colors.new(name=attr_name)
+    mesh.vertex_colors.active = attr
+    return attr
+
+def get_object_color_attribute(obj, attr_name):
+    if obj.type != "MESH":
+        return None
+    mesh = obj.data
+    if hasattr(mesh, "color_attributes"):
+        return mesh.color_attributes.get(attr_name)
+    return mesh.vertex_colors.get(attr_name)
+
+def get_color_attribute_domain(attr):
+    return getattr(attr, "domain", "CORNER")
+
+def bake_selected_to_color_attributes(bake_type):
+    bpy.ops.object.bake(type=bake_type, target="VERTEX_COLORS")
+
+# replace all geometry of mesh with given vertexes and faces
+def set_mesh_pydata(mesh, verts, faces):
+    mesh.clear_geometry()
+    mesh.from_pydata(verts, [], faces)
+    mesh.update()
@@ -0,0 +1,99 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Max angle between directions, e.g. the angular diameter of a sun's blinds as seen from the rig center.
+# Directions that fit in an open hemisphere are projected onto the tangent plane at their mean direction (gnomonic
+# projection, great circles become straight lines), so the spherical convex hull is a 2D convex hull, found in
+# O(n log n). If the widest hull angle is at most 90 degrees then the widest pair of all directions is a pair of hull
+# vertices (the set of directions within 90 degrees of a direction is convex), so only hull vertices are compared.
+# Otherwise all pairs of directions that could be wider than the widest hull pair are compared, vectorized in chunks
+# (all pairs if directions do not fit in a hemisphere).
+
+import math
+import numpy as np
+
+# directions closer than this to the edge of the hemisphere (as a cosine) are not projected
+GNOMONIC_MIN_COS = 1e-6
+# number of rows of pair dot products computed at once by brute force
+PAIR_CHUNK_SIZE = 1024
+
+# 2D convex hull by monotone chain, returns indexes of hull vertices (collinear points are kept out)
+def get_convex_hull_2d(points):
+    order = np.lexsort((points[:, 1], points[:, 0])).tolist()
+    if len(order) < 3:
+        return np.array(order, dtype=np.int64)
+    # plain Python floats are much faster than NumPy scalars in the chain loops
+    pts = points.tolist()
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+    lower = []
+    for i in order:
+        while len(lower) >= 2 and cross(pts[lower[-2]], pts[lower[-1]], pts[i]) <= 0:
+            lower.pop()
+        lower.append(i)
+    upper = []
+    for i in reversed(order):
+        while len(upper) >= 2 and cross(pts[upper[-2]], pts[upper[-1]], pts[i]) <= 0:
+            upper.pop()
+        upper.append(i)
+    return np.array(lower[:-1] + upper[:-1], dtype=np.int64)
+
+# lowest dot product between any two directions (unit vectors, shaped (N, 3)), all pairs compared
+def get_lowest_pair_dot(dirs):
+    lowest_dot = 1.0
+    for start in range(0, len(dirs), PAIR_CHUNK_SIZE):
+        lowest_dot = min(lowest_dot, float((dirs[start:start+PAIR_CHUNK_SIZE] @ dirs.T).min()))
+    return lowest_dot
+
+# get indexes of directions on the spherical convex hull, and the mean direction, or (None, None) if directions do not
+# fit in an open hemisphere
+def get_spherical_hull_indexes(dirs):
+    mean_dir = dirs.mean(axis=0)
+    mean_len = np.linalg.norm(mean_dir)
+    if mean_len < GNOMONIC_MIN_COS:
+        return None, None
+    mean_dir = mean_dir / mean_len
+    cos_to_mean = dirs @ mean_dir
+    if cos_to_mean.min() <= GNOMONIC_MIN_COS:
+        return None, None
+    # orthonormal basis of tangent plane at mean direction
+    helper = np.array((1.0, 0.0, 0.0)) if abs(mean_dir[0]) < 0.9 else np.array((0.0, 1.0, 0.0))
+    axis_u = np.cross(mean_dir, helper)
+    axis_u /= np.linalg.norm(axis_u)
+    axis_v = np.cross(mean_dir, axis_u)
+    points = np.stack((dirs @ axis_u, dirs @ axis_v), axis=1) / cos_to_mean[:, None]
+    return get_convex_hull_2d(points), mean_dir
+
+# max angle (radians) between any two directions, directions shaped (N, 3) and need not be normalized
+def get_max_pairwise_angle(dirs):
+    dirs = np.asarray(dirs, dtype=np.float64)
+    if len(dirs) < 2:
+        return 0.0
+    dirs = dirs / np.linalg.norm(dirs, axis=1)[:, None]
+    hull_indexes, mean_dir = get_spherical_hull_indexes(dirs)
+    if hull_indexes is not None:
+        hull_dot = get_lowest_pair_dot(dirs[hull_indexes])
+        if hull_dot >= 0:
+            return math.acos(min(1.0, hull_dot))
+        # Widest hull pair is a lower bound. Angle between two directions is at most the sum of their angles to the
+        # mean direction, so directions too close to the mean cannot be part of a wider pair.
+        angle_to_mean = np.arccos(np.clip(dirs @ mean_dir, -1.0, 1.0))
+        min_angle = math.acos(max(-1.0, hull_dot)) - angle_to_mean.max()
+        dirs = dirs[angle_to_mean >= min_angle - 1e-9]
+        return math.acos(max(-1.0, min(1.0, hull_dot, get_lowest_pair_dot(dirs))))
+    return math.acos(max(-1.0, min(1.0, get_lowest_pair_dot(dirs))))
@@ -0,0 +1,147 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Bulk F-curve keyframe writing: all keyframes of an F-curve are written at once (keyframe_points.add, then
+# foreach_set of co and interpolation), instead of one keyframe_insert per key, which updates the whole F-curve every
+# time. Also compaction of F-curves keyed at every frame, by removing keys that the remaining keys give within a
+# tolerance, and smoothing of values sampled at every frame.
+
+import numpy as np
+import bpy
+
+# Keyframe.interpolation enum values, as integers for foreach_set
+FCURVE_INTERPOLATION_VALUES = { "CONSTANT": 0, "LINEAR": 1, "BEZIER": 2 }
+
+# get action of ID (e.g. object, light data), action is created if ID has none
+def get_id_action(id_data, action_name):
+    if id_data.animation_data is None:
+        id_data.animation_data_create()
+    if id_data.animation_data.action is None:
+        id_data.animation_data.action = bpy.data.actions.new(name=action_name)
+    return id_data.animation_data.action
+
+# get keyframes of F-curve as arrays: co (num keys, 2) of frame and value, and interpolation (as integers)
+def get_fcurve_keyframes(fcurve):
+    num_keys = len(fcurve.keyframe_points)
+    co = np.empty(num_keys * 2, dtype=np.float32)
+    interp = np.empty(num_keys, dtype=np.int32)
+    fcurve.keyframe_points.foreach_get("co", co)
+    fcurve.keyframe_points.foreach_get("interpolation", interp)
+    return co.reshape((-1, 2)), interp
+
+# Write keyframes of F-curve (data_path, index) of action, replacing any keyframes it had. frames and values are
+# arrays (or lists) of the same length. If keep_outside_range is True then keyframes the F-curve had before the first
+# frame or after the last frame are kept. Returns the F-curve.
+def set_fcurve_keyframes(action, data_path, index, frames, values, interpolation="LINEAR", group_name="",
+        keep_outside_range=False):
+    co = np.empty((len(frames), 2), dtype=np.float32)
+    co[:, 0] = frames
+    co[:, 1] = values
+    interp = np.full(len(frames), FCURVE_INTERPOLATION_VALUES[interpolation], dtype=np.int32)
+    fcurve = action.fcurves.find(data_path, index=index)
+    if fcurve is not None:
+        if group_name == "" and fcurve.group is not None:
+            group_name = fcurve.group.name
+        if keep_outside_range and len(frames) > 0:
+            old_co, old_interp = get_fcurve_keyframes(fcurve)
+            outside = (old_co[:, 0] < co[:, 0].min()) | (old_co[:, 0] > co[:, 0].max())
+            co = np.concatenate((old_co[outside], co))
+            interp = np.concatenate((old_interp[outside], interp))
+        action.fcurves.remove(fcurve)
+    fcurve = action.fcurves.new(data_path, index=index, action_group=group_name)
+    num_keys = len(co)
+    if num_keys < 1:
+        return fcurve
+    fcurve.keyframe_points.add(num_keys)
+    fcurve.keyframe_points.foreach_set("co", co.ravel())
+    fcurve.keyframe_points.foreach_set("interpolation", interp)
+    # sort keys and calculate handles
+    fcurve.update()
+    return fcurve
+
+# Write keyframes of all array indexes of data_path (e.g. "location", "color"), values shaped (num frames, array
+# length). Returns list of F-curves.
+def set_fcurve_array_keyframes(action, data_path, frames, values, interpolation="LINEAR", group_name="",
+        keep_outside_range=False):
+    values = np.asarray(values, dtype=np.float32)
+    return [ set_fcurve_keyframes(action, data_path, i, frames, values[:, i], interpolation, group_name,
+        keep_outside_range) for i in range(values.shape[1]) ]
+
+# Douglas-Peucker simplification of keyframes co (num keys, 2), for linear interpolation: returns boolean mask of keys
+# to keep, so that every removed key is within tolerance (in value) of the line between the kept keys before and
+# after it. First and last keys are always kept. Errors of all keys in a span are computed together with numpy.
+def get_simplified_keyframes_mask(co, tolerance):
+    num_keys = len(co)
+    keep = np.zeros(num_keys, dtype=bool)
+    if num_keys < 1:
+        return keep
+    keep[0] = True
+    keep[-1] = True
+    spans = [ (0, num_keys - 1) ]
+    while len(spans) > 0:
+        first, last = spans.pop()
+        if last - first < 2:
+            continue
+        span_frames = co[first+1:last, 0]
+        span_values = co[first+1:last, 1]
+        frame_delta = co[last, 0] - co[first, 0]
+        if frame_delta > 0:
+            t = (span_frames - co[first, 0]) / frame_delta
+        else:
+            t = np.zeros(len(span_frames))
+        errors = np.abs(span_values - (co[first, 1] + (co[last, 1] - co[first, 1]) * t))
+        k = int(np.argmax(errors))
+        if errors[k] > tolerance:
+            mid = first + 1 + k
+            keep[mid] = True
+            spans.append((first, mid))
+            spans.append((mid, last))
+    return keep
+
+# Remove keyframes of F-curve that linear interpolation between the remaining keyframes gives within tolerance, e.g.
+# keys of every frame on a curve that is mostly constant or linear. Kept keyframes are made linear, so the compacted
+# curve matches the original keys within tolerance. F-curves with modifiers, or with keyframes that are not linear or
+# Bezier (e.g. constant), are not changed. Returns number of keyframes removed.
+def compact_fcurve_keyframes(action, fcurve, tolerance):
+    if len(fcurve.keyframe_points) < 3 or len(fcurve.modifiers) > 0:
+        return 0
+    co, interp = get_fcurve_keyframes(fcurve)
+    if not np.all(np.isin(interp[:-1], (FCURVE_INTERPOLATION_VALUES["LINEAR"], FCURVE_INTERPOLATION_VALUES["BEZIER"]))):
+        return 0
+    keep = get_simplified_keyframes_mask(co.astype(np.float64), tolerance)
+    num_removed = len(co) - int(np.count_nonzero(keep))
+    if num_removed < 1:
+        return 0
+    extrapolation = fcurve.extrapolation
+    fcurve = set_fcurve_keyframes(action, fcurve.data_path, fcurve.array_index, co[keep, 0], co[keep, 1])
+    fcurve.extrapolation = extrapolation
+    return num_removed
+
+# Smooth values over time with a centered moving average of 2 * radius + 1 frames, values shaped (num frames, ...).
+# Near the first and last frames the window only covers the frames that exist.
+def get_smoothed_frame_values(values, radius):
+    values = np.asarray(values, dtype=np.float64)
+    num_frames = values.shape[0]
+    if radius < 1 or num_frames < 2:
+        return values
+    cumsum = np.concatenate((np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)))
+    frame_nums = np.arange(num_frames)
+    low = np.maximum(frame_nums - radius, 0)
+    high = np.minimum(frame_nums + radius + 1, num_frames)
+    counts = (high - low).reshape((-1,) + (1,) * (values.ndim - 1))
+    return (cumsum[high] - cumsum[low]) / counts
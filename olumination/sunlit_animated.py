@@ -0,0 +1,194 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Animated environment textures (image sequences, movies, e.g. time-lapse skies): sun colors of Sunlit rigs are set at
+# every frame of the scene frame range, sampling each frame's environment once, with Direct or Bake sun color source.
+# Colors of each image frame are kept in an on-disk cache (see sunlit_frame_cache.py), by sun key, so running again
+# after a small rig change only samples the suns that changed. Colors are optionally smoothed over time, to hide bake
+# noise, and keyframed with one F-curve write per color channel.
+
+import numpy as np
+import bpy
+
+from .sunlit_rig import (is_sunlit_armature, get_sunlit_suns_from_armature, get_sunlit_suns_from_selected,
+    get_sunlit_sensor_for_light, get_sunlit_direct_sample_cones, get_sunlit_color_estimator, is_sunlit_odisk,
+    get_sunlit_sensor_bake_fingerprint, get_sunlit_bake_denoise, bake_sunlit_sensors, set_sun_color_data)
+from .sunlit_direct import (DIRECT_MAX_ENV_WIDTH, get_world_environment_node, get_env_sample_buffer,
+    get_env_cone_mean_color)
+from .sunlit_frame_cache import (get_env_frame_source, load_env_frame_cache, write_env_frame_cache)
+from .sunlit_sample import invalidate_image_cache
+from .sunlit_anim import (get_id_action, set_fcurve_array_keyframes, get_smoothed_frame_values)
+from .sunlit_fingerprint import (get_fingerprint, get_plain_value, get_world_values)
+
+if bpy.app.version < (2,80,0):
+    from .imp_v27 import *
+else:
+    from .imp_v28 import *
+
+# get sun keys of Direct source, by light name, from the environment cones the suns sample
+def get_direct_sun_keys(sample_cones):
+    sun_keys = {}
+    for light, direction, half_angle, exclude_cones in sample_cones:
+        sun_keys[light.name] = get_fingerprint(("DIRECT", DIRECT_MAX_ENV_WIDTH, get_plain_value(direction),
+            get_plain_value(half_angle), get_plain_value(exclude_cones)))
+    return sun_keys
+
+# Get sun keys of Bake source, by light name, from the bake inputs of the suns' sensors (see
+# get_sunlit_sensor_bake_fingerprint) and the sample settings.
+def get_bake_sun_keys(scn, sun_lights):
+    world_values = get_world_values(scn.world)
+    denoise = get_sunlit_bake_denoise(scn)
+    sample_settings = (scn.OLuminSL_SensorSampleWidthPct, scn.OLuminSL_SensorSampleHeightPct,
+        scn.OLuminSL_ODiskSensorSampleWidthPct, scn.OLuminSL_ODiskSensorSampleHeightPct, scn.OLuminSL_SensorSampleKernel,
+        scn.OLuminSL_ODiskSensorSampleKernel)
+    sun_keys = {}
+    blinds_values_cache = {}
+    for light in sun_lights:
+        sensor = get_sunlit_sensor_for_light(light)
+        if sensor is None:
+            continue
+        sun_keys[light.name] = get_fingerprint(("BAKE", get_sunlit_sensor_bake_fingerprint(sensor, world_values,
+            scn.OLuminSL_BakeSamples, denoise, blinds_values_cache), get_plain_value(sample_settings),
+            get_plain_value(get_sunlit_color_estimator(light.parent)), is_sunlit_odisk(light)))
+    return sun_keys
+
+# Sample colors of suns from the environment image of the current frame, directly. Image sequence frames are loaded
+# from their files. Returns dict of light name -> color.
+def sample_direct_frame_colors(env_node, frame_filepath, sample_cones):
+    img = env_node.image
+    frame_img = None
+    if img.source == "SEQUENCE" and frame_filepath is not None:
+        frame_img = bpy.data.images.load(frame_filepath, check_existing=False)
+        img = frame_img
+    try:
+        env_buf = get_env_sample_buffer(img)
+        sun_colors = {}
+        for light, direction, half_angle, exclude_cones in sample_cones:
+            sun_colors[light.name] = get_env_cone_mean_color(env_buf, direction, half_angle, exclude_cones)
+    finally:
+        if frame_img is not None:
+            invalidate_image_cache(frame_img.name)
+            bpy.data.images.remove(frame_img)
+    return sun_colors
+
+# Bake sensors of suns at the current frame, and sample the suns' colors. Returns dict of light name -> color.
+def sample_bake_frame_colors(context, sun_lights):
+    scn = context.scene
+    sensors = []
+    for light in sun_lights:
+        sensor = get_sunlit_sensor_for_light(light)
+        if sensor is not None and sensor not in sensors:
+            sensors.append(sensor)
+    lights_to_hide = get_all_lights() if scn.OLuminSL_BakeHideAllLights else get_sunlit_suns_from_selected(context)
+    # environment changed since the last bake, so every sensor is baked
+    bake_sunlit_sensors(context, sensors, scn.OLuminSL_BakeSamples, lights_to_hide, get_sunlit_bake_denoise(scn), False)
+    set_sun_color_data(False, scn.OLuminSL_SensorSampleWidthPct, scn.OLuminSL_SensorSampleHeightPct,
+        scn.OLuminSL_ODiskSensorSampleWidthPct, scn.OLuminSL_ODiskSensorSampleHeightPct, scn.OLuminSL_SensorSampleKernel,
+        scn.OLuminSL_ODiskSensorSampleKernel, sun_lights, False)
+    return dict([ (light.name, light.data.color[:]) for light in sun_lights ])
+
+# Set sun colors of lights at every frame of the scene frame range, from the world's (animated) environment, and
+# keyframe them. Colors of each image frame are read from the cache if use_cache is True (except for packed and
+# generated images), and only the suns missing from the cache are sampled. Colors are smoothed over smooth_radius frames before keyframing.
+# Returns (number of frames, number of frames where suns were sampled).
+def set_animated_sun_colors(context, sun_lights, color_source, use_cache, smooth_radius):
+    scene = context.scene
+    frames = list(range(scene.frame_start, max(scene.frame_start, scene.frame_end) + 1))
+    colors = np.empty((len(frames), len(sun_lights), 3), dtype=np.float32)
+    num_sampled = 0
+    wm = context.window_manager
+    wm.progress_begin(0, len(frames))
+    old_frame = scene.frame_current
+    try:
+        for f in range(len(frames)):
+            scene.frame_set(frames[f])
+            env_node = get_world_environment_node(scene.world)
+            image_path, image_frame, frame_filepath = get_env_frame_source(env_node, frames[f])
+            if color_source == "DIRECT":
+                sample_cones = get_sunlit_direct_sample_cones(sun_lights)
+                sun_keys = get_direct_sun_keys(sample_cones)
+            else:
+                sun_keys = get_bake_sun_keys(scene, sun_lights)
+            use_frame_cache = use_cache and image_path is not None
+            frame_cache = load_env_frame_cache(image_path, image_frame, frame_filepath) if use_frame_cache else {}
+            missing = [ light for light in sun_lights if light.name in sun_keys and
+                sun_keys[light.name] not in frame_cache ]
+            if len(missing) > 0:
+                if color_source == "DIRECT":
+                    sun_colors = sample_direct_frame_colors(env_node, frame_filepath,
+                        [ cone for cone in sample_cones if cone[0] in missing ])
+                else:
+                    sun_colors = sample_bake_frame_colors(context, missing)
+                for light in missing:
+                    frame_cache[sun_keys[light.name]] = sun_colors[light.name]
+                if use_frame_cache:
+                    write_env_frame_cache(image_path, image_frame, frame_filepath, frame_cache)
+                num_sampled = num_sampled + 1
+            # suns that cannot be sampled keep their current color
+            for c in range(len(sun_lights)):
+                sun_key = sun_keys.get(sun_lights[c].name)
+                colors[f, c] = frame_cache[sun_key] if sun_key is not None else sun_lights[c].data.color[:]
+            wm.progress_update(f + 1)
+    finally:
+        scene.frame_set(old_frame)
+        wm.progress_end()
+    colors = get_smoothed_frame_values(colors, smooth_radius)
+    for c in range(len(sun_lights)):
+        light_data = sun_lights[c].data
+        action = get_id_action(light_data, light_data.name + "Action")
+        set_fcurve_array_keyframes(action, "color", frames, colors[:, c], keep_outside_range=True)
+    return len(frames), num_sampled
+
+class OLuminSL_SetRigSunColorAnimated(bpy.types.Operator):
+    """Set and keyframe color of suns of selected rigs at every frame of the scene frame range, for animated """ \
+    """environment textures (image sequences, movies). Each frame's environment is sampled once (sensors are """ \
+    """baked at every frame with Bake source), and sun colors of each image frame are cached on disk, so only """ \
+    """changed suns are sampled again"""
+    bl_idname = "olumin_sl.rig_sun_color_animated"
+    bl_label = "Set Rig Sun Color Animated"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        scn = context.scene
+        sun_lights = []
+        for ob in context.selected_objects:
+            if is_sunlit_armature(ob):
+                sun_lights = sun_lights + get_sunlit_suns_from_armature(ob)
+        if len(sun_lights) < 1:
+            self.report({'ERROR'}, "Select one or more Sunlit Rigs and try again.")
+            return {'CANCELLED'}
+        if scn.OLuminSL_SunColorSource == "DIRECT":
+            env_node = get_world_environment_node(scn.world)
+            if env_node is None:
+                self.report({'ERROR'}, "Cannot set sun color with Direct source, world has no Environment Texture image.")
+                return {'CANCELLED'}
+            if env_node.image.source == "MOVIE":
+                self.report({'ERROR'}, "Cannot sample movie Environment Texture with Direct source, use Bake source.")
+                return {'CANCELLED'}
+        elif scn.render.engine != "CYCLES":
+            self.report({'ERROR'}, "Change render engine to CYCLES, and try again.")
+            return {'CANCELLED'}
+        try:
+            num_frames, num_sampled = set_animated_sun_colors(context, sun_lights, scn.OLuminSL_SunColorSource,
+                scn.OLuminSL_UseEnvFrameCache, scn.OLuminSL_AnimatedSmoothFrames)
+        except RuntimeError as e:
+            self.report({'ERROR'}, "Unable to sample animated environment, error: " + str(e))
+            return {'CANCELLED'}
+        self.report({'INFO'}, "Keyframed color of " + str(len(sun_lights)) + " suns over " + str(num_frames) +
+            " frames, sampled " + str(num_sampled) + " frames (other frames from cache).")
+        return {'FINISHED'}
@@ -0,0 +1,97 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Sensor atlas: sensors of one or more Sunlit rigs share one bake image (and one material), and each sensor's UVs
+# cover a separate, non-overlapping tile of the image.
+# The tile of each sensor, (x, y, width, height) in pixels, is stored as an ID property of the sensor object, so
+# sampling can find the sensor's pixels in the atlas.
+
+import math
+import numpy as np
+
+from .sunlit_sample import IMG_PIXEL_CHANNELS
+
+SUNLIT_ATLAS_TILE_PROP = "sunlit_atlas_tile"
+# empty pixels between tiles
+SUNLIT_ATLAS_TILE_PADDING = 2
+
+def get_sensor_atlas_tile(ob):
+    tile = ob.get(SUNLIT_ATLAS_TILE_PROP)
+    if tile is None or len(tile) != 4:
+        return None
+    return (int(tile[0]), int(tile[1]), int(tile[2]), int(tile[3]))
+
+def set_sensor_atlas_tile(ob, tile):
+    ob[SUNLIT_ATLAS_TILE_PROP] = [int(tile[0]), int(tile[1]), int(tile[2]), int(tile[3])]
+
+# Shelf packing of tiles, tallest tiles first, into an atlas about as wide as it is tall.
+# Returns (atlas_w, atlas_h, tiles), with tiles (x, y, width, height) in the same order as tile_sizes.
+def get_atlas_tile_layout(tile_sizes, padding=SUNLIT_ATLAS_TILE_PADDING):
+    if len(tile_sizes) < 1:
+        return 0, 0, []
+    padded_sizes = [ (w + padding, h + padding) for w, h in tile_sizes ]
+    total_area = sum(w * h for w, h in padded_sizes)
+    atlas_w = max(max(w for w, _ in padded_sizes), math.ceil(math.sqrt(total_area)))
+    order = sorted(range(len(tile_sizes)), key=lambda i: (-padded_sizes[i][1], -padded_sizes[i][0]))
+    tiles = [None] * len(tile_sizes)
+    shelf_x = 0
+    shelf_y = 0
+    shelf_h = 0
+    for i in order:
+        w, h = padded_sizes[i]
+        # start new shelf if tile does not fit in current shelf
+        if shelf_x + w > atlas_w:
+            shelf_y += shelf_h
+            shelf_x = 0
+            shelf_h = 0
+        tiles[i] = (shelf_x, shelf_y, tile_sizes[i][0], tile_sizes[i][1])
+        shelf_x += w
+        shelf_h = max(shelf_h, h)
+    return atlas_w, shelf_y + shelf_h, tiles
+
+# Build atlas pixel buffer (height, width, channels) from source pixel buffers, each source is copied into its tile
+# (nearest pixel resize, if source size differs from tile size).
+def build_atlas_pixels(atlas_w, atlas_h, tiles, src_bufs):
+    atlas_buf = np.zeros((atlas_h, atlas_w, IMG_PIXEL_CHANNELS), dtype=np.float32)
+    atlas_buf[:, :, 3] = 1.0
+    for tile, src_buf in zip(tiles, src_bufs):
+        tile_x, tile_y, tile_w, tile_h = tile
+        if src_buf.shape[0] < 1 or src_buf.shape[1] < 1 or tile_w < 1 or tile_h < 1:
+            continue
+        src_y = (np.arange(tile_h) * src_buf.shape[0]) // tile_h
+        src_x = (np.arange(tile_w) * src_buf.shape[1]) // tile_w
+        atlas_buf[tile_y:tile_y+tile_h, tile_x:tile_x+tile_w] = src_buf[src_y[:, None], src_x[None, :]]
+    return atlas_buf
+
+# Remap active UV map of mesh into tile of atlas. Existing UVs are first stretched to fill the unit square, so a mesh
+# already in an atlas can be remapped to a tile of a new atlas.
+def set_mesh_uv_atlas_tile(mesh, tile, atlas_w, atlas_h):
+    uv_layer = mesh.uv_layers.active
+    if uv_layer is None or len(uv_layer.data) < 1:
+        return False
+    uv = np.empty(len(uv_layer.data) * 2, dtype=np.float32)
+    uv_layer.data.foreach_get("uv", uv)
+    uv = uv.reshape((-1, 2))
+    uv_min = uv.min(axis=0)
+    uv_size = np.maximum(uv.max(axis=0) - uv_min, 1e-8)
+    uv = (uv - uv_min) / uv_size
+    uv[:, 0] = (tile[0] + uv[:, 0] * tile[2]) / atlas_w
+    uv[:, 1] = (tile[1] + uv[:, 1] * tile[3]) / atlas_h
+    uv_layer.data.foreach_set("uv", uv.reshape(-1))
+    mesh.update()
+    return True
@@ -0,0 +1,279 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Sunlit bake farm: bake sensors of many Sunlit rigs in parallel, with background Blender worker processes.
+# A copy of the current file is saved to a temporary folder, the sensors are split into groups (one group per rig,
+# or rigs split into smaller groups if there are more workers than rigs), and each worker bakes its share of groups
+# (see sunlit_bake_worker.py). Baked pixels / colors are then merged back into the sensors in the UI process.
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+import bpy
+
+from .sunlit_rig import (SUNLIT_SENSOR_ATTR_NAME, get_sunlit_regular_sensors_from_armature,
+    get_sunlit_odisk_sensors_from_armature, get_sunlit_suns_from_selected, get_object_hide_render,
+    get_sunlit_bake_image_for_plane, denoise_sunlit_sensor_images, get_sunlit_bake_denoise, is_sunlit_armature,
+    get_sunlit_sensor_bake_fingerprint, set_sunlit_sensor_baked, SUNLIT_BAKE_FINGERPRINT_PROP)
+from .sunlit_fingerprint import get_world_values
+from .sunlit_sample import (get_cached_image_pixels, set_image_pixel_buffer, invalidate_image_cache)
+
+if bpy.app.version < (2,80,0):
+    from .imp_v27 import *
+else:
+    from .imp_v28 import *
+
+SUNLIT_BAKE_WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sunlit_bake_worker.py")
+SUNLIT_BAKE_FARM_BLEND_NAME = "sunlit_bake_farm.blend"
+
+# Split sensors of each armature into bake groups, at least num_workers groups if possible. Returns list of lists of
+# sensor objects.
+def get_sunlit_bake_groups(armature_sensors, num_workers):
+    groups = [ sensors for sensors in armature_sensors if len(sensors) > 0 ]
+    # split largest groups in half until there is a group for each worker
+    while len(groups) < num_workers:
+        largest = max(groups, key=len, default=None)
+        if largest is None or len(largest) < 2:
+            break
+        groups.remove(largest)
+        half = len(largest) // 2
+        groups.append(largest[:half])
+        groups.append(largest[half:])
+    return groups
+
+# Start bake farm for sensors of armatures in list, returns farm state dict, or error message string.
+# If incremental is True then sensors with unchanged bake inputs are skipped.
+def start_sunlit_bake_farm(context, armature_list, num_workers, sensor_bake_samples, hide_all_lights, denoise,
+        incremental=False):
+    if hide_all_lights:
+        lights = get_all_lights()
+    else:
+        lights = get_sunlit_suns_from_selected(context)
+    world_values = get_world_values(context.scene.world)
+    warnings = []
+    fingerprints = {}
+    blinds_values_cache = {}
+    armature_sensors = []
+    for armature in armature_list:
+        vis_sensors = []
+        for s in get_sunlit_regular_sensors_from_armature(armature) + get_sunlit_odisk_sensors_from_armature(armature):
+            if get_object_hide_render(s):
+                warnings.append("Sunlit Image Sensor Mesh not baked, make mesh 'render visible' before baking, " +
+                    "mesh named: " + s.name)
+                continue
+            fingerprint = get_sunlit_sensor_bake_fingerprint(s, world_values, sensor_bake_samples, denoise,
+                blinds_values_cache)
+            if incremental and s.get(SUNLIT_BAKE_FINGERPRINT_PROP) == fingerprint:
+                continue
+            fingerprints[s.name] = fingerprint
+            vis_sensors.append(s)
+        armature_sensors.append(vis_sensors)
+    groups = get_sunlit_bake_groups(armature_sensors, num_workers)
+    if len(groups) < 1:
+        if incremental:
+            return "No changed sensors found in selected Sunlit Rigs, nothing to bake."
+        return "No render visible sensors found in selected Sunlit Rigs."
+    num_workers = min(num_workers, len(groups))
+
+    tmp_dir = tempfile.mkdtemp(prefix="sunlit_bake_farm_")
+    blend_filepath = os.path.join(tmp_dir, SUNLIT_BAKE_FARM_BLEND_NAME)
+    bpy.ops.wm.save_as_mainfile(filepath=blend_filepath, copy=True)
+    # share CPU threads between workers
+    num_threads = max(1, (os.cpu_count() or 1) // num_workers)
+    workers = []
+    for worker_index in range(num_workers):
+        job = {
+            "samples": sensor_bake_samples,
+            "hide_lights": [ lit.name for lit in lights ],
+            "out_dir": tmp_dir,
+            "groups": [ (i, [ s.name for s in groups[i] ]) for i in range(worker_index, len(groups), num_workers) ],
+        }
+        job_filepath = os.path.join(tmp_dir, "job_%d.json" % worker_index)
+        with open(job_filepath, "w") as f:
+            json.dump(job, f)
+        log_file = open(os.path.join(tmp_dir, "worker_%d.log" % worker_index), "w")
+        # Python errors in the worker script give a non-zero exit code, so failed workers are found by polling
+        proc = subprocess.Popen([bpy.app.binary_path, "-b", "--factory-startup", blend_filepath, "-t",
+            str(num_threads), "--python-exit-code", "1", "--python", SUNLIT_BAKE_WORKER_SCRIPT, "--", job_filepath],
+            stdout=log_file, stderr=subprocess.STDOUT)
+        workers.append((proc, log_file))
+    return { "tmp_dir": tmp_dir, "workers": workers, "num_groups": len(groups), "warnings": warnings,
+        "denoise": denoise, "fingerprints": fingerprints }
+
+# get number of bake groups done, and list of log filepaths of workers that failed
+def poll_sunlit_bake_farm(farm):
+    num_done = len([ f for f in os.listdir(farm["tmp_dir"]) if f.endswith("_done.json") ])
+    failed_logs = []
+    for proc, log_file in farm["workers"]:
+        return_code = proc.poll()
+        if return_code is not None and return_code != 0:
+            failed_logs.append(log_file.name)
+    return num_done, failed_logs
+
+# get list of indexes of bake groups without a "done" file, e.g. groups of a worker that stopped early
+def get_sunlit_bake_farm_missing_groups(farm):
+    done_files = os.listdir(farm["tmp_dir"])
+    return [ i for i in range(farm["num_groups"]) if "group_%d_done.json" % i not in done_files ]
+
+def is_sunlit_bake_farm_running(farm):
+    return any(proc.poll() is None for proc, _ in farm["workers"])
+
+# Merge worker results into sensor images / color attributes. Images are written once each, with all tiles merged,
+# and then denoised. Returns list of sensors that were merged.
+def merge_sunlit_bake_farm(farm):
+    results = []
+    for filename in os.listdir(farm["tmp_dir"]):
+        if filename.endswith("_done.json"):
+            with open(os.path.join(farm["tmp_dir"], filename), "r") as f:
+                results = results + json.load(f)
+    merged_sensors = []
+    image_bufs = {}
+    for result in results:
+        sensor = bpy.data.objects.get(result["sensor"])
+        if sensor is None:
+            continue
+        data = np.load(os.path.join(farm["tmp_dir"], result["file"]))
+        if result["kind"] == "ATTRIBUTE":
+            attr = get_object_color_attribute(sensor, SUNLIT_SENSOR_ATTR_NAME)
+            if attr is None or len(attr.data) * 4 != data.size:
+                continue
+            attr.data.foreach_set("color", data)
+            sensor.data.update()
+            merged_sensors.append(sensor)
+            continue
+        img = get_sunlit_bake_image_for_plane(sensor)
+        if img is None:
+            continue
+        if img.name not in image_bufs:
+            image_bufs[img.name] = (img, get_cached_image_pixels(img).copy())
+        px_buf = image_bufs[img.name][1]
+        tile = result["tile"]
+        if tile is None:
+            tile = (0, 0, px_buf.shape[1], px_buf.shape[0])
+        if data.shape != (tile[3], tile[2], px_buf.shape[2]) or tile[0] + tile[2] > px_buf.shape[1] or \
+                tile[1] + tile[3] > px_buf.shape[0]:
+            continue
+        px_buf[tile[1]:tile[1]+tile[3], tile[0]:tile[0]+tile[2]] = data
+        merged_sensors.append(sensor)
+    for img, px_buf in image_bufs.values():
+        set_image_pixel_buffer(img, px_buf)
+        img.update()
+        invalidate_image_cache(img.name)
+    denoise_sunlit_sensor_images(merged_sensors, farm["denoise"])
+    for sensor in merged_sensors:
+        fingerprint = farm["fingerprints"].get(sensor.name)
+        if fingerprint is not None:
+            set_sunlit_sensor_baked(sensor, fingerprint)
+    return merged_sensors
+
+# stop any running workers, and remove temporary files
+def stop_sunlit_bake_farm(farm, keep_files=False):
+    for proc, log_file in farm["workers"]:
+        if proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        log_file.close()
+    if not keep_files:
+        shutil.rmtree(farm["tmp_dir"], ignore_errors=True)
+
+class OLuminSL_BakeFarmRigSensors(bpy.types.Operator):
+    """Bake sensors of selected Sunlit Rigs in parallel, with background Blender processes. A copy of the current """ \
+    """file is saved to a temporary folder for the background processes, and baked sensors are merged back into """ \
+    """this file. Press ESC to cancel"""
+    bl_idname = "olumin_sl.bake_farm_rig_sensors"
+    bl_label = "Bake Rig Sensors in Parallel"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    _timer = None
+    _farm = None
+
+    def execute(self, context):
+        scn = context.scene
+        if bpy.app.version < (2,80,0):
+            self.report({'ERROR'}, "Sunlit bake farm not supported in Blender 2.79, use Bake Rig Sensors instead.")
+            return {'CANCELLED'}
+        if scn.render.engine != "CYCLES":
+            self.report({'ERROR'}, "Change render engine to CYCLES, and try again.")
+            return {'CANCELLED'}
+        sunlit_arms = []
+        for ob in context.selected_objects:
+            if is_sunlit_armature(ob):
+                sunlit_arms.append(ob)
+        if len(sunlit_arms) == 0:
+            self.report({'ERROR'}, "Select one or more Sunlit Rigs and try again.")
+            return {'CANCELLED'}
+        farm = start_sunlit_bake_farm(context, sunlit_arms, scn.OLuminSL_BakeFarmWorkers, scn.OLuminSL_BakeSamples,
+            scn.OLuminSL_BakeHideAllLights, get_sunlit_bake_denoise(scn), scn.OLuminSL_Incremental)
+        if isinstance(farm, str):
+            self.report({'ERROR'}, farm)
+            return {'CANCELLED'}
+        for warn in farm["warnings"]:
+            self.report({'WARNING'}, warn)
+        self._farm = farm
+        wm = context.window_manager
+        wm.progress_begin(0, farm["num_groups"])
+        self._timer = wm.event_timer_add(0.5, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.finish(context)
+            stop_sunlit_bake_farm(self._farm)
+            self.report({'WARNING'}, "Sunlit bake farm cancelled.")
+            return {'CANCELLED'}
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        num_done, failed_logs = poll_sunlit_bake_farm(self._farm)
+        context.window_manager.progress_update(num_done)
+        context.workspace.status_text_set("Sunlit bake farm: " + str(num_done) + " of " +
+            str(self._farm["num_groups"]) + " sensor groups baked, press ESC to cancel")
+        if len(failed_logs) > 0:
+            self.finish(context)
+            stop_sunlit_bake_farm(self._farm, keep_files=True)
+            self.report({'ERROR'}, "Sunlit bake farm worker failed, see log: " + failed_logs[0])
+            return {'CANCELLED'}
+        if is_sunlit_bake_farm_running(self._farm):
+            return {'PASS_THROUGH'}
+
+        self.finish(context)
+        # done files are listed again, workers may have finished after the poll
+        missing_groups = get_sunlit_bake_farm_missing_groups(self._farm)
+        if len(missing_groups) > 0:
+            stop_sunlit_bake_farm(self._farm, keep_files=True)
+            self.report({'ERROR'}, "Sunlit bake farm workers did not bake sensor groups " +
+                ", ".join([ str(i) for i in missing_groups ]) + ", see worker logs in: " + self._farm["tmp_dir"])
+            return {'CANCELLED'}
+        merged_sensors = merge_sunlit_bake_farm(self._farm)
+        stop_sunlit_bake_farm(self._farm)
+        self.report({'INFO'}, "Sunlit bake farm baked " + str(len(merged_sensors)) + " sensors.")
+        return {'FINISHED'}
+
+    def finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
@@ -0,0 +1,158 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Sunlit bake farm worker, run by a background Blender process (not imported by the addon):
+#     blender -b --factory-startup <blend file copy> --python-exit-code 1 --python sunlit_bake_worker.py -- <job file>
+# The job file (JSON) lists groups of sensor object names to bake, and the lights to hide from render. Each group is
+# baked with one bake call, and then the baked pixels / color attribute colors of each sensor in the group are saved
+# as .npy files in the job's output folder, with a "done" JSON file per group that the addon uses for progress and
+# merging.
+
+import json
+import os
+import sys
+
+import numpy as np
+import bpy
+
+# these must match the names used by the addon (sunlit_rig.py, sunlit_atlas.py)
+SUNLIT_BAKE_IMG_NAME = "SunlitBakeImage"
+SUNLIT_SENSOR_ATTR_NAME = "SunlitSensorColor"
+SUNLIT_ATLAS_TILE_PROP = "sunlit_atlas_tile"
+SUNLIT_ATLAS_TILE_PADDING = 2
+
+def get_job_filepath():
+    if "--" not in sys.argv:
+        return None
+    args = sys.argv[sys.argv.index("--")+1:]
+    if len(args) < 1:
+        return None
+    return args[0]
+
+def get_sensor_bake_image(ob):
+    mat = ob.active_material
+    if mat is None or mat.node_tree is None:
+        return None
+    for node in mat.node_tree.nodes:
+        if node.type == "TEX_IMAGE" and node.image is not None and SUNLIT_BAKE_IMG_NAME in node.image.name:
+            return node.image
+    return None
+
+def get_sensor_color_attribute(ob):
+    if hasattr(ob.data, "color_attributes"):
+        return ob.data.color_attributes.get(SUNLIT_SENSOR_ATTR_NAME)
+    return ob.data.vertex_colors.get(SUNLIT_SENSOR_ATTR_NAME)
+
+def get_sensor_atlas_tile(ob):
+    tile = ob.get(SUNLIT_ATLAS_TILE_PROP)
+    if tile is None or len(tile) != 4:
+        return None
+    return [ int(v) for v in tile ]
+
+def select_bake_objects(view_layer, obj_list):
+    for ob in view_layer.objects:
+        ob.select_set(False)
+    for ob in obj_list:
+        ob.select_set(True)
+    view_layer.objects.active = obj_list[0]
+
+# bake group of sensors, image sensors and color attribute sensors need separate bake calls
+def bake_sensor_group(view_layer, sensors):
+    img_sensors = []
+    attr_sensors = []
+    for ob in sensors:
+        if get_sensor_color_attribute(ob) is not None:
+            attr_sensors.append(ob)
+        elif get_sensor_bake_image(ob) is not None:
+            img_sensors.append(ob)
+    if len(img_sensors) > 0:
+        select_bake_objects(view_layer, img_sensors)
+        bpy.ops.object.bake(type="DIFFUSE")
+    if len(attr_sensors) > 0:
+        select_bake_objects(view_layer, attr_sensors)
+        bpy.ops.object.bake(type="DIFFUSE", target="VERTEX_COLORS")
+
+# save bake result of each sensor in group, returns list of result entries for the group's "done" file
+def save_sensor_group_results(sensors, out_dir, group_index):
+    results = []
+    for sensor_index, ob in enumerate(sensors):
+        filename = "group_%d_sensor_%d.npy" % (group_index, sensor_index)
+        attr = get_sensor_color_attribute(ob)
+        if attr is not None:
+            colors = np.empty(len(attr.data) * 4, dtype=np.float32)
+            attr.data.foreach_get("color", colors)
+            np.save(os.path.join(out_dir, filename), colors)
+            results.append({ "sensor": ob.name, "kind": "ATTRIBUTE", "file": filename })
+            continue
+        img = get_sensor_bake_image(ob)
+        if img is None:
+            continue
+        img_w, img_h = img.size[0], img.size[1]
+        # image pixels have foreach_get from Blender 2.83
+        if hasattr(img.pixels, "foreach_get"):
+            px_buf = np.empty(img_w * img_h * 4, dtype=np.float32)
+            img.pixels.foreach_get(px_buf)
+        else:
+            px_buf = np.array(img.pixels[:], dtype=np.float32)
+        px_buf = px_buf.reshape((img_h, img_w, 4))
+        # only the sensor's own tile of an atlas image is saved
+        tile = get_sensor_atlas_tile(ob)
+        if tile is not None:
+            px_buf = px_buf[tile[1]:tile[1]+tile[3], tile[0]:tile[0]+tile[2]]
+        np.save(os.path.join(out_dir, filename), np.ascontiguousarray(px_buf))
+        results.append({ "sensor": ob.name, "kind": "IMAGE", "image": img.name, "tile": tile, "file": filename })
+    return results
+
+def run_job(job):
+    scn = bpy.context.scene
+    view_layer = bpy.context.view_layer
+    scn.render.engine = "CYCLES"
+    scn.cycles.samples = job["samples"]
+    scn.render.bake.use_pass_direct = True
+    scn.render.bake.use_pass_indirect = True
+    scn.render.bake.use_pass_color = False
+    # tiles of an atlas image baked by other workers are not cleared, and bake margin stays inside tile padding
+    scn.render.bake.use_clear = False
+    scn.render.bake.margin = min(scn.render.bake.margin, SUNLIT_ATLAS_TILE_PADDING)
+    for light_name in job["hide_lights"]:
+        light = bpy.data.objects.get(light_name)
+        if light is not None:
+            light.hide_render = True
+
+    for group_index, sensor_names in job["groups"]:
+        sensors = [ bpy.data.objects[name] for name in sensor_names if name in bpy.data.objects ]
+        if len(sensors) > 0:
+            bake_sensor_group(view_layer, sensors)
+        results = save_sensor_group_results(sensors, job["out_dir"], group_index)
+        # done file is written last, and renamed into place, so the addon never reads a partial file
+        done_filepath = os.path.join(job["out_dir"], "group_%d_done.json" % group_index)
+        with open(done_filepath + ".tmp", "w") as f:
+            json.dump(results, f)
+        os.replace(done_filepath + ".tmp", done_filepath)
+
+def main():
+    job_filepath = get_job_filepath()
+    if job_filepath is None:
+        print("Sunlit bake worker: no job file given")
+        sys.exit(1)
+    with open(job_filepath, "r") as f:
+        job = json.load(f)
+    run_job(job)
+
+if __name__ == "__main__":
+    main()
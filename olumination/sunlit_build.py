@@ -0,0 +1,144 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Sunlit rig parts built through the data API (bpy.data meshes, objects, lights, cameras) instead of operators, so
+# there is no depsgraph update / view layer sync / operator overhead per part, and no 3D View is needed (e.g. headless).
+# Mesh geometry is made as "pydata" (vertexes, edges, faces, as used by Mesh.from_pydata), with the same size, vertex
+# order, UVs and face normals as the Blender primitives (plane, cube, circle, cone, icosphere) that built rig parts
+# before. Objects are returned unlinked, so that all parts can be linked together afterwards.
+
+import math
+import bpy
+
+if bpy.app.version < (2,80,0):
+    from .imp_v27 import *
+else:
+    from .imp_v28 import *
+
+PRIMITIVE_CIRCLE_VERTS = 32
+PRIMITIVE_UV_MAP_NAME = "UVMap"
+
+# rotate vertexes about X axis, like applying object rotation of (angle, 0, 0)
+def get_rotated_x_verts(verts, angle):
+    cos_a = math.cos(angle)
+    sin_a = math.sin(angle)
+    return [ (x, y * cos_a - z * sin_a, y * sin_a + z * cos_a) for x, y, z in verts ]
+
+# square plane in XY plane, facing +Z, with UVs covering the whole UV square (like primitive_plane_add)
+def get_plane_pydata(radius, calc_uvs=True):
+    verts = [ (-radius, -radius, 0), (radius, -radius, 0), (-radius, radius, 0), (radius, radius, 0) ]
+    faces = [ (0, 1, 3, 2) ]
+    uvs = [ (0, 0), (1, 0), (0, 1), (1, 1) ] if calc_uvs else None
+    return verts, [], faces, uvs
+
+# cube with faces pointing outward (like primitive_cube_add)
+def get_cube_pydata(radius):
+    verts = [ (x * radius, y * radius, z * radius) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1) ]
+    faces = [ (0, 1, 3, 2), (2, 3, 7, 6), (6, 7, 5, 4), (4, 5, 1, 0), (2, 6, 4, 0), (7, 3, 1, 5) ]
+    return verts, [], faces, None
+
+# Circle in XY plane, starting at +Y and going counter-clockwise (like primitive_circle_add). If filled then circle
+# is one n-gon face facing +Z, with UVs of circle inscribed in UV square.
+def get_circle_pydata(radius, num_verts=PRIMITIVE_CIRCLE_VERTS, fill=False):
+    verts = []
+    for k in range(num_verts):
+        phi = 2 * math.pi * k / num_verts
+        verts.append((-radius * math.sin(phi), radius * math.cos(phi), 0))
+    if not fill:
+        edges = [ (k, (k+1) % num_verts) for k in range(num_verts) ]
+        return verts, edges, [], None
+    uvs = [ (v[0] / radius * 0.5 + 0.5, v[1] / radius * 0.5 + 0.5) for v in verts ]
+    return verts, [], [ tuple(range(num_verts)) ], uvs
+
+# cone along Z axis, base (filled) at -depth/2 and tip at +depth/2 (like primitive_cone_add with radius2=0)
+def get_cone_pydata(radius, depth, num_verts=PRIMITIVE_CIRCLE_VERTS):
+    verts = [ (x, y, -depth / 2) for x, y, z in get_circle_pydata(radius, num_verts)[0] ]
+    verts.append((0, 0, depth / 2))
+    faces = [ (k, (k+1) % num_verts, num_verts) for k in range(num_verts) ]
+    faces.append(tuple(reversed(range(num_verts))))
+    return verts, [], faces, None
+
+# Icosphere, subdivisions=1 is an icosahedron, and each further subdivision splits every triangle into 4 triangles
+# (like primitive_ico_sphere_add).
+def get_icosphere_pydata(subdivisions, radius):
+    t = (1 + math.sqrt(5)) / 2
+    verts = [ (-1, t, 0), (1, t, 0), (-1, -t, 0), (1, -t, 0), (0, -1, t), (0, 1, t), (0, -1, -t), (0, 1, -t),
+        (t, 0, -1), (t, 0, 1), (-t, 0, -1), (-t, 0, 1) ]
+    faces = [ (0, 11, 5), (0, 5, 1), (0, 1, 7), (0, 7, 10), (0, 10, 11), (1, 5, 9), (5, 11, 4), (11, 10, 2),
+        (10, 7, 6), (7, 1, 8), (3, 9, 4), (3, 4, 2), (3, 2, 6), (3, 6, 8), (3, 8, 9), (4, 9, 5), (2, 4, 11),
+        (6, 2, 10), (8, 6, 7), (9, 8, 1) ]
+    verts = [ get_sphere_point(v, 1.0) for v in verts ]
+    for s in range(max(subdivisions, 1) - 1):
+        # new vertex at middle of each edge, shared by the two faces of the edge
+        midpoints = {}
+        def get_midpoint(a, b):
+            key = (min(a, b), max(a, b))
+            if key not in midpoints:
+                va = verts[a]
+                vb = verts[b]
+                verts.append(get_sphere_point(((va[0]+vb[0]) / 2, (va[1]+vb[1]) / 2, (va[2]+vb[2]) / 2), 1.0))
+                midpoints[key] = len(verts) - 1
+            return midpoints[key]
+        new_faces = []
+        for a, b, c in faces:
+            ab = get_midpoint(a, b)
+            bc = get_midpoint(b, c)
+            ca = get_midpoint(c, a)
+            new_faces.extend([ (a, ab, ca), (b, bc, ab), (c, ca, bc), (ab, bc, ca) ])
+        faces = new_faces
+    return [ (x * radius, y * radius, z * radius) for x, y, z in verts ], [], faces, None
+
+def get_sphere_point(v, radius):
+    length = math.sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2])
+    return (v[0] / length * radius, v[1] / length * radius, v[2] / length * radius)
+
+# Create mesh from pydata, returned by one of the get_*_pydata functions. UVs of pydata are given per vertex.
+def create_pydata_mesh(mesh_name, pydata):
+    verts, edges, faces, uvs = pydata
+    mesh = bpy.data.meshes.new(mesh_name)
+    mesh.from_pydata(verts, edges, faces)
+    if uvs is not None:
+        create_mesh_uv_map(mesh, PRIMITIVE_UV_MAP_NAME)
+        uv_layer = mesh.uv_layers.get(PRIMITIVE_UV_MAP_NAME)
+        # face loops are in pydata order
+        loop_uvs = [ uv_co for face in faces for vert_index in face for uv_co in uvs[vert_index] ]
+        uv_layer.data.foreach_set("uv", loop_uvs)
+    mesh.update()
+    return mesh
+
+# create mesh object (not linked to scene) from pydata
+def create_pydata_object(obj_name, pydata, obj_loc=(0, 0, 0)):
+    return create_mesh_object(obj_name, create_pydata_mesh(obj_name, pydata), obj_loc)
+
+# create mesh object (not linked to scene) using mesh, e.g. mesh shared by many objects (linked duplicates)
+def create_mesh_object(obj_name, mesh, obj_loc=(0, 0, 0)):
+    new_obj = bpy.data.objects.new(obj_name, mesh)
+    new_obj.location = obj_loc
+    return new_obj
+
+# create light object (not linked to scene), radius is light's shadow soft size (like light_add)
+def create_light_object(light_name, light_type, light_radius, light_loc=(0, 0, 0)):
+    light_data = new_light_data(light_name, light_type)
+    light_data.shadow_soft_size = light_radius
+    new_obj = bpy.data.objects.new(light_name, light_data)
+    new_obj.location = light_loc
+    return new_obj
+
+# create camera object (not linked to scene)
+def create_camera_object(cam_name):
+    return bpy.data.objects.new(cam_name, bpy.data.cameras.new(cam_name))
@@ -0,0 +1,112 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Direct HDRI sampling, no sensor bake needed.
+# The world's Environment Texture image (equirectangular) is integrated over the cone of each sun, with each pixel
+# weighted by the solid angle it covers on the sphere.
+# Note: the environment image is sampled in world directions, any Mapping / Vector nodes between Texture Coordinate
+#       and Environment Texture nodes (e.g. Mobile Background) are ignored.
+
+import math
+import numpy as np
+
+from .sunlit_sample import get_image_cache_entry
+
+# environment images wider than this are box-downsampled before sampling, to keep Direct sampling interactive
+DIRECT_MAX_ENV_WIDTH = 1024
+
+# get the first Environment Texture node (with an image) in world shader nodes, preferring linked nodes
+def get_world_environment_node(world):
+    if world is None or not world.use_nodes or world.node_tree is None:
+        return None
+    unlinked_node = None
+    for node in world.node_tree.nodes:
+        if node.type != "TEX_ENVIRONMENT" or node.image is None:
+            continue
+        if any(out.is_linked for out in node.outputs):
+            return node
+        if unlinked_node is None:
+            unlinked_node = node
+    return unlinked_node
+
+# get the image of the world's Environment Texture node
+def get_world_environment_image(world):
+    env_node = get_world_environment_node(world)
+    if env_node is None:
+        return None
+    return env_node.image
+
+# box-downsample pixel buffer (height, width, channels) by integer factor, edge pixels that do not fill a whole box
+# are dropped
+def downsample_pixel_buffer(px_buf, factor):
+    if factor <= 1:
+        return px_buf
+    img_h = (px_buf.shape[0] // factor) * factor
+    img_w = (px_buf.shape[1] // factor) * factor
+    px_buf = px_buf[0:img_h, 0:img_w]
+    return px_buf.reshape((img_h // factor, factor, img_w // factor, factor, px_buf.shape[2])).mean(axis=(1, 3))
+
+# get world direction (unit vector) and solid angle of each pixel center of an equirectangular image, as arrays
+# shaped (height*width, 3) and (height*width)
+# Uses Blender's equirectangular mapping: u = 0.5 - atan2(y, x) / 2pi, v = 0.5 + latitude / pi, and Blender image
+# pixel rows are stored bottom row first.
+def get_equirect_directions(img_w, img_h):
+    longitude = (0.5 - (np.arange(img_w, dtype=np.float64) + 0.5) / img_w) * 2 * math.pi
+    latitude = ((np.arange(img_h, dtype=np.float64) + 0.5) / img_h - 0.5) * math.pi
+    cos_lat = np.cos(latitude)[:, None]
+    dirs = np.empty((img_h, img_w, 3), dtype=np.float32)
+    dirs[:, :, 0] = cos_lat * np.cos(longitude)[None, :]
+    dirs[:, :, 1] = cos_lat * np.sin(longitude)[None, :]
+    dirs[:, :, 2] = np.sin(latitude)[:, None]
+    pixel_solid_angle = (2 * math.pi / img_w) * (math.pi / img_h)
+    solid_angles = np.repeat(cos_lat * pixel_solid_angle, img_w, axis=1).astype(np.float32)
+    return dirs.reshape((-1, 3)), solid_angles.reshape(-1)
+
+# get environment image as (rgb, directions, solid angle weights) arrays, ready for cone sampling - cached with the
+# image's pixels, until the image is edited / changed
+def get_env_sample_buffer(env_img):
+    entry = get_image_cache_entry(env_img)
+    env_buf = entry.get("env")
+    if env_buf is None:
+        px_buf = entry["pixels"]
+        factor = math.ceil(px_buf.shape[1] / DIRECT_MAX_ENV_WIDTH)
+        px_buf = downsample_pixel_buffer(px_buf, factor)
+        dirs, solid_angles = get_equirect_directions(px_buf.shape[1], px_buf.shape[0])
+        rgb = np.ascontiguousarray(px_buf[:, :, 0:3].reshape((-1, 3)), dtype=np.float32)
+        env_buf = (rgb, dirs, solid_angles)
+        entry["env"] = env_buf
+    return env_buf
+
+# Solid angle weighted average color of environment pixels inside the cone around direction (unit vector), with
+# half angle given in radians.
+# Pixels inside any of the exclude cones, list of (direction, half_angle) tuples, are left out of the average.
+# If the cone is smaller than one pixel then the color of the pixel nearest to direction is returned.
+def get_env_cone_mean_color(env_buf, direction, half_angle, exclude_cones=None):
+    rgb, dirs, solid_angles = env_buf
+    cos_dist = dirs @ np.asarray(direction, dtype=np.float32)
+    in_cone = cos_dist >= math.cos(min(half_angle, math.pi))
+    if exclude_cones:
+        for ex_dir, ex_half_angle in exclude_cones:
+            in_cone &= (dirs @ np.asarray(ex_dir, dtype=np.float32)) < math.cos(ex_half_angle)
+    in_idx = np.flatnonzero(in_cone)
+    if len(in_idx) == 0:
+        nearest = int(np.argmax(cos_dist))
+        return (float(rgb[nearest, 0]), float(rgb[nearest, 1]), float(rgb[nearest, 2]))
+    weights = solid_angles[in_idx].astype(np.float64)
+    avg = (weights @ rgb[in_idx]) / weights.sum()
+    return (float(avg[0]), float(avg[1]), float(avg[2]))
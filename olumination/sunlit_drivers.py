@@ -0,0 +1,285 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Bake drivers to F-curves: driven values (e.g. Sunlit blinds thickness and taper, Mobile Background mapping) are
+# sampled over the scene frame range and written as keyframes, and the drivers are removed, so playback and render do
+# not evaluate any driver expressions (Python expressions need auto-run scripts, which may be disabled on a render
+# farm). Each driver is saved as JSON in an ID property of its ID, so Restore Drivers can remove the baked F-curves
+# and add the drivers again.
+
+import json
+import numpy as np
+import bpy
+
+from .sunlit_rig import (is_sunlit_armature, get_indexed_children, is_sunlit_rig_perf_mode,
+    set_sunlit_rig_perf_mode)
+from .sunlit_freeze import is_sunlit_rig_frozen
+from .sunlit_anim import get_id_action, set_fcurve_keyframes
+
+if bpy.app.version < (2,80,0):
+    from .imp_v27 import *
+else:
+    from .imp_v28 import *
+
+# ID property of ID with baked drivers: JSON of drivers, and if the action was created by bake
+SUNLIT_BAKED_DRIVERS_PROP = "sunlit_baked_drivers"
+DRIVER_BAKE_ACTION_APPEND = "DriverBake"
+# driver target ID types, and the bpy.data collections to find target IDs by name when drivers are restored
+DRIVER_TARGET_ID_DATA_ATTRS = { "OBJECT": "objects", "SCENE": "scenes", "WORLD": "worlds", "ARMATURE": "armatures",
+    "MESH": "meshes", "MATERIAL": "materials", "LIGHT": "lights", "LAMP": "lamps", "CAMERA": "cameras",
+    "TEXTURE": "textures", "IMAGE": "images", "NODETREE": "node_groups", "ACTION": "actions", "CURVE": "curves",
+    "COLLECTION": "collections", "GROUP": "groups", "KEY": "shape_keys", "LATTICE": "lattices", "SPEAKER": "speakers",
+    "TEXT": "texts", "GREASEPENCIL": "grease_pencils", "MOVIECLIP": "movieclips", "PARTICLE": "particles",
+    "LIGHT_PROBE": "lightprobes", "VOLUME": "volumes", "FONT": "fonts", "CACHEFILE": "cache_files" }
+DRIVER_TARGET_ATTRS = [ "bone_target", "transform_type", "transform_space", "rotation_mode" ]
+
+# Bake targets are (owner ID, attribute name or None): drivers of object are on the object itself, drivers of world
+# shader nodes are on the world's node tree, which is evaluated as part of the world.
+def get_bake_target_id(owner_id, attr):
+    if attr is None:
+        return owner_id
+    return getattr(owner_id, attr)
+
+def get_id_drivers(id_data):
+    if id_data is None or id_data.animation_data is None:
+        return []
+    return list(id_data.animation_data.drivers)
+
+# Driver F-curves whose data path (and array index) resolves. Drivers of removed or renamed properties are valid in a
+# file, but have no value to sample.
+def is_driver_fcurve_resolvable(id_data, fcurve):
+    try:
+        value = id_data.path_resolve(fcurve.data_path)
+    except ValueError:
+        return False
+    return not hasattr(value, "__len__") or fcurve.array_index < len(value)
+
+# get drivers of ID that can be baked, and list of data paths of drivers that cannot (see is_driver_fcurve_resolvable)
+def get_id_bakeable_drivers(id_data):
+    fcurves = []
+    unresolved_paths = []
+    for fcurve in get_id_drivers(id_data):
+        if is_driver_fcurve_resolvable(id_data, fcurve):
+            fcurves.append(fcurve)
+        else:
+            unresolved_paths.append(id_data.name + ": " + fcurve.data_path + "[" + str(fcurve.array_index) + "]")
+    return fcurves, unresolved_paths
+
+def is_id_drivers_baked(id_data):
+    return id_data.get(SUNLIT_BAKED_DRIVERS_PROP) is not None
+
+def get_driver_target_id(id_type, id_name):
+    data_collection = getattr(bpy.data, DRIVER_TARGET_ID_DATA_ATTRS.get(id_type, ""), None)
+    if data_collection is None:
+        return None
+    return data_collection.get(id_name)
+
+def get_driver_fcurve_data(id_data, fcurve):
+    d = fcurve.driver
+    variables = []
+    for v in d.variables:
+        targets = []
+        for t in v.targets:
+            t_data = { "id_type": t.id_type, "id": t.id.name if t.id is not None else "", "data_path": t.data_path }
+            for attr in DRIVER_TARGET_ATTRS:
+                if hasattr(t, attr):
+                    t_data[attr] = getattr(t, attr)
+            targets.append(t_data)
+        variables.append({ "name": v.name, "type": v.type, "targets": targets })
+    # index must only be given to driver_add for array properties
+    is_array = hasattr(id_data.path_resolve(fcurve.data_path), "__len__")
+    return { "data_path": fcurve.data_path, "index": fcurve.array_index, "is_array": is_array, "type": d.type,
+        "expression": d.expression, "use_self": d.use_self, "variables": variables }
+
+def add_driver_from_data(id_data, drv_data):
+    if drv_data["is_array"]:
+        fcurve = id_data.driver_add(drv_data["data_path"], drv_data["index"])
+    else:
+        fcurve = id_data.driver_add(drv_data["data_path"])
+    d = fcurve.driver
+    d.type = drv_data["type"]
+    d.expression = drv_data["expression"]
+    d.use_self = drv_data["use_self"]
+    for v_data in drv_data["variables"]:
+        v = d.variables.new()
+        v.name = v_data["name"]
+        v.type = v_data["type"]
+        for t, t_data in zip(v.targets, v_data["targets"]):
+            # only single property targets can have an ID type other than object
+            if v.type == "SINGLE_PROP":
+                t.id_type = t_data["id_type"]
+            if t_data["id"] != "":
+                t.id = get_driver_target_id(t_data["id_type"], t_data["id"])
+            t.data_path = t_data["data_path"]
+            for attr in DRIVER_TARGET_ATTRS:
+                if attr in t_data and hasattr(t, attr):
+                    setattr(t, attr, t_data[attr])
+    return fcurve
+
+# Sample driven values of all drivers of all targets, with one frame_set per frame. Returns list (per target) of
+# arrays shaped (num frames, num drivers of target).
+def get_sampled_driver_values(context, bake_targets, frames):
+    scene = context.scene
+    target_fcurves = [ get_id_bakeable_drivers(get_bake_target_id(owner_id, attr))[0]
+        for owner_id, attr in bake_targets ]
+    sampled = [ np.empty((len(frames), len(fcurves)), dtype=np.float32) for fcurves in target_fcurves ]
+    old_frame = scene.frame_current
+    try:
+        for f in range(len(frames)):
+            scene.frame_set(frames[f])
+            depsgraph = get_evaluated_depsgraph(context)
+            for c in range(len(bake_targets)):
+                owner_id, attr = bake_targets[c]
+                eval_id = get_bake_target_id(get_evaluated_id(depsgraph, owner_id), attr)
+                for k, fcurve in enumerate(target_fcurves[c]):
+                    value = eval_id.path_resolve(fcurve.data_path)
+                    if hasattr(value, "__len__"):
+                        value = value[fcurve.array_index]
+                    sampled[c][f, k] = float(value)
+    finally:
+        scene.frame_set(old_frame)
+    return sampled
+
+# Bake drivers of targets to F-curves. A driver with the same value at every frame is baked to one keyframe. Rigs in
+# sl_armatures that are in performance mode are taken out of it while drivers are sampled, because helpers disabled in
+# viewport are not evaluated (and their driven values would not change). Drivers whose data path does not resolve are
+# skipped, and kept as drivers. Returns (number of drivers baked, list of skipped driver paths).
+def bake_drivers(context, bake_targets, sl_armatures):
+    scene = context.scene
+    unresolved_paths = []
+    bakeable_targets = []
+    for owner_id, attr in bake_targets:
+        id_data = get_bake_target_id(owner_id, attr)
+        if is_id_drivers_baked(id_data):
+            continue
+        fcurves, id_unresolved_paths = get_id_bakeable_drivers(id_data)
+        unresolved_paths.extend(id_unresolved_paths)
+        if len(fcurves) > 0:
+            bakeable_targets.append((owner_id, attr))
+    bake_targets = bakeable_targets
+    if len(bake_targets) < 1:
+        return 0, unresolved_paths
+    frames = np.arange(scene.frame_start, max(scene.frame_start, scene.frame_end) + 1)
+    perf_rigs = [ sl_armature for sl_armature in sl_armatures if is_sunlit_rig_perf_mode(sl_armature) ]
+    for sl_armature in perf_rigs:
+        set_sunlit_rig_perf_mode(sl_armature, False)
+    try:
+        sampled = get_sampled_driver_values(context, bake_targets, frames.tolist())
+    finally:
+        for sl_armature in perf_rigs:
+            set_sunlit_rig_perf_mode(sl_armature, True)
+    frames = frames.astype(np.float32)
+    count = 0
+    for c in range(len(bake_targets)):
+        id_data = get_bake_target_id(*bake_targets[c])
+        fcurves = get_id_bakeable_drivers(id_data)[0]
+        drivers_data = [ get_driver_fcurve_data(id_data, fcurve) for fcurve in fcurves ]
+        action_created = id_data.animation_data.action is None
+        for fcurve in fcurves:
+            id_data.animation_data.drivers.remove(fcurve)
+        action = get_id_action(id_data, id_data.name + DRIVER_BAKE_ACTION_APPEND)
+        for k, drv_data in enumerate(drivers_data):
+            values = sampled[c][:, k]
+            if np.all(values == values[0]):
+                set_fcurve_keyframes(action, drv_data["data_path"], drv_data["index"], frames[:1], values[:1])
+            else:
+                set_fcurve_keyframes(action, drv_data["data_path"], drv_data["index"], frames, values)
+        id_data[SUNLIT_BAKED_DRIVERS_PROP] = json.dumps({ "action_created": action_created, "drivers": drivers_data })
+        count = count + len(drivers_data)
+    return count, unresolved_paths
+
+# Remove baked F-curves of targets, and add the drivers again. Returns number of drivers restored.
+def restore_drivers(bake_targets):
+    count = 0
+    for owner_id, attr in bake_targets:
+        id_data = get_bake_target_id(owner_id, attr)
+        if id_data is None or not is_id_drivers_baked(id_data):
+            continue
+        baked = json.loads(id_data[SUNLIT_BAKED_DRIVERS_PROP])
+        action = id_data.animation_data.action if id_data.animation_data is not None else None
+        for drv_data in baked["drivers"]:
+            if action is not None:
+                fcurve = action.fcurves.find(drv_data["data_path"], index=drv_data["index"])
+                if fcurve is not None:
+                    action.fcurves.remove(fcurve)
+            add_driver_from_data(id_data, drv_data)
+        # remove action created by bake, if nothing else was keyframed in it since
+        if action is not None and baked["action_created"] and len(action.fcurves) == 0:
+            id_data.animation_data.action = None
+            if action.users == 0:
+                bpy.data.actions.remove(action)
+        del id_data[SUNLIT_BAKED_DRIVERS_PROP]
+        count = count + len(baked["drivers"])
+    return count
+
+def get_selected_sunlit_armatures(context):
+    return [ ob for ob in context.selected_objects if is_sunlit_armature(ob) ]
+
+# bake targets of Sunlit rigs (armature and rig objects), and of the scene world's shader nodes (e.g. Mobile
+# Background)
+def get_driver_bake_targets(context, sl_armatures):
+    bake_targets = []
+    for sl_armature in sl_armatures:
+        bake_targets.extend([ (rig_ob, None) for rig_ob in [ sl_armature ] + list(get_indexed_children(sl_armature)) ])
+    scn_w = context.scene.world
+    if scn_w is not None and scn_w.node_tree is not None:
+        bake_targets.append((scn_w, "node_tree"))
+    return bake_targets
+
+class OLuminSL_BakeDrivers(bpy.types.Operator):
+    """Bake drivers of selected Sunlit Rigs, and of the world shader (e.g. Mobile Background), to keyframes over """ \
+    """the scene frame range, and remove the drivers. Playback and render then evaluate no driver expressions, """ \
+    """e.g. for render farms with auto-run scripts disabled. Use Restore Drivers to add the drivers again"""
+    bl_idname = "olumin_sl.bake_drivers"
+    bl_label = "Bake Drivers"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        if context.object is not None and context.object.mode != "OBJECT":
+            bpy.ops.object.mode_set(mode="OBJECT")
+        sl_armatures = get_selected_sunlit_armatures(context)
+        # frozen rigs are in an excluded collection, so they are not evaluated at all
+        frozen_rigs = [ sl_armature for sl_armature in sl_armatures if is_sunlit_rig_frozen(sl_armature) ]
+        if len(frozen_rigs) > 0:
+            self.report({'ERROR'}, "Cannot bake drivers of frozen Sunlit Rig " + frozen_rigs[0].name +
+                ", thaw rig and try again.")
+            return {'CANCELLED'}
+        count, unresolved_paths = bake_drivers(context, get_driver_bake_targets(context, sl_armatures), sl_armatures)
+        if len(unresolved_paths) > 0:
+            self.report({'WARNING'}, "Skipped " + str(len(unresolved_paths)) + " drivers with invalid data path: " +
+                ", ".join(unresolved_paths))
+        if count < 1:
+            self.report({'ERROR'}, "No drivers to bake, select one or more Sunlit Rigs and try again.")
+            return {'CANCELLED'}
+        self.report({'INFO'}, "Baked " + str(count) + " drivers to keyframes.")
+        return {'FINISHED'}
+
+class OLuminSL_RestoreDrivers(bpy.types.Operator):
+    """Restore drivers baked by Bake Drivers, of selected Sunlit Rigs and of the world shader. Baked keyframes are """ \
+    """removed"""
+    bl_idname = "olumin_sl.restore_drivers"
+    bl_label = "Restore Drivers"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        count = restore_drivers(get_driver_bake_targets(context, get_selected_sunlit_armatures(context)))
+        if count < 1:
+            self.report({'ERROR'}, "No baked drivers to restore, select one or more Sunlit Rigs and try again.")
+            return {'CANCELLED'}
+        self.report({'INFO'}, "Restored " + str(count) + " drivers.")
+        return {'FINISHED'}
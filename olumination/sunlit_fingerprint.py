@@ -0,0 +1,70 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Fingerprints of bake / sample inputs, for incremental updates of Sunlit suns.
+# A fingerprint is a hash of a nested tuple of plain values (numbers, strings), floats are rounded so that tiny
+# floating point differences do not make a sun "dirty".
+
+import hashlib
+
+FINGERPRINT_FLOAT_DIGITS = 6
+
+def get_fingerprint(values):
+    return hashlib.sha1(repr(values).encode("utf-8")).hexdigest()
+
+def get_plain_value(value):
+    if isinstance(value, float):
+        return round(value, FINGERPRINT_FLOAT_DIGITS)
+    if isinstance(value, (bool, int, str)) or value is None:
+        return value
+    # vectors, colors, arrays
+    try:
+        return tuple(get_plain_value(v) for v in value)
+    except TypeError:
+        return repr(value)
+
+def get_matrix_values(matrix):
+    return tuple(get_plain_value(tuple(row)) for row in matrix)
+
+def get_image_identity_values(img):
+    if img is None:
+        return None
+    return (img.name, img.filepath, img.source, tuple(img.size))
+
+# values of node tree that change the shader's result: nodes' input values and images, and links between nodes
+def get_node_tree_values(node_tree):
+    if node_tree is None:
+        return None
+    node_values = []
+    for node in sorted(node_tree.nodes, key=lambda n: n.name):
+        input_values = []
+        for node_input in node.inputs:
+            if not node_input.is_linked and hasattr(node_input, "default_value"):
+                input_values.append((node_input.identifier, get_plain_value(node_input.default_value)))
+        node_values.append((node.name, node.bl_idname, node.mute, tuple(input_values),
+            get_image_identity_values(getattr(node, "image", None))))
+    link_values = sorted((link.from_node.name, link.from_socket.identifier, link.to_node.name,
+        link.to_socket.identifier) for link in node_tree.links)
+    return (tuple(node_values), tuple(link_values))
+
+def get_world_values(world):
+    if world is None:
+        return None
+    if world.use_nodes:
+        return (world.name, get_node_tree_values(world.node_tree))
+    return (world.name, get_plain_value(world.color))
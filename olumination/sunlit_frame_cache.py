@@ -0,0 +1,146 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# On-disk cache of sun colors sampled from animated environment textures (image sequences, movies), in the add-on's
+# folder of the user config folder. There is one cache file per environment image and image frame, holding the color
+# of each sun sampled from that frame, by sun key (a fingerprint of everything else that changes the sun's color,
+# e.g. sun direction and sample settings). A cache file is only used while the image frame's file is unchanged (same
+# modification time). Packed and generated images have no file to tell whether they changed, and their names are not
+# unique across .blend files, so they are not cached.
+
+import os
+import re
+import json
+import bpy
+
+from .sunlit_fingerprint import get_fingerprint
+
+ENV_FRAME_CACHE_DIR_NAME = "olumination_env_frame_cache"
+ENV_FRAME_CACHE_PREPEND = "env_frame_"
+# change when sun colors are sampled differently, so that old cache files are not used
+ENV_FRAME_CACHE_FORMAT = 1
+
+def get_env_frame_cache_dir(create=False):
+    return bpy.utils.user_resource('CONFIG', path=ENV_FRAME_CACHE_DIR_NAME, create=create)
+
+# Get frame number of image used at scene frame, for image user of image sequence or movie, same as Blender (frame
+# start, offset, duration and cyclic of image user).
+def get_image_user_frame(image_user, frame):
+    num_frames = image_user.frame_duration
+    if num_frames < 1:
+        return 0
+    frame = frame - image_user.frame_start + 1
+    if image_user.use_cyclic:
+        frame = frame % num_frames
+        if frame == 0:
+            frame = num_frames
+    frame = min(max(frame, 0), num_frames)
+    return frame + image_user.frame_offset
+
+# get file path of frame of image sequence, by replacing the last number in the file name with the frame number,
+# padded to the same number of digits
+def get_sequence_frame_filepath(filepath, image_frame):
+    head, tail = os.path.split(filepath)
+    num_match = re.search(r"(\d+)(\D*)$", tail)
+    if num_match is None:
+        return filepath
+    return os.path.join(head, tail[:num_match.start(1)] + str(image_frame).zfill(len(num_match.group(1))) +
+        num_match.group(2))
+
+# Get (image path, image frame, frame file path) of image of Environment Texture node at scene frame. Frame file path
+# is the file of the image sequence's frame, or the movie file. If there is no node then each scene frame is its own
+# image frame. Image path is None for packed and generated images, which cannot be cached.
+def get_env_frame_source(env_node, frame):
+    if env_node is None:
+        return ("", frame, None)
+    img = env_node.image
+    if img.packed_file is not None or img.source == "GENERATED" or img.filepath == "":
+        return (None, 0, None)
+    filepath = bpy.path.abspath(img.filepath, library=img.library)
+    if img.source == "SEQUENCE":
+        image_frame = get_image_user_frame(env_node.image_user, frame)
+        return (filepath, image_frame, get_sequence_frame_filepath(filepath, image_frame))
+    if img.source == "MOVIE":
+        return (filepath, get_image_user_frame(env_node.image_user, frame), filepath)
+    return (filepath, 0, filepath)
+
+def get_frame_file_mtime(frame_filepath):
+    if frame_filepath is None or not os.path.isfile(frame_filepath):
+        return None
+    return os.path.getmtime(frame_filepath)
+
+def get_env_frame_cache_filepath(image_path, image_frame):
+    key = get_fingerprint((ENV_FRAME_CACHE_FORMAT, image_path, image_frame))
+    return os.path.join(get_env_frame_cache_dir(), ENV_FRAME_CACHE_PREPEND + key[:16] + ".json")
+
+# Get dict of sun key -> color cached for image frame, empty if there is no cache file or the frame's file changed
+# since the cache file was written.
+def load_env_frame_cache(image_path, image_frame, frame_filepath):
+    try:
+        with open(get_env_frame_cache_filepath(image_path, image_frame), "r") as cache_file:
+            frame_cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+    if frame_cache.get("image") != image_path or frame_cache.get("frame") != image_frame or \
+            frame_cache.get("mtime") != get_frame_file_mtime(frame_filepath):
+        return {}
+    return dict([ (sun_key, tuple(color)) for sun_key, color in frame_cache.get("suns", {}).items() ])
+
+# Write colors of image frame (dict of sun key -> color) to cache file. File is written under a temporary name first,
+# so a partly written file is never loaded. Returns True if written.
+def write_env_frame_cache(image_path, image_frame, frame_filepath, sun_colors):
+    filepath = get_env_frame_cache_filepath(image_path, image_frame)
+    tmp_filepath = filepath + ".tmp"
+    frame_cache = { "image": image_path, "frame": image_frame, "mtime": get_frame_file_mtime(frame_filepath),
+        "suns": dict([ (sun_key, list(color)) for sun_key, color in sun_colors.items() ]) }
+    try:
+        get_env_frame_cache_dir(True)
+        with open(tmp_filepath, "w") as cache_file:
+            json.dump(frame_cache, cache_file)
+        os.replace(tmp_filepath, filepath)
+    except OSError as e:
+        print("Unable to write Sunlit environment frame cache file " + filepath + ", error: " + str(e))
+        return False
+    return True
+
+def clear_env_frame_cache():
+    cache_dir = get_env_frame_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return 0
+    count = 0
+    for filename in os.listdir(cache_dir):
+        if filename.startswith(ENV_FRAME_CACHE_PREPEND) and filename.endswith(".json"):
+            os.remove(os.path.join(cache_dir, filename))
+            count = count + 1
+    return count
+
+class OLuminSL_ClearEnvFrameCache(bpy.types.Operator):
+    """Delete all cached sun colors of animated environment textures. Colors are cached per image frame by Set Rig """ \
+    """Sun Color Animated, and are used again while the image frame and the sun are unchanged"""
+    bl_idname = "olumin_sl.clear_env_frame_cache"
+    bl_label = "Clear Animated Color Cache"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        try:
+            count = clear_env_frame_cache()
+        except OSError as e:
+            self.report({'ERROR'}, "Unable to delete Sunlit environment frame cache files, error: " + str(e))
+            return {'CANCELLED'}
+        self.report({'INFO'}, "Deleted " + str(count) + " Sunlit environment frame cache files.")
+        return {'FINISHED'}
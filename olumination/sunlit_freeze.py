@@ -0,0 +1,230 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Freeze Sunlit rigs for rendering: each sun of a rig is replaced by a plain light object with no parent, using the
+# same light data (so sun colors and angles, and their animation, are kept), with the sun's world transform baked to
+# it (sampled over the scene frame range if the rig is animated). All objects of the rig (armature, suns, sensors,
+# blinds, etc.) are moved to a collection that is excluded from the scene's view layers, so none of them are
+# evaluated. Thaw moves rig objects back to their collections, and removes the frozen lights.
+
+import numpy as np
+import bpy
+
+from .sunlit_rig import (SUNLIT_RIG_ID_PROP, SUNLIT_ROLE_SUN, SUNLIT_ROLE_ODISK_SUN, is_sunlit_armature,
+    get_sunlit_rig_objects, get_indexed_children, tag_sunlit_rig)
+from .sunlit_anim import get_id_action, set_fcurve_array_keyframes
+
+if bpy.app.version < (2,80,0):
+    from .imp_v27 import *
+else:
+    from .imp_v28 import *
+
+SUNLIT_FROZEN_COLLECTION_PREPEND = "SunlitFrozen_"
+# ID property of armature: name of collection with frozen rig's objects
+SUNLIT_FROZEN_COLLECTION_PROP = "sunlit_frozen_collection"
+# ID property of frozen rig's objects: names of collections the object was in, "" is the scene's collection
+SUNLIT_THAW_COLLECTIONS_PROP = "sunlit_thaw_collections"
+# ID property of frozen light: rig ID of the rig it was frozen from
+SUNLIT_FROZEN_RIG_PROP = "sunlit_frozen_rig_id"
+SUNLIT_FROZEN_LIGHT_PREPEND = "Frozen"
+
+def is_sunlit_rig_frozen(sl_armature):
+    return sl_armature.get(SUNLIT_FROZEN_COLLECTION_PROP) is not None
+
+# rig is animated if the armature, its parents, or its suns have animation data (action, or drivers)
+def is_sunlit_rig_animated(sl_armature, sun_list):
+    ob = sl_armature
+    while ob is not None:
+        if ob.animation_data is not None:
+            return True
+        ob = ob.parent
+    for sun in sun_list:
+        if sun.animation_data is not None:
+            return True
+    return False
+
+# get world matrices of objects at each frame, returns list (per frame) of lists (per object) of matrices
+def get_sampled_world_matrices(scene, obj_list, frames):
+    old_frame = scene.frame_current
+    sampled = []
+    for frame in frames:
+        scene.frame_set(frame)
+        sampled.append([ ob.matrix_world.copy() for ob in obj_list ])
+    scene.frame_set(old_frame)
+    return sampled
+
+# write sampled world matrices as location / rotation / scale F-curves of frozen light, Euler rotations are kept
+# continuous from frame to frame
+def set_frozen_light_transform_keyframes(frozen_light, frames, matrices):
+    locations = []
+    rotations = []
+    scales = []
+    prev_euler = None
+    for mat in matrices:
+        loc, rot, scale = mat.decompose()
+        if prev_euler is None:
+            euler = rot.to_euler("XYZ")
+        else:
+            euler = rot.to_euler("XYZ", prev_euler)
+        prev_euler = euler
+        locations.append(loc[:])
+        rotations.append(euler[:])
+        scales.append(scale[:])
+    action = get_id_action(frozen_light, frozen_light.name + "Action")
+    frames = np.array(frames, dtype=np.float32)
+    set_fcurve_array_keyframes(action, "location", frames, locations, group_name="Object Transforms")
+    set_fcurve_array_keyframes(action, "rotation_euler", frames, rotations, group_name="Object Transforms")
+    set_fcurve_array_keyframes(action, "scale", frames, scales, group_name="Object Transforms")
+
+def get_collection_by_key(scene, coll_key):
+    if coll_key == "":
+        return scene.collection
+    return bpy.data.collections.get(coll_key)
+
+def get_collection_key(scene, collection):
+    if collection == scene.collection:
+        return ""
+    return collection.name
+
+def find_layer_collection(layer_coll, collection):
+    if layer_coll.collection == collection:
+        return layer_coll
+    for child in layer_coll.children:
+        found = find_layer_collection(child, collection)
+        if found is not None:
+            return found
+    return None
+
+def set_collection_exclude(scene, collection, exclude):
+    for view_layer in scene.view_layers:
+        layer_coll = find_layer_collection(view_layer.layer_collection, collection)
+        if layer_coll is not None:
+            layer_coll.exclude = exclude
+
+# Freeze rig, returns list of frozen lights.
+def freeze_sunlit_rig(context, sl_armature):
+    scene = context.scene
+    rig_id = tag_sunlit_rig(sl_armature)
+    sun_list = get_sunlit_rig_objects(sl_armature, SUNLIT_ROLE_SUN) + \
+        get_sunlit_rig_objects(sl_armature, SUNLIT_ROLE_ODISK_SUN)
+    # frozen lights go in the (first) collection of the armature
+    light_collection = sl_armature.users_collection[0] if len(sl_armature.users_collection) > 0 else \
+        scene.collection
+
+    frozen_lights = []
+    for sun in sun_list:
+        frozen_light = bpy.data.objects.new(SUNLIT_FROZEN_LIGHT_PREPEND + sun.name, sun.data)
+        frozen_light.matrix_world = sun.matrix_world
+        frozen_light.hide_render = sun.hide_render
+        frozen_light[SUNLIT_FROZEN_RIG_PROP] = rig_id
+        frozen_lights.append(frozen_light)
+    if is_sunlit_rig_animated(sl_armature, sun_list) and scene.frame_end > scene.frame_start:
+        frames = list(range(scene.frame_start, scene.frame_end + 1))
+        sampled = get_sampled_world_matrices(scene, sun_list, frames)
+        for c in range(len(frozen_lights)):
+            set_frozen_light_transform_keyframes(frozen_lights[c], frames, [ mats[c] for mats in sampled ])
+    for frozen_light in frozen_lights:
+        light_collection.objects.link(frozen_light)
+
+    # move all rig objects to excluded collection
+    frozen_coll = bpy.data.collections.new(SUNLIT_FROZEN_COLLECTION_PREPEND + sl_armature.name)
+    scene.collection.children.link(frozen_coll)
+    for ob in [ sl_armature ] + list(get_indexed_children(sl_armature)):
+        ob[SUNLIT_THAW_COLLECTIONS_PROP] = [ get_collection_key(scene, coll) for coll in ob.users_collection ]
+        frozen_coll.objects.link(ob)
+        for coll in list(ob.users_collection):
+            if coll != frozen_coll:
+                coll.objects.unlink(ob)
+    set_collection_exclude(scene, frozen_coll, True)
+    sl_armature[SUNLIT_FROZEN_COLLECTION_PROP] = frozen_coll.name
+    return frozen_lights
+
+def thaw_sunlit_rig(context, sl_armature):
+    scene = context.scene
+    frozen_coll = bpy.data.collections.get(sl_armature.get(SUNLIT_FROZEN_COLLECTION_PROP, ""))
+    rig_id = sl_armature.get(SUNLIT_RIG_ID_PROP)
+    if frozen_coll is not None:
+        for ob in list(frozen_coll.objects):
+            for coll_key in ob.get(SUNLIT_THAW_COLLECTIONS_PROP, [ "" ]):
+                coll = get_collection_by_key(scene, coll_key)
+                if coll is not None and ob.name not in coll.objects:
+                    coll.objects.link(ob)
+            # object in no other collection is kept in scene
+            if len(ob.users_collection) < 2:
+                scene.collection.objects.link(ob)
+            frozen_coll.objects.unlink(ob)
+            if SUNLIT_THAW_COLLECTIONS_PROP in ob:
+                del ob[SUNLIT_THAW_COLLECTIONS_PROP]
+        bpy.data.collections.remove(frozen_coll)
+    del sl_armature[SUNLIT_FROZEN_COLLECTION_PROP]
+    # remove frozen lights and their transform actions, light data is still used by rig suns
+    for ob in list(bpy.data.objects):
+        if rig_id is None or ob.get(SUNLIT_FROZEN_RIG_PROP) != rig_id:
+            continue
+        action = ob.animation_data.action if ob.animation_data is not None else None
+        bpy.data.objects.remove(ob)
+        if action is not None and action.users == 0:
+            bpy.data.actions.remove(action)
+
+# get frozen rig armatures of selected frozen lights
+def get_frozen_rigs_from_selected(context):
+    rig_ids = set([ ob.get(SUNLIT_FROZEN_RIG_PROP) for ob in context.selected_objects
+        if ob.get(SUNLIT_FROZEN_RIG_PROP) is not None ])
+    return [ ob for ob in bpy.data.objects if ob.get(SUNLIT_RIG_ID_PROP) in rig_ids and is_sunlit_armature(ob) and
+        is_sunlit_rig_frozen(ob) ]
+
+class OLuminSL_FreezeRigs(bpy.types.Operator):
+    """Freeze selected Sunlit Rigs for rendering. Each sun is replaced by a plain light, with the sun's world """ \
+    """transform baked to it (over the scene frame range, if the rig is animated), and all rig objects are moved """ \
+    """to a collection excluded from view layers, so they are not evaluated. Use Thaw Rigs to restore"""
+    bl_idname = "olumin_sl.freeze_rigs"
+    bl_label = "Freeze Rigs"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        if bpy.app.version < (2,80,0):
+            self.report({'ERROR'}, "Freeze Rigs not supported in Blender 2.79.")
+            return {'CANCELLED'}
+        rigs = [ ob for ob in context.selected_objects if is_sunlit_armature(ob) and not is_sunlit_rig_frozen(ob) ]
+        if len(rigs) < 1:
+            self.report({'ERROR'}, "Select one or more Sunlit Rigs and try again.")
+            return {'CANCELLED'}
+        if context.object is not None and context.object.mode != "OBJECT":
+            bpy.ops.object.mode_set(mode="OBJECT")
+        num_lights = 0
+        for sl_armature in rigs:
+            num_lights = num_lights + len(freeze_sunlit_rig(context, sl_armature))
+        self.report({'INFO'}, "Froze " + str(len(rigs)) + " Sunlit Rigs to " + str(num_lights) + " lights.")
+        return {'FINISHED'}
+
+class OLuminSL_ThawRigs(bpy.types.Operator):
+    """Thaw frozen Sunlit Rigs of selected frozen lights: rig objects are moved back to their collections, and """ \
+    """frozen lights are removed"""
+    bl_idname = "olumin_sl.thaw_rigs"
+    bl_label = "Thaw Rigs"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        rigs = get_frozen_rigs_from_selected(context)
+        if len(rigs) < 1:
+            self.report({'ERROR'}, "Select one or more frozen Sunlit lights and try again.")
+            return {'CANCELLED'}
+        for sl_armature in rigs:
+            thaw_sunlit_rig(context, sl_armature)
+        self.report({'INFO'}, "Thawed " + str(len(rigs)) + " Sunlit Rigs.")
+        return {'FINISHED'}
@@ -0,0 +1,165 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Index of parent -> children objects, and armature -> bone -> "bone parented" children objects, built with one pass
+# over bpy.data.objects and kept until objects change, so rig helpers do not scan all objects of the blend file on
+# every call. Objects tagged with Sunlit rig ID properties (rig ID, role, index) are indexed by their tags in the same
+# pass, and tagged bones are indexed per armature when first needed.
+# Index is dropped by depsgraph updates of objects, and by load / undo / redo (object references are not valid after
+# those). Operators that add or remove objects and then use the index before the next depsgraph update are covered
+# by checking the number of objects, and any object that has gone invalid makes the index rebuild.
+
+import bpy
+from bpy.app.handlers import persistent
+
+# ID properties of objects and bones generated by Sunlit rigs
+SUNLIT_RIG_ID_PROP = "sunlit_rig_id"
+SUNLIT_ROLE_PROP = "sunlit_role"
+SUNLIT_INDEX_PROP = "sunlit_index"
+
+# index is a tuple of (number of objects when built, dict of parent pointer -> list of children,
+# dict of (parent pointer, bone name) -> list of bone parented children, dict of (rig ID, role) and
+# (rig ID, role, index) -> list of tagged objects, dict of role -> list of tagged objects of all rigs), or None if not
+# built
+object_children_index = None
+# dict of armature data pointer -> dict of (role, index) -> bone name, for tagged bones
+bone_tag_index = {}
+
+def build_object_children_index():
+    children = {}
+    bone_children = {}
+    tagged = {}
+    role_tagged = {}
+    for ob in bpy.data.objects:
+        rig_id = ob.get(SUNLIT_RIG_ID_PROP)
+        if rig_id is not None:
+            role = ob.get(SUNLIT_ROLE_PROP)
+            tagged.setdefault((rig_id, role), []).append(ob)
+            role_tagged.setdefault(role, []).append(ob)
+            tagged.setdefault((rig_id, role, ob.get(SUNLIT_INDEX_PROP, 0)), []).append(ob)
+        if ob.parent is None:
+            continue
+        parent_key = ob.parent.as_pointer()
+        children.setdefault(parent_key, []).append(ob)
+        if ob.parent_type == "BONE" and ob.parent_bone != "":
+            bone_children.setdefault((parent_key, ob.parent_bone), []).append(ob)
+    # objects of a role are in rig order, like the bones they are parented to
+    for key, obj_list in tagged.items():
+        if len(key) == 2:
+            obj_list.sort(key=lambda ob: ob.get(SUNLIT_INDEX_PROP, 0))
+    return (len(bpy.data.objects), children, bone_children, tagged, role_tagged)
+
+def is_object_list_valid(obj_list):
+    try:
+        for ob in obj_list:
+            ob.name
+    except ReferenceError:
+        return False
+    return True
+
+def get_object_children_index():
+    global object_children_index
+    if object_children_index is None or object_children_index[0] != len(bpy.data.objects):
+        object_children_index = build_object_children_index()
+    return object_children_index
+
+# get list of objects (in bpy.data.objects order) parented to obj, or bone parented to obj's bone if bone_name is given
+def get_indexed_children(obj, bone_name=None):
+    global object_children_index
+    for attempt in range(2):
+        children, bone_children = get_object_children_index()[1:3]
+        if bone_name is None:
+            obj_list = children.get(obj.as_pointer(), [])
+        else:
+            obj_list = bone_children.get((obj.as_pointer(), bone_name), [])
+        if is_object_list_valid(obj_list):
+            return obj_list
+        object_children_index = None
+    return []
+
+# get list of objects tagged with rig ID and role (in order of index), or with rig ID, role and index
+def get_tagged_objects(rig_id, role, index=None):
+    global object_children_index
+    key = (rig_id, role) if index is None else (rig_id, role, index)
+    for attempt in range(2):
+        obj_list = get_object_children_index()[3].get(key, [])
+        if is_object_list_valid(obj_list):
+            return obj_list
+        object_children_index = None
+    return []
+
+# get list of objects tagged with role, of all rigs
+def get_tagged_role_objects(role):
+    global object_children_index
+    for attempt in range(2):
+        obj_list = get_object_children_index()[4].get(role, [])
+        if is_object_list_valid(obj_list):
+            return obj_list
+        object_children_index = None
+    return []
+
+# get dict of (role, index) -> bone name, for tagged bones of armature
+def get_tagged_bone_names(armature):
+    key = armature.data.as_pointer()
+    bone_names = bone_tag_index.get(key)
+    if bone_names is None:
+        bone_names = {}
+        for bone in armature.data.bones:
+            role = bone.get(SUNLIT_ROLE_PROP)
+            if role is not None:
+                bone_names[(role, bone.get(SUNLIT_INDEX_PROP, 0))] = bone.name
+        bone_tag_index[key] = bone_names
+    return bone_names
+
+def invalidate_object_children_index():
+    global object_children_index
+    object_children_index = None
+    bone_tag_index.clear()
+
+@persistent
+def object_children_index_depsgraph_update_handler(scene, depsgraph=None):
+    if object_children_index is None and len(bone_tag_index) == 0:
+        return
+    # Blender 2.79 scene update handler has no depsgraph, so index is dropped on every scene update
+    if depsgraph is None or depsgraph.id_type_updated('OBJECT') or depsgraph.id_type_updated('ARMATURE'):
+        invalidate_object_children_index()
+
+@persistent
+def object_children_index_clear_handler(*args):
+    invalidate_object_children_index()
+
+OBJECT_CHILDREN_INDEX_HANDLERS = [
+    ("depsgraph_update_post", object_children_index_depsgraph_update_handler),
+    ("scene_update_post", object_children_index_depsgraph_update_handler),
+    ("load_post", object_children_index_clear_handler),
+    ("undo_post", object_children_index_clear_handler),
+    ("redo_post", object_children_index_clear_handler),
+]
+
+def register_object_children_index_handlers():
+    for handler_list_name, handler in OBJECT_CHILDREN_INDEX_HANDLERS:
+        handler_list = getattr(bpy.app.handlers, handler_list_name, None)
+        if handler_list is not None and handler not in handler_list:
+            handler_list.append(handler)
+
+def unregister_object_children_index_handlers():
+    invalidate_object_children_index()
+    for handler_list_name, handler in OBJECT_CHILDREN_INDEX_HANDLERS:
+        handler_list = getattr(bpy.app.handlers, handler_list_name, None)
+        if handler_list is not None and handler in handler_list:
+            handler_list.remove(handler)
@@ -0,0 +1,98 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Viewport performance mode of objects, e.g. Sunlit rig helpers (blinds, diff cubes, base sphere), which are only
+# needed when angular diameters are computed: modifiers of the object are not shown in viewport, and the object is
+# disabled in viewport so that viewport depsgraph does not evaluate it. Previous state of each object is saved in an
+# ID property, so it is restored exactly when performance mode is turned off.
+# Also frames per second measurement of scene evaluation and of animation playback, to compare with and without
+# performance mode.
+
+import time
+import bpy
+
+if bpy.app.version < (2,80,0):
+    from .imp_v27 import *
+else:
+    from .imp_v28 import *
+
+SUNLIT_PERF_STATE_PROP = "sunlit_perf_state"
+
+def is_object_perf_mode(ob):
+    return ob.get(SUNLIT_PERF_STATE_PROP) is not None
+
+def set_object_perf_mode(ob, enabled):
+    if enabled:
+        if is_object_perf_mode(ob):
+            return
+        ob[SUNLIT_PERF_STATE_PROP] = {
+            "disable_view": int(get_object_disable_view(ob)),
+            "modifiers": dict([ (mod.name, int(mod.show_viewport)) for mod in ob.modifiers ]),
+        }
+        for mod in ob.modifiers:
+            mod.show_viewport = False
+        set_object_disable_view(ob, True)
+    else:
+        perf_state = ob.get(SUNLIT_PERF_STATE_PROP)
+        if perf_state is None:
+            return
+        mod_states = perf_state.get("modifiers", {})
+        for mod in ob.modifiers:
+            if mod.name in mod_states:
+                mod.show_viewport = bool(mod_states[mod.name])
+        set_object_disable_view(ob, bool(perf_state.get("disable_view", 0)))
+        del ob[SUNLIT_PERF_STATE_PROP]
+
+def set_object_list_perf_mode(obj_list, enabled):
+    for ob in obj_list:
+        set_object_perf_mode(ob, enabled)
+
+# Frames per second of scene evaluation, stepping through num_frames frames after the current frame (viewport drawing
+# is not included). Current frame is restored after.
+def measure_scene_frame_fps(scene, num_frames):
+    start_frame = scene.frame_current
+    start_time = time.perf_counter()
+    for f in range(num_frames):
+        scene.frame_set(start_frame + f + 1)
+    elapsed = time.perf_counter() - start_time
+    scene.frame_set(start_frame)
+    if elapsed <= 0:
+        return 0.0
+    return num_frames / elapsed
+
+# start time and number of frames of current animation playback, start time is None if not playing
+playback_fps_state = { "start_time": None, "frames": 0 }
+
+def start_playback_fps():
+    playback_fps_state["start_time"] = time.perf_counter()
+    playback_fps_state["frames"] = 0
+
+def add_playback_fps_frame():
+    if playback_fps_state["start_time"] is not None:
+        playback_fps_state["frames"] += 1
+
+# get average frames per second of playback since start_playback_fps, or None if no frames were played
+def stop_playback_fps():
+    start_time = playback_fps_state["start_time"]
+    playback_fps_state["start_time"] = None
+    if start_time is None or playback_fps_state["frames"] < 1:
+        return None
+    elapsed = time.perf_counter() - start_time
+    if elapsed <= 0:
+        return None
+    return playback_fps_state["frames"] / elapsed
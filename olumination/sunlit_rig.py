@@ -17,16 +17,42 @@
 # ##### END GPL LICENSE BLOCK #####
 
 import math
+import os
+import time
+import uuid
+import numpy as np
 from mathutils import Vector
 import bpy
 import bmesh
+from bpy.app.handlers import persistent
 
 if bpy.app.version < (2,80,0):
     from .imp_v27 import *
 else:
     from .imp_v28 import *
+from .sunlit_sample import (get_image_sample_color, invalidate_image_cache, denoise_image_bilateral,
+    get_mesh_color_attribute_buffer, get_mesh_attribute_sample_color, get_image_tiles_mean_colors,
+    get_cached_image_pixels, set_image_pixel_buffer, get_tile_pixels)
+from .sunlit_atlas import (SUNLIT_ATLAS_TILE_PADDING, get_sensor_atlas_tile, set_sensor_atlas_tile,
+    get_atlas_tile_layout, build_atlas_pixels, set_mesh_uv_atlas_tile)
+from .sunlit_angle import get_max_pairwise_angle
+from .sunlit_index import (SUNLIT_RIG_ID_PROP, SUNLIT_ROLE_PROP, SUNLIT_INDEX_PROP, get_indexed_children,
+    get_tagged_objects, get_tagged_role_objects, get_tagged_bone_names, invalidate_object_children_index)
+from .sunlit_build import (get_rotated_x_verts, get_plane_pydata, get_cube_pydata, get_circle_pydata,
+    get_cone_pydata, get_icosphere_pydata, create_pydata_mesh, create_pydata_object, create_mesh_object,
+    create_light_object, create_camera_object)
+from .sunlit_perf import (is_object_perf_mode, set_object_list_perf_mode, measure_scene_frame_fps,
+    start_playback_fps, add_playback_fps_frame, stop_playback_fps)
+from .sunlit_template import (get_rig_template_filepath, write_rig_template, load_rig_template,
+    remap_shared_template_ids)
+from .sunlit_voronoi import (get_spherical_voronoi_cells, get_cell_wall_pydata)
+from .sunlit_fingerprint import (get_fingerprint, get_plain_value, get_matrix_values, get_world_values)
+from .sunlit_direct import (get_world_environment_image, get_env_sample_buffer, get_env_cone_mean_color)
+from .sunlit_anim import (get_id_action, set_fcurve_keyframes, set_fcurve_array_keyframes, compact_fcurve_keyframes)
 
 SUNLIT_FIX_DIFF_CUBE_LOC = (0, -0.3, 0)
+# light data F-curves of sun color and angular diameter, compacted by Compact Sun Keyframes
+SUNLIT_COMPACT_DATA_PATHS = [ "color", "angle" ]
 
 SUNLIT_NAME_PREPEND = "Sunlit"
 SUNLIT_BASE_SPHERE_PREPEND = SUNLIT_NAME_PREPEND + "BaseSphere"
@@ -55,6 +81,21 @@ SUNLIT_WGT_TRI_VERTS = [
     (1, 0, -0.6660254),
     (0, 0, 1.0660254),
 ]
+# widgets are shared by all Sunlit rigs, in one hidden collection
+SUNLIT_WGT_COLLECTION_NAME = "SunlitWidgets"
+# ID property of shared widget object: kind of widget (one of SUNLIT_WGT_NAMES), so widgets are found by kind and not
+# by object name
+SUNLIT_WGT_KIND_PROP = "sunlit_widget_kind"
+SUNLIT_WGT_NAMES = [ SUNLIT_WGT_CUBE_NAME, SUNLIT_WGT_TRI_NAME, SUNLIT_WGT_PLANE_NAME, SUNLIT_WGT_CONE_NAME,
+    SUNLIT_WGT_CIRCLE_NAME ]
+
+# meshes shared by Sunlit rig objects of the same shape (linked duplicates), in all rigs
+SUNLIT_MESH_PREPEND = "SL_MESH_"
+SUNLIT_MESH_SENSOR_NAME = SUNLIT_MESH_PREPEND + "sensor"
+SUNLIT_MESH_BLINDS_PLANE_NAME = SUNLIT_MESH_PREPEND + "blinds_plane"
+SUNLIT_MESH_DIFF_CUBE_NAME = SUNLIT_MESH_PREPEND + "diff_cube"
+SUNLIT_MESH_ODISK_NAME = SUNLIT_MESH_PREPEND + "odisk"
+SUNLIT_MESH_ODISK_BLINDS_NAME = SUNLIT_MESH_PREPEND + "odisk_blinds"
 
 SUNLIT_BONE_SPHERE = "base_sphere"
 SUNLIT_BONE_HT_SPHERE = [
@@ -122,6 +163,34 @@ SUNLIT_BONE_ALL_NAMES = [
 ]
 SUNLIT_BONE_MATCH_MIN = 3
 
+# roles of objects generated by Sunlit rigs, stored as ID property of each object (see sunlit_index.py)
+SUNLIT_ROLE_ARMATURE = "ARMATURE"
+SUNLIT_ROLE_BASE_SPHERE = "BASE_SPHERE"
+SUNLIT_ROLE_DIFF_CUBE = "DIFF_CUBE"
+SUNLIT_ROLE_SUN_BLINDS = "SUN_BLINDS"
+SUNLIT_ROLE_SENSOR = "SENSOR"
+SUNLIT_ROLE_SUN = "SUN"
+SUNLIT_ROLE_ODISK_SENSOR = "ODISK_SENSOR"
+SUNLIT_ROLE_ODISK_BLINDS = "ODISK_BLINDS"
+SUNLIT_ROLE_ODISK_SUN = "ODISK_SUN"
+SUNLIT_ROLE_CAMERA = "CAMERA"
+SUNLIT_ROLE_WIDGET = "WIDGET"
+SUNLIT_ROLE_SHARED_MESH = "SHARED_MESH"
+# Object role: (parent bone name prepend, object name prepend), to find objects of rigs created before ID property
+# tags (legacy rigs), and to tag them. Parent bone name prepend is None for objects parented to the armature object.
+SUNLIT_OBJECT_ROLES = {
+    SUNLIT_ROLE_BASE_SPHERE: (SUNLIT_BONE_SPHERE, SUNLIT_BASE_SPHERE_PREPEND),
+    SUNLIT_ROLE_DIFF_CUBE: (SUNLIT_BONE_DIFF_CUBE, SUNLIT_DCUBE_PREPEND),
+    SUNLIT_ROLE_SUN_BLINDS: (SUNLIT_BONE_DIFF_CUBE, SUNLIT_SUN_BLINDS_PREPEND),
+    SUNLIT_ROLE_SENSOR: (SUNLIT_BONE_SENSOR, SUNLIT_SENSOR_PLANE_PREPEND),
+    SUNLIT_ROLE_SUN: (SUNLIT_BONE_LIT_ADJUST, SUNLIT_SUN_PREPEND),
+    SUNLIT_ROLE_ODISK_SENSOR: (SUNLIT_BONE_ODISK, SUNLIT_ODISK_PREPEND),
+    SUNLIT_ROLE_ODISK_BLINDS: (SUNLIT_BONE_ODISK, SUNLIT_ODISK_BLINDS_PREPEND),
+    SUNLIT_ROLE_ODISK_SUN: (SUNLIT_BONE_ODISK_LIGHT, SUNLIT_ODISK_SUN_PREPEND),
+    SUNLIT_ROLE_CAMERA: (None, SUNLIT_CAMERA_PREPEND),
+    SUNLIT_ROLE_WIDGET: (None, SUNLIT_WGT_PREPEND),
+}
+
 SUNLIT_BASE_SPHERE_OFFSET = (0, -0.5, 0)
 SUNLIT_DIFF_CUBE_OFFSET = (0, 0.5, 0)
 SUNLIT_SUN_BLINDS_PLANE_OFFSET = (0, -0.5, 0)
@@ -241,6 +310,18 @@ SUNLIT_ODISK_POINT_AT_RADIUS = 3.0
 SUNLIT_BLINDS_MAT_NAME = "SunlitBlindsMat"
 SUNLIT_BAKE_MAT_NAME = "SunlitBakeMat"
 SUNLIT_BAKE_IMG_NAME = "SunlitBakeImage"
+SUNLIT_SENSOR_ATTR_NAME = "SunlitSensorColor"
+SUNLIT_ATLAS_IMG_NAME = SUNLIT_BAKE_IMG_NAME + "Atlas"
+SUNLIT_ATLAS_MAT_NAME = "SunlitBakeAtlasMat"
+# ID properties for incremental bake / sample, on sensor objects and light objects
+SUNLIT_BAKE_FINGERPRINT_PROP = "sunlit_bake_fingerprint"
+SUNLIT_BAKE_SERIAL_PROP = "sunlit_bake_serial"
+SUNLIT_COLOR_FINGERPRINT_PROP = "sunlit_color_fingerprint"
+# ID properties of Sunlit armature, for rigs with Voronoi blinds
+SUNLIT_BLINDS_MODE_PROP = "sunlit_blinds_mode"
+SUNLIT_BLINDS_LEN_PROP = "sunlit_blinds_len"
+# Voronoi blinds walls start at this distance from rig center
+SUNLIT_VORONOI_INNER_RADIUS = 0.5
 
 def set_object_hide_render(ob, hide_state):
     ob.hide_render = hide_state
@@ -258,16 +339,21 @@ def any_prepend_name_num(prepend_name, num):
     else:
         return prepend_name + '.' + str(num).zfill(3)
 
-def obj_prepend_name_num(prepend_name, num):
-    # test to find un-used prepend_name, within list of all objects' names
-    for test_num in range(num, 999):
+# Get names for count new objects: prepend_name with the lowest un-used numbers (e.g. "SunlitSensor.002",
+# "SunlitSensor.003"), testing against one set of all objects' names.
+def reserve_object_names(prepend_name, count):
+    used_names = set([ ob.name for ob in bpy.data.objects if ob.name.startswith(prepend_name) ])
+    obj_names = []
+    for test_num in range(0, 999):
+        if len(obj_names) >= count:
+            break
         test_obj_name = any_prepend_name_num(prepend_name, test_num)
-        # if prepend_name not in the list then return the test_obj_name
-        if bpy.data.objects.get(test_obj_name) is None:
-            return test_obj_name
-
-    # if no suitable prepend_name found after testing, then just return the string from the first attempt
-    return any_prepend_name_num(prepend_name, num)
+        if test_obj_name not in used_names:
+            obj_names.append(test_obj_name)
+    # if no un-used names are left, then Blender will add its own numbers to the names
+    while len(obj_names) < count:
+        obj_names.append(prepend_name)
+    return obj_names
 
 def get_num_from_name(name_str):
     length = len(name_str)
@@ -277,36 +363,127 @@ def get_num_from_name(name_str):
             return int(possible_digits)
     return 0
 
-# search all objects, by way of "bpy.data.objects", to get list of objects parented to obj
+# get list of objects parented to obj, by way of object children index (see sunlit_index.py)
 def get_objects_parented_to(obj, obj_name_prepend):
-    found_obj_list = []
-    for test_obj in bpy.data.objects:
-        if test_obj.name.startswith(obj_name_prepend) and test_obj.parent == obj:
-            found_obj_list.append(test_obj)
-    return found_obj_list
+    return [ ob for ob in get_indexed_children(obj) if ob.name.startswith(obj_name_prepend) ]
 
-# search all objects, by way of "bpy.data.objects", to get list of objects "bone parented" to armature's bone
+# get list of objects "bone parented" to armature's bone, by way of object children index
 def get_objects_parented_to_bone(armature, bone_name, obj_name_prepend):
-    obj_list = []
-    for ob in bpy.data.objects:
-        if ob.name.startswith(obj_name_prepend) and ob.parent == armature and ob.parent_type == "BONE" and ob.parent_bone == bone_name:
-            obj_list.append(ob)
-    return obj_list
+    return [ ob for ob in get_indexed_children(armature, bone_name) if ob.name.startswith(obj_name_prepend) ]
 
 def get_rig_bone_num_for_obj(obj):
     if obj.parent == None or obj.parent_type != "BONE" or obj.parent_bone == "":
         return None
+    index = obj.get(SUNLIT_INDEX_PROP)
+    if index is not None:
+        return index
     return get_num_from_name(obj.parent_bone)
 
+def set_sunlit_tags(id_data, rig_id, role, index):
+    if rig_id is not None:
+        id_data[SUNLIT_RIG_ID_PROP] = rig_id
+    id_data[SUNLIT_ROLE_PROP] = role
+    id_data[SUNLIT_INDEX_PROP] = index
+
+# get role of object from its name and parent bone, for objects of legacy rigs
+def get_legacy_sunlit_role(ob):
+    for role, (bone_prepend, name_prepend) in SUNLIT_OBJECT_ROLES.items():
+        if not ob.name.startswith(name_prepend):
+            continue
+        if bone_prepend is None or (ob.parent_type == "BONE" and ob.parent_bone.startswith(bone_prepend)):
+            return role
+    return None
+
+def get_sunlit_role(ob):
+    role = ob.get(SUNLIT_ROLE_PROP)
+    if role is None:
+        return get_legacy_sunlit_role(ob)
+    return role
+
+def get_legacy_sunlit_rig_objects(sl_armature, role, index=None):
+    if role not in SUNLIT_OBJECT_ROLES:
+        return []
+    bone_prepend, name_prepend = SUNLIT_OBJECT_ROLES[role]
+    if bone_prepend is None:
+        return get_objects_parented_to(sl_armature, name_prepend)
+    if index is None:
+        return get_sunlit_objects_from_armature(sl_armature, bone_prepend, name_prepend)
+    return get_objects_parented_to_bone(sl_armature, any_prepend_name_num(bone_prepend, index), name_prepend)
+
+# Get list of rig's objects with role (in rig order), or only the objects of role with index (e.g. sun number) if
+# index is given. Objects of tagged rigs are found by tags, whatever their names are.
+def get_sunlit_rig_objects(sl_armature, role, index=None):
+    rig_id = sl_armature.get(SUNLIT_RIG_ID_PROP)
+    if rig_id is None:
+        return get_legacy_sunlit_rig_objects(sl_armature, role, index)
+    # a duplicated rig keeps the rig ID it was copied with (until converted), so parent must match too
+    return [ ob for ob in get_tagged_objects(rig_id, role, index) if ob.parent == sl_armature ]
+
+# get name of rig's bone with role (one of SUNLIT_BONE_ALL_NAMES) and index, or None if bone is not found
+def get_sunlit_bone_name(sl_armature, bone_role, index):
+    if sl_armature.get(SUNLIT_RIG_ID_PROP) is None:
+        bone_name = any_prepend_name_num(bone_role, index)
+        if sl_armature.data.bones.get(bone_name) is None:
+            return None
+        return bone_name
+    return get_tagged_bone_names(sl_armature).get((bone_role, index))
+
+def get_sunlit_pose_bone(sl_armature, bone_role, index):
+    bone_name = get_sunlit_bone_name(sl_armature, bone_role, index)
+    if bone_name is None:
+        return None
+    return sl_armature.pose.bones.get(bone_name)
+
+# get list of (index, bone name) of rig's bones with role, sorted by index
+def get_sunlit_bone_name_list(sl_armature, bone_role):
+    if sl_armature.get(SUNLIT_RIG_ID_PROP) is None:
+        # exact name match, e.g. because the sun target bone name also starts with the sun pivot bone name
+        return sorted([ (get_num_from_name(bone.name), bone.name) for bone in sl_armature.data.bones
+            if bone.name == any_prepend_name_num(bone_role, get_num_from_name(bone.name)) ])
+    return sorted([ (index, bone_name) for (role, index), bone_name in get_tagged_bone_names(sl_armature).items()
+        if role == bone_role ])
+
+def is_sunlit_rig_id_shared(sl_armature, rig_id):
+    for ob in get_tagged_objects(rig_id, SUNLIT_ROLE_ARMATURE):
+        if ob != sl_armature:
+            return True
+    return False
+
+# Tag Sunlit rig's armature, bones and objects with rig ID, role and index ID properties. Parts already tagged keep
+# their role and index, untagged parts get role and index from their names (i.e. legacy rigs are converted). Armature
+# gets a new rig ID if it has none, or if another armature has the same rig ID (e.g. rig was duplicated).
+def tag_sunlit_rig(sl_armature):
+    rig_id = sl_armature.get(SUNLIT_RIG_ID_PROP)
+    if rig_id is None or is_sunlit_rig_id_shared(sl_armature, rig_id):
+        rig_id = uuid.uuid4().hex
+    for bone in sl_armature.data.bones:
+        if bone.get(SUNLIT_ROLE_PROP) is not None:
+            continue
+        num = get_num_from_name(bone.name)
+        for bone_role in SUNLIT_BONE_ALL_NAMES:
+            if bone.name == any_prepend_name_num(bone_role, num):
+                set_sunlit_tags(bone, None, bone_role, num)
+                break
+    for ob in get_indexed_children(sl_armature):
+        role = get_sunlit_role(ob)
+        if role is None:
+            continue
+        index = get_rig_bone_num_for_obj(ob)
+        set_sunlit_tags(ob, rig_id, role, 0 if index is None else index)
+    set_sunlit_tags(sl_armature, rig_id, SUNLIT_ROLE_ARMATURE, 0)
+    invalidate_object_children_index()
+    return rig_id
+
 def get_sunlit_blinds_for_light(light_obj):
     light_num = get_rig_bone_num_for_obj(light_obj)
     if light_num is None:
         return None
     obj_list = []
-    if light_obj.name.startswith(SUNLIT_SUN_PREPEND):
-        obj_list = get_objects_parented_to_bone(light_obj.parent, any_prepend_name_num(SUNLIT_BONE_DIFF_CUBE, light_num), SUNLIT_SUN_BLINDS_PREPEND)
-    elif light_obj.name.startswith(SUNLIT_ODISK_SUN_PREPEND):
-        obj_list = get_objects_parented_to_bone(light_obj.parent, any_prepend_name_num(SUNLIT_BONE_ODISK, light_num), SUNLIT_ODISK_BLINDS_PREPEND)
+    light_role = get_sunlit_role(light_obj)
+    if light_role == SUNLIT_ROLE_SUN:
+        obj_list = get_sunlit_rig_objects(light_obj.parent, SUNLIT_ROLE_SUN_BLINDS, light_num)
+    elif light_role == SUNLIT_ROLE_ODISK_SUN:
+        obj_list = get_sunlit_rig_objects(light_obj.parent, SUNLIT_ROLE_ODISK_BLINDS, light_num)
 
     # hack: just return the first sunlit blinds found, there should be only one per light_obj
     if len(obj_list) < 1:
@@ -318,9 +495,9 @@ def get_sunlit_sensor_for_light(light_obj):
     if light_num is None:
         return None
     if is_sunlit_odisk(light_obj):
-        obj_list = get_objects_parented_to_bone(light_obj.parent, any_prepend_name_num(SUNLIT_BONE_ODISK, light_num), SUNLIT_ODISK_PREPEND)
+        obj_list = get_sunlit_rig_objects(light_obj.parent, SUNLIT_ROLE_ODISK_SENSOR, light_num)
     else:
-        obj_list = get_objects_parented_to_bone(light_obj.parent, any_prepend_name_num(SUNLIT_BONE_SENSOR, light_num), SUNLIT_SENSOR_PLANE_PREPEND)
+        obj_list = get_sunlit_rig_objects(light_obj.parent, SUNLIT_ROLE_SENSOR, light_num)
     # hack: just return the first sunlit sensor found, there should be only one per light_obj
     if len(obj_list) < 1:
         return None
@@ -331,6 +508,8 @@ def get_sunlit_sensor_for_light(light_obj):
 def is_sunlit_armature(obj):
     if obj is None or obj.type != "ARMATURE":
         return False
+    if obj.get(SUNLIT_ROLE_PROP) == SUNLIT_ROLE_ARMATURE:
+        return True
     b_name_match_count = 0
     for b_name in SUNLIT_BONE_ALL_NAMES:
         if obj.data.bones.get(b_name) != None:
@@ -339,30 +518,29 @@ def is_sunlit_armature(obj):
                 return True
 
 def is_sunlit_odisk(obj):
-    return obj.name.startswith(SUNLIT_ODISK_SUN_PREPEND)
+    role = obj.get(SUNLIT_ROLE_PROP)
+    if role is None:
+        return obj.name.startswith(SUNLIT_ODISK_SUN_PREPEND)
+    return role == SUNLIT_ROLE_ODISK_SUN
 
 def is_sunlit_rig_widget(obj):
-    return obj.name.startswith(SUNLIT_WGT_PREPEND)
+    role = obj.get(SUNLIT_ROLE_PROP)
+    if role is None:
+        return obj.name.startswith(SUNLIT_WGT_PREPEND)
+    return role == SUNLIT_ROLE_WIDGET
 
 def create_sunlit_armature(context, num_sun_lights, num_occluding_disks):
-    widget_cube = create_widget_cube(context)
-    widget_tri = create_widget_triangle(context)
-    widget_plane = create_widget_plane(context)
-    widget_cone = create_widget_cone(context)
-    widget_circle = create_base_circle(context)
+    # rig is built in Object mode
+    if context.object is not None and context.object.mode != "OBJECT":
+        bpy.ops.object.mode_set(mode="OBJECT")
+    old_3dview_mode = "OBJECT"
 
-    old_3dview_mode = context.object.mode
+    widget_cube, widget_tri, widget_plane, widget_cone, widget_circle = get_sunlit_widgets(context)
 
     # create armature and enter EDIT mode
     bpy.ops.object.armature_add(enter_editmode=True, location=(0, 0, 0))
     armature = context.active_object
 
-    widget_cube.parent = armature
-    widget_tri.parent = armature
-    widget_plane.parent = armature
-    widget_cone.parent = armature
-    widget_circle.parent = armature
-
     # create bone to manipulate base sphere - the radius of sphere controls the distance to the blinds from the "origin"
     # sphere bone starts from initial bone "Bone", and is modified
     sphere_bone = armature.data.edit_bones[0]
@@ -434,8 +612,11 @@ def create_sunlit_armature(context, num_sun_lights, num_occluding_disks):
         odisk_bone_name_tuples.append((odisk_pivot_b.name, odisk_target_b.name, odisk_b.name, odisk_light_b.name))
         c = c + 1
 
+    # Leave EDIT mode once, so bones are written to armature data. Pose bones can then be written directly
+    # (constraints, custom shapes, locations) without switching to POSE mode.
+    bpy.ops.object.mode_set(mode=old_3dview_mode)
+
     # sun bone constraints and bone custom shapes
-    bpy.ops.object.mode_set(mode='POSE')
     for s_pivot_b_name, s_targ_b_name, sensor_b_name, diff_cube_b_name, lit_adjust_b_name in sun_bone_name_tuples:
         sp_tt_const = armature.pose.bones[s_pivot_b_name].constraints.new(type='TRACK_TO')
         sp_tt_const.track_axis = "TRACK_Y"
@@ -480,108 +661,100 @@ def create_sunlit_armature(context, num_sun_lights, num_occluding_disks):
         armature.pose.bones[odisk_b_name].custom_shape = bpy.data.objects[widget_circle.name]
         armature.pose.bones[odisk_light_b_name].custom_shape = bpy.data.objects[widget_cone.name]
 
-    bpy.ops.object.mode_set(mode=old_3dview_mode)
-
     return armature, sphere_bone_name, sun_bone_name_tuples, odisk_bone_name_tuples
 
-def create_widget_cube(context):
-    widget_cube = create_object_cube(context, SUNLIT_WGT_CUBE_NAME, 0.1, (0, 0, 0))
+# get kind of widget object, from its kind tag, or from its name (without ".001" etc.) for widgets shared before
+# widgets were tagged with their kind
+def get_sunlit_widget_kind(ob):
+    kind = ob.get(SUNLIT_WGT_KIND_PROP)
+    if kind is None:
+        kind = ob.name.split(".")[0]
+    return kind
+
+# Get dict of widget kind -> shared widget object. Shared widgets are unparented objects tagged with the widget role,
+# widgets of rigs created before widgets were shared are parented to their rig (and may have the same names), and are
+# not used by new rigs.
+def get_shared_sunlit_widgets():
+    widgets = {}
+    for ob in bpy.data.objects:
+        if ob.type == "MESH" and ob.parent is None and ob.library is None and \
+                ob.get(SUNLIT_ROLE_PROP) == SUNLIT_ROLE_WIDGET:
+            widgets.setdefault(get_sunlit_widget_kind(ob), ob)
+    return widgets
+
+# Get widget objects (cube, triangle, plane, cone, circle, in order of SUNLIT_WGT_NAMES) shared by all Sunlit rigs,
+# widgets not found are created in the hidden widgets collection.
+def get_sunlit_widgets(context):
+    shared_widgets = get_shared_sunlit_widgets()
+    widgets = []
+    new_widgets = []
+    for wgt_name, create_widget_func in [ (SUNLIT_WGT_CUBE_NAME, create_widget_cube),
+            (SUNLIT_WGT_TRI_NAME, create_widget_triangle), (SUNLIT_WGT_PLANE_NAME, create_widget_plane),
+            (SUNLIT_WGT_CONE_NAME, create_widget_cone), (SUNLIT_WGT_CIRCLE_NAME, create_base_circle) ]:
+        wgt = shared_widgets.get(wgt_name)
+        if wgt is None:
+            wgt = create_widget_func()
+            set_sunlit_tags(wgt, None, SUNLIT_ROLE_WIDGET, 0)
+            wgt[SUNLIT_WGT_KIND_PROP] = wgt_name
+            new_widgets.append(wgt)
+        widgets.append(wgt)
+    link_hidden_object_list(context, SUNLIT_WGT_COLLECTION_NAME, new_widgets)
+    return widgets
+
+# Get mesh shared by Sunlit rig objects of the same shape, mesh is created from pydata if not found. Mesh must not
+# be changed by one object (e.g. sensor atlas UVs), unless it is first copied for that object.
+def get_sunlit_shared_mesh(mesh_name, pydata):
+    mesh = bpy.data.meshes.get(mesh_name)
+    if mesh is None or mesh.library is not None or mesh.get(SUNLIT_ROLE_PROP) != SUNLIT_ROLE_SHARED_MESH:
+        mesh = create_pydata_mesh(mesh_name, pydata)
+        mesh[SUNLIT_ROLE_PROP] = SUNLIT_ROLE_SHARED_MESH
+    return mesh
+
+# widget objects are returned unlinked
+def create_widget_cube():
+    widget_cube = create_pydata_object(SUNLIT_WGT_CUBE_NAME, get_cube_pydata(0.1))
     set_object_display_type(widget_cube, "WIRE")
-    set_object_hide_view(widget_cube, True)
-    set_object_hide_render(widget_cube, True)
     return widget_cube
 
-def create_widget_triangle(context):
-    old_3dview_mode = context.object.mode
-    widget_tri = create_object_plane(context, SUNLIT_WGT_TRI_NAME, 1, (0, 0, 0), False)
-    bpy.ops.object.mode_set(mode="EDIT")
-    mesh_data = widget_tri.data
-    bm = bmesh.from_edit_mesh(mesh_data)
-    bmesh_delete_verts(bm, bm.verts)
-    # add triangle vertexes
-    for v_pos in SUNLIT_WGT_TRI_VERTS:
-        bm.verts.new(v_pos)
-    # ensure that vertexes can be indexed, e.g. bm.verts[1]
-    bm.verts.ensure_lookup_table()
-    # add edges
-    bm.edges.new([bm.verts[0], bm.verts[1]])
-    bm.edges.new([bm.verts[1], bm.verts[2]])
-    bm.edges.new([bm.verts[2], bm.verts[0]])
-    # add triangle face
-    bm.faces.new([bm.verts[0], bm.verts[1], bm.verts[2]])
-    # update mesh object, and free bmesh to prevent further access to bm
-    bmesh.update_edit_mesh(mesh=mesh_data, destructive=True)
-    bm.free()
-    bpy.ops.object.mode_set(mode=old_3dview_mode)
+def create_widget_triangle():
+    widget_tri = create_pydata_object(SUNLIT_WGT_TRI_NAME, (SUNLIT_WGT_TRI_VERTS, [], [ (0, 1, 2) ], None))
     set_object_display_type(widget_tri, "WIRE")
-    set_object_hide_view(widget_tri, True)
-    set_object_hide_render(widget_tri, True)
     return widget_tri
 
-def create_widget_plane(context):
-    widget_plane = create_object_plane(context, SUNLIT_WGT_PLANE_NAME, 0.33, (0, 0, 0), False)
-    widget_plane.rotation_euler = (math.radians(90), 0, 0)
-    bpy.ops.object.transform_apply(location=False, rotation=True, scale=False)
+def create_widget_plane():
+    verts, edges, faces, uvs = get_plane_pydata(0.33, False)
+    widget_plane = create_pydata_object(SUNLIT_WGT_PLANE_NAME,
+        (get_rotated_x_verts(verts, math.radians(90)), edges, faces, None))
     set_object_display_type(widget_plane, "WIRE")
-    set_object_hide_view(widget_plane, True)
-    set_object_hide_render(widget_plane, True)
     return widget_plane
 
-def create_widget_cone(context):
-    bpy.ops.mesh.primitive_cone_add(radius1=0.2, radius2=0, depth = 0.4, location=(0, 0, 0))
-    widget_cone = context.active_object
-    widget_cone.name = SUNLIT_WGT_CONE_NAME
-    widget_cone.rotation_euler = (math.radians(270), 0, 0)
-    bpy.ops.object.transform_apply(location=False, rotation=True, scale=False)
+def create_widget_cone():
+    verts, edges, faces, uvs = get_cone_pydata(0.2, 0.4)
+    widget_cone = create_pydata_object(SUNLIT_WGT_CONE_NAME,
+        (get_rotated_x_verts(verts, math.radians(270)), edges, faces, None))
     set_object_display_type(widget_cone, "WIRE")
-    set_object_hide_view(widget_cone, True)
-    set_object_hide_render(widget_cone, True)
     return widget_cone
 
-def create_base_circle(context):
-    bpy.ops.mesh.primitive_circle_add(radius=0.3, location=(0, 0, 0))
-    widget_circle = context.active_object
-    widget_circle.rotation_euler = (math.radians(270), 0, 0)
-    bpy.ops.object.transform_apply(location=False, rotation=True, scale=False)
-    widget_circle.name = SUNLIT_WGT_CIRCLE_NAME
+def create_base_circle():
+    verts, edges, faces, uvs = get_circle_pydata(0.3)
+    widget_circle = create_pydata_object(SUNLIT_WGT_CIRCLE_NAME,
+        (get_rotated_x_verts(verts, math.radians(270)), edges, faces, None))
     set_object_display_type(widget_circle, "WIRE")
-    set_object_hide_view(widget_circle, True)
-    set_object_hide_render(widget_circle, True)
     return widget_circle
 
 # "rig" includes armature object, widget objects, and objects parented to the armature (e.g. meshes, lights)
 def create_sunlit_rig(context, hemisphere_only, num_suns, num_sphere_subdiv, num_occluding_disks, odisk_include_sun,
         default_sun_energy, default_sun_angle, default_odisk_sun_energy, default_odisk_sun_angle, allow_drivers,
         sun_sensor_image_width, sun_sensor_image_height, odisk_sensor_image_width, odisk_sensor_image_height,
-        sun_blinds_len, odisk_blinds_len):
+        sun_blinds_len, odisk_blinds_len, sensor_bake_target="IMAGE", blinds_mode="BOOLEAN"):
+    # sensors baked to color attributes each need their own (subdivided) mesh
+    share_sensor_mesh = (sensor_bake_target != "COLOR_ATTRIBUTE")
     # create sl_armature to combine/control objects
     sl_armature, sphere_bone_name, sun_bone_name_tuples, odisk_bone_name_tuples = create_sunlit_armature(context,
         num_suns, num_occluding_disks)
 
-    # create base sphere, with which sun blinds planes will intersect
-    base_sphere = create_object_icosphere(context, obj_prepend_name_num(SUNLIT_BASE_SPHERE_PREPEND, 0), num_sphere_subdiv,
-        SUNLIT_BASE_SPHERE_RADIUS, SUNLIT_BASE_SPHERE_OFFSET)
-    base_sphere.parent = sl_armature
-    base_sphere.parent_type = "BONE"
-    base_sphere.parent_bone = sphere_bone_name
-    # create "difference cubes" (diff cubes for short) that will be used in booleans to carve out "blinds planes"
-    diff_cubes_list = create_sunlit_diff_cubes(context, sl_armature, sun_bone_name_tuples, SUNLIT_DCUBE_PREPEND)
-    sensor_planes = create_sunlit_planes(context, sl_armature, sun_bone_name_tuples, SUNLIT_SENSOR_PLANE_PREPEND,
-        SUNLIT_SENSOR_PLANE_RADIUS, SUNLIT_SENSOR_OFFSET, False)
-    for plane in sensor_planes:
-        create_sensor_material_on_obj(plane, sun_sensor_image_width, sun_sensor_image_height)
-    create_sun_lights(context, sl_armature, sun_bone_name_tuples, SUNLIT_SUN_PREPEND,
-        SUNLIT_SUN_OFFSET, default_sun_energy, default_sun_angle)
-
-    # create sun_blinds_list
-    sun_blinds_list = create_sunlit_planes(context, sl_armature, sun_bone_name_tuples, SUNLIT_SUN_BLINDS_PREPEND,
-        SUNLIT_SUN_BLINDS_PLANE_RADIUS, SUNLIT_SUN_BLINDS_PLANE_OFFSET, True)
-    add_blinds_material_to_obj_list(sun_blinds_list)
-    # create sun_blinds_list' object modifiers
-    create_sphere_plane_booleans(base_sphere, sun_blinds_list)
-    create_plane_diff_cube_booleans(sun_blinds_list, diff_cubes_list)
-    add_extrude_bools_to_sun_blinds(sun_blinds_list, sl_armature, sun_blinds_len, allow_drivers)
-
+    # default pose bone locations of suns and occluding disks, written together
+    bone_locs = {}
     if num_suns > 0:
         if hemisphere_only:
             # setup lighting default pointing directions, if light pointing data is found
@@ -597,13 +770,49 @@ def create_sunlit_rig(context, hemisphere_only, num_suns, num_sphere_subdiv, num
             else:
                 point_direction_list = get_fibonacci_sphere_points(num_suns, 2.0)
 
-        set_point_at_locations(context, sl_armature, sun_bone_name_tuples, point_direction_list,
-            SUNLIT_EXTRA_POINTDIR)
+        bone_locs.update(get_point_at_locations(sun_bone_name_tuples, point_direction_list, SUNLIT_EXTRA_POINTDIR))
 
         # "difference cubes" initially start at the outermost edge of the sphere that the cubes are meant
         # to intersect, as an "origin" position.
         # "pose" offsets are used to move the cubes to a starting position which intersects the sphere nicely.
-        fix_diff_cube_bone_loc(context, sl_armature, sun_bone_name_tuples, SUNLIT_FIX_DIFF_CUBE_LOC)
+        bone_locs.update(get_fix_diff_cube_bone_locs(sun_bone_name_tuples, SUNLIT_FIX_DIFF_CUBE_LOC))
+    if num_occluding_disks > 0:
+        bone_locs.update(get_odisk_point_at_locations(odisk_bone_name_tuples))
+    set_pose_bone_locations(sl_armature, bone_locs)
+
+    # base sphere and diff cubes are only needed by boolean blinds
+    base_sphere = None
+    diff_cubes_list = []
+    if blinds_mode == "BOOLEAN":
+        # create base sphere, with which sun blinds planes will intersect
+        base_sphere = create_pydata_object(reserve_object_names(SUNLIT_BASE_SPHERE_PREPEND, 1)[0],
+            get_icosphere_pydata(num_sphere_subdiv, SUNLIT_BASE_SPHERE_RADIUS), SUNLIT_BASE_SPHERE_OFFSET)
+        base_sphere.parent = sl_armature
+        base_sphere.parent_type = "BONE"
+        base_sphere.parent_bone = sphere_bone_name
+        link_object_list(context, [ base_sphere ])
+        # create "difference cubes" (diff cubes for short) that will be used in booleans to carve out "blinds planes"
+        diff_cubes_list = create_sunlit_diff_cubes(context, sl_armature, sun_bone_name_tuples, SUNLIT_DCUBE_PREPEND)
+    sensor_planes = create_sunlit_planes(context, sl_armature, sun_bone_name_tuples, SUNLIT_SENSOR_PLANE_PREPEND,
+        SUNLIT_SENSOR_PLANE_RADIUS, SUNLIT_SENSOR_OFFSET, False,
+        SUNLIT_MESH_SENSOR_NAME if share_sensor_mesh else None)
+    for plane in sensor_planes:
+        create_sensor_bake_target_on_obj(plane, sun_sensor_image_width, sun_sensor_image_height, sensor_bake_target)
+    create_sun_lights(context, sl_armature, sun_bone_name_tuples, SUNLIT_SUN_PREPEND,
+        SUNLIT_SUN_OFFSET, default_sun_energy, default_sun_angle)
+
+    # create sun_blinds_list
+    if blinds_mode == "VORONOI":
+        sun_blinds_list = create_sunlit_voronoi_blinds(context, sl_armature, sun_bone_name_tuples, sun_blinds_len)
+        add_blinds_material_to_obj_list(sun_blinds_list)
+    else:
+        sun_blinds_list = create_sunlit_planes(context, sl_armature, sun_bone_name_tuples, SUNLIT_SUN_BLINDS_PREPEND,
+            SUNLIT_SUN_BLINDS_PLANE_RADIUS, SUNLIT_SUN_BLINDS_PLANE_OFFSET, True, SUNLIT_MESH_BLINDS_PLANE_NAME)
+        add_blinds_material_to_obj_list(sun_blinds_list)
+        # create sun_blinds_list' object modifiers
+        create_sphere_plane_booleans(base_sphere, sun_blinds_list)
+        create_plane_diff_cube_booleans(sun_blinds_list, diff_cubes_list)
+        add_extrude_bools_to_sun_blinds(sun_blinds_list, sl_armature, sun_blinds_len, allow_drivers)
 
     # The bone setups and parenting were done in worldspace with Z axis as the up axis, but inside the sl_armature the
     # Y axis is the up axis - so fix it.
@@ -612,16 +821,20 @@ def create_sunlit_rig(context, hemisphere_only, num_suns, num_sphere_subdiv, num
     # hide objects that distract the user and/or should not be rendered
     set_object_list_hide_view(diff_cubes_list, True)
     set_object_list_hide_render(diff_cubes_list, True)
-    set_object_hide_view(base_sphere, True)
-    set_object_hide_render(base_sphere, True)
+    if base_sphere is not None:
+        set_object_hide_view(base_sphere, True)
+        set_object_hide_render(base_sphere, True)
     set_object_list_hide_view(sun_blinds_list, True)
+    # Voronoi blinds geometry depends on sun directions, so it is written after suns are pointed
+    if blinds_mode == "VORONOI":
+        context.view_layer.update()
+        update_sunlit_voronoi_blinds(sl_armature)
 
-    # create occluding disks and set their default pointing directions
+    # create occluding disks
     if num_occluding_disks > 0:
         odisk_list, odisk_blinds_list = create_occluding_disks(context, sl_armature, odisk_bone_name_tuples, odisk_include_sun,
             default_odisk_sun_energy, default_odisk_sun_angle, allow_drivers, odisk_sensor_image_width, odisk_sensor_image_height,
-            odisk_blinds_len)
-        set_odisk_point_at_locations(context, sl_armature, odisk_bone_name_tuples)
+            odisk_blinds_len, sensor_bake_target, share_sensor_mesh)
         set_object_list_hide_view(odisk_blinds_list, True)
 
     # create camera, to use for setting ODisk sizes
@@ -629,27 +842,109 @@ def create_sunlit_rig(context, hemisphere_only, num_suns, num_sphere_subdiv, num
     # point the Sunlit Rig's test camera at the default first ODisk, if ODisk created
     if num_occluding_disks > 0:
         set_sunlit_cam_odisk_target(sl_armature, 0)
+    # rig parts are found by these tags from now on, so parts can be renamed
+    tag_sunlit_rig(sl_armature)
+    return sl_armature
+
+# roles of rig objects hidden in viewport when rig is created (hide state is not saved in template files)
+SUNLIT_HIDDEN_ROLES = [ SUNLIT_ROLE_BASE_SPHERE, SUNLIT_ROLE_DIFF_CUBE, SUNLIT_ROLE_SUN_BLINDS,
+    SUNLIT_ROLE_ODISK_BLINDS, SUNLIT_ROLE_CAMERA ]
+
+# Create Sunlit rig from template file of the same rig_options (arguments of create_sunlit_rig after context), if
+# template file is found, otherwise create rig and write it to template file. Returns (rig armature, True if rig was
+# created from template).
+def create_sunlit_rig_with_template(context, rig_options):
+    filepath = get_rig_template_filepath(rig_options)
+    if os.path.isfile(filepath):
+        sl_armature = instance_sunlit_rig_template(context, filepath)
+        if sl_armature is not None:
+            return sl_armature, True
+    sl_armature = create_sunlit_rig(context, *rig_options)
+    write_rig_template(filepath, [ sl_armature ] + get_indexed_children(sl_armature))
+    return sl_armature, False
+
+# Replace appended template widgets by shared widgets of this file (dict of widget kind -> widget), by widget kind.
+# Replaced widgets are removed (their meshes are left without users), widgets of unknown kind are kept as shared
+# widgets.
+def remap_template_widgets(context, template_widgets, shared_widgets):
+    kept_widgets = []
+    for wgt in template_widgets:
+        local_wgt = shared_widgets.get(get_sunlit_widget_kind(wgt))
+        if local_wgt is None or local_wgt == wgt:
+            kept_widgets.append(wgt)
+            continue
+        wgt.user_remap(local_wgt)
+        bpy.data.objects.remove(wgt)
+    if len(kept_widgets) > 0:
+        link_hidden_object_list(context, SUNLIT_WGT_COLLECTION_NAME, kept_widgets)
+
+# Append rig from template file. Widgets, shared meshes and blinds material already in this file are used instead of
+# the appended copies, while sensor materials and images are new for each rig. Returns rig armature, or None.
+def instance_sunlit_rig_template(context, filepath):
+    if context.object is not None and context.object.mode != "OBJECT":
+        bpy.ops.object.mode_set(mode="OBJECT")
+    # get shared widgets before appending, so appended widgets are always replaced, and are not mistaken for shared
+    # widgets
+    shared_widgets = dict(zip(SUNLIT_WGT_NAMES, get_sunlit_widgets(context)))
+    template = load_rig_template(filepath, [ "objects", "meshes", "materials" ])
+    if template is None:
+        return None
+    template_widgets = [ ob for name, ob in template["objects"] if ob.get(SUNLIT_ROLE_PROP) == SUNLIT_ROLE_WIDGET ]
+    rig_objects = [ ob for name, ob in template["objects"] if ob.get(SUNLIT_ROLE_PROP) != SUNLIT_ROLE_WIDGET ]
+    remap_template_widgets(context, template_widgets, shared_widgets)
+    remap_shared_template_ids([ (name, m) for name, m in template["meshes"] if name.startswith(SUNLIT_MESH_PREPEND) ],
+        bpy.data.meshes, lambda m: m.library is None and m.get(SUNLIT_ROLE_PROP) == SUNLIT_ROLE_SHARED_MESH)
+    remap_shared_template_ids([ (name, m) for name, m in template["materials"] if name == SUNLIT_BLINDS_MAT_NAME ],
+        bpy.data.materials, lambda m: m.library is None)
+    # remove meshes of replaced widgets, other template meshes are used by rig objects
+    for name, m in template["meshes"]:
+        if not name.startswith(SUNLIT_MESH_PREPEND) and m.users == 0:
+            bpy.data.meshes.remove(m)
+
+    sl_armature = None
+    for ob in rig_objects:
+        if ob.get(SUNLIT_ROLE_PROP) == SUNLIT_ROLE_ARMATURE:
+            sl_armature = ob
+    if sl_armature is None:
+        return None
+    link_object_list(context, rig_objects)
+    # new rig ID, so appended rig is not mistaken for the template's rig or other rigs from the same template
+    if SUNLIT_RIG_ID_PROP in sl_armature:
+        del sl_armature[SUNLIT_RIG_ID_PROP]
+    tag_sunlit_rig(sl_armature)
+    for role in SUNLIT_HIDDEN_ROLES:
+        set_object_list_hide_view(get_sunlit_rig_objects(sl_armature, role), True)
+    deselect_objects(context.selected_objects)
+    select_object(sl_armature)
+    set_active_object(context, sl_armature)
+    return sl_armature
 
 def create_sunlit_rig_camera(context, sl_armature):
-    bpy.ops.object.camera_add(location=(0, 0, 0), rotation=(0, 0, 0))
-    rig_cam = context.active_object
-    rig_cam.name = SUNLIT_CAMERA_PREPEND
+    rig_cam = create_camera_object(SUNLIT_CAMERA_PREPEND)
     rig_cam.parent = sl_armature
+    link_object_list(context, [ rig_cam ])
     set_object_hide_view(rig_cam, True)
     tt_const = rig_cam.constraints.new(type="TRACK_TO")
     tt_const.name = SUNLIT_CAMERA_TTC_PREPEND
     tt_const.track_axis = "TRACK_NEGATIVE_Z"
     tt_const.up_axis = "UP_Y"
 
-def create_sunlit_planes(context, sl_arm, bone_tuples, prepend_str, p_radius, loc, is_blinds):
+# if shared_mesh_name is given then planes share one mesh (linked duplicates), otherwise each plane has its own mesh
+def create_sunlit_planes(context, sl_arm, bone_tuples, prepend_str, p_radius, loc, is_blinds, shared_mesh_name=None):
     planes = []
+    obj_names = reserve_object_names(prepend_str, len(bone_tuples))
+    # calculate UVs for the plane object if it is not a "blinds" object
+    plane_pydata = get_plane_pydata(p_radius, not is_blinds)
+    plane_mesh = None
+    if shared_mesh_name is not None:
+        plane_mesh = get_sunlit_shared_mesh(shared_mesh_name, plane_pydata)
 
     c = 0
     for s_pivot_b, s_targ_b, sensor_b, diff_cube_b, lit_adjust_b in bone_tuples:
-        # calculate UVs for the plane object if it is not a "blinds" object
-        calc_uvs = not is_blinds
-        # create the plane with the given options
-        new_obj = create_object_plane(context, obj_prepend_name_num(prepend_str, c), p_radius, loc, calc_uvs)
+        if plane_mesh is None:
+            new_obj = create_pydata_object(obj_names[c], plane_pydata, loc)
+        else:
+            new_obj = create_mesh_object(obj_names[c], plane_mesh, loc)
         new_obj.rotation_euler = (math.radians(270), 0, 0)
         new_obj.parent = sl_arm
         new_obj.parent_type = "BONE"
@@ -660,29 +955,34 @@ def create_sunlit_planes(context, sl_arm, bone_tuples, prepend_str, p_radius, lo
         planes.append(new_obj)
         c = c + 1
 
+    link_object_list(context, planes)
     return planes
 
 def create_sunlit_diff_cubes(context, sl_arm, sun_bone_name_tuples, prepend_str):
     diff_cubes = []
+    obj_names = reserve_object_names(prepend_str, len(sun_bone_name_tuples))
+    cube_mesh = get_sunlit_shared_mesh(SUNLIT_MESH_DIFF_CUBE_NAME, get_cube_pydata(1))
 
     c = 0
     for s_pivot_b, s_targ_b, sensor_b, diff_cube_b, lit_adjust_b in sun_bone_name_tuples:
-        new_obj = create_object_cube(context, obj_prepend_name_num(prepend_str, c), 1, SUNLIT_DIFF_CUBE_OFFSET)
+        new_obj = create_mesh_object(obj_names[c], cube_mesh, SUNLIT_DIFF_CUBE_OFFSET)
         new_obj.parent = sl_arm
         new_obj.parent_type = "BONE"
         new_obj.parent_bone = diff_cube_b
 
-        diff_cubes.append(context.active_object)
+        diff_cubes.append(new_obj)
         c = c + 1
 
+    link_object_list(context, diff_cubes)
     return diff_cubes
 
 def create_sun_lights(context, sl_arm, sun_bone_name_tuples, prepend_str, loc, sun_energy, sun_angle):
     lights = []
+    obj_names = reserve_object_names(prepend_str, len(sun_bone_name_tuples))
 
     c = 0
     for s_pivot_b, s_targ_b, sensor_b, diff_cube_b, lit_adjust_b in sun_bone_name_tuples:
-        sun_light = create_object_light(context, obj_prepend_name_num(prepend_str, c), "SUN", 1, loc)
+        sun_light = create_light_object(obj_names[c], "SUN", 1, loc)
         sun_light.rotation_euler = (math.radians(270), 0, 0)
         sun_light.data.energy = sun_energy
         #sun_light.data.angle = sun_angle
@@ -692,6 +992,7 @@ def create_sun_lights(context, sl_arm, sun_bone_name_tuples, prepend_str, loc, s
         lights.append(sun_light)
         c = c + 1
 
+    link_object_list(context, lights)
     return lights
 
 def get_fibonacci_sphere_points(num_points, sphere_radius):
@@ -706,26 +1007,38 @@ def get_fibonacci_sphere_points(num_points, sphere_radius):
         points.append((x*sphere_radius, y*sphere_radius, z*sphere_radius))
     return points
 
-def set_point_at_locations(context, sl_arm, bone_tuples, loc_list, extra_loc):
-    old_3dview_mode = context.object.mode
-    set_active_object(context, sl_arm)
-    bpy.ops.object.mode_set(mode='POSE')
+# Write locations of pose bones in one pass, bone_locs is dict of bone name -> location. Pose bones are written
+# directly, so armature can stay in OBJECT mode.
+def set_pose_bone_locations(armature, bone_locs):
+    if len(bone_locs) < 1:
+        return
+    pose_bones = armature.pose.bones
+    locs = np.empty(len(pose_bones) * 3, dtype=np.float32)
+    pose_bones.foreach_get("location", locs)
+    locs = locs.reshape(-1, 3)
+    bone_indexes = dict([ (pb.name, c) for c, pb in enumerate(pose_bones) ])
+    for bone_name, loc in bone_locs.items():
+        locs[bone_indexes[bone_name]] = loc
+    pose_bones.foreach_set("location", locs.ravel())
+    # foreach_set does not tag armature for update, like setting each location would
+    armature.update_tag()
+
+def get_point_at_locations(bone_tuples, loc_list, extra_loc):
+    bone_locs = {}
     c = 0
     for s_pivot_b, s_targ_b, sensor_b, diff_cube_b, lit_adjust_b in bone_tuples:
         if c >= len(loc_list):
-            sl_arm.pose.bones[s_targ_b].location = extra_loc
+            bone_locs[s_targ_b] = extra_loc
         else:
-            sl_arm.pose.bones[s_targ_b].location = loc_list[c]
+            bone_locs[s_targ_b] = loc_list[c]
         c = c + 1
-    bpy.ops.object.mode_set(mode=old_3dview_mode)
+    return bone_locs
 
-def fix_diff_cube_bone_loc(context, sl_arm, bone_tuples, fix_loc):
-    old_3dview_mode = context.object.mode
-    set_active_object(context, sl_arm)
-    bpy.ops.object.mode_set(mode='POSE')
+def get_fix_diff_cube_bone_locs(bone_tuples, fix_loc):
+    bone_locs = {}
     for s_pivot_b, s_targ_b, sensor_b, diff_cube_b, lit_adjust_b in bone_tuples:
-            sl_arm.pose.bones[diff_cube_b].location = fix_loc
-    bpy.ops.object.mode_set(mode=old_3dview_mode)
+        bone_locs[diff_cube_b] = fix_loc
+    return bone_locs
 
 def add_boolean_mod(mod_obj, target_obj, mod_name, bool_op):
     b_mod = mod_obj.modifiers.new(mod_name, "BOOLEAN")
@@ -766,6 +1079,195 @@ def add_extrude_bools_to_sun_blinds(blinds_plane_list, sl_armature, sun_blinds_l
         object_add_modifier_taper(plane, SUNLIT_MODNAME_B_SIMPDEF, sun_blinds_len)
         c = c + 1
 
+# Create empty blinds objects, one per sun, for Voronoi blinds - geometry is written by update_sunlit_voronoi_blinds.
+def create_sunlit_voronoi_blinds(context, sl_arm, sun_bone_name_tuples, sun_blinds_len):
+    sl_arm[SUNLIT_BLINDS_MODE_PROP] = "VORONOI"
+    sl_arm[SUNLIT_BLINDS_LEN_PROP] = sun_blinds_len
+    blinds_list = []
+    obj_names = reserve_object_names(SUNLIT_SUN_BLINDS_PREPEND, len(sun_bone_name_tuples))
+    c = 0
+    for s_pivot_b, s_targ_b, sensor_b, diff_cube_b, lit_adjust_b in sun_bone_name_tuples:
+        new_obj = create_pydata_object(obj_names[c], ([], [], [], None))
+        new_obj.parent = sl_arm
+        new_obj.parent_type = "BONE"
+        new_obj.parent_bone = diff_cube_b
+        blinds_list.append(new_obj)
+        c = c + 1
+    link_object_list(context, blinds_list)
+    return blinds_list
+
+def get_sunlit_blinds_mode(sl_armature):
+    if sl_armature is None:
+        return "BOOLEAN"
+    return sl_armature.get(SUNLIT_BLINDS_MODE_PROP, "BOOLEAN")
+
+# get bone numbers, and directions (armature space) of sun pivot bones, i.e. directions from rig center toward suns
+def get_sunlit_sun_pivot_directions(sl_armature):
+    nums = []
+    dirs = []
+    for num, bone_name in get_sunlit_bone_name_list(sl_armature, SUNLIT_BONE_SUN_PIVOT):
+        pose_bone = sl_armature.pose.bones.get(bone_name)
+        if pose_bone is None:
+            continue
+        nums.append(num)
+        dirs.append(pose_bone.matrix.col[1].xyz.normalized())
+    return nums, dirs
+
+# get Voronoi cell of each sun of armature, as dict of bone number: array of cell vertex directions (armature space)
+def get_sunlit_voronoi_cells(sl_armature):
+    nums, dirs = get_sunlit_sun_pivot_directions(sl_armature)
+    if len(nums) < 1:
+        return {}
+    return dict(zip(nums, get_spherical_voronoi_cells([ tuple(d) for d in dirs ])))
+
+# Write blinds meshes of Voronoi blinds rig: radial walls along the edges of each sun's Voronoi cell. Blinds length
+# follows the Y location of the sun's diff cube bone (like the Solidify driver of boolean blinds).
+def update_sunlit_voronoi_blinds(sl_armature):
+    if get_sunlit_blinds_mode(sl_armature) != "VORONOI":
+        return
+    blinds_len = sl_armature.get(SUNLIT_BLINDS_LEN_PROP, 15.0)
+    arm_matrix = sl_armature.matrix_world
+    for num, cell_dirs in get_sunlit_voronoi_cells(sl_armature).items():
+        blinds_list = get_sunlit_rig_objects(sl_armature, SUNLIT_ROLE_SUN_BLINDS, num)
+        if len(blinds_list) < 1:
+            continue
+        length = blinds_len
+        diff_cube_pose_bone = get_sunlit_pose_bone(sl_armature, SUNLIT_BONE_DIFF_CUBE, num)
+        if diff_cube_pose_bone is not None:
+            length = blinds_len * (1 + diff_cube_pose_bone.location.y)
+        verts, faces = get_cell_wall_pydata(cell_dirs, SUNLIT_VORONOI_INNER_RADIUS,
+            SUNLIT_VORONOI_INNER_RADIUS + max(length, 0.001))
+        # cell is in armature space, so transform to blinds object space
+        for blinds in blinds_list:
+            to_local = np.array(blinds.matrix_world.inverted() @ arm_matrix)
+            local_verts = verts @ to_local[0:3, 0:3].T + to_local[0:3, 3]
+            set_mesh_pydata(blinds.data, local_verts.tolist(), faces)
+
+# fingerprint of everything that Voronoi blinds geometry depends on, to skip updates when nothing changed
+def get_sunlit_voronoi_blinds_fingerprint(sl_armature):
+    nums, dirs = get_sunlit_sun_pivot_directions(sl_armature)
+    lengths = []
+    for num in nums:
+        diff_cube_pose_bone = get_sunlit_pose_bone(sl_armature, SUNLIT_BONE_DIFF_CUBE, num)
+        lengths.append(None if diff_cube_pose_bone is None else diff_cube_pose_bone.location.y)
+    return get_fingerprint((tuple(nums), get_plain_value(dirs), get_plain_value(lengths),
+        get_plain_value(sl_armature.get(SUNLIT_BLINDS_LEN_PROP)), get_matrix_values(sl_armature.matrix_world)))
+
+# last fingerprint of each Voronoi blinds rig (by rig ID), and re-entry guard, for depsgraph update handler
+voronoi_blinds_fingerprints = {}
+voronoi_blinds_updating = False
+
+# Voronoi blinds follow suns when they are moved in viewport. Writing blinds meshes sends another depsgraph update, so
+# the handler does nothing while it is already updating, and rigs with unchanged suns are skipped. Only updates of
+# objects or armatures can move suns, and only tagged Sunlit armatures (from the index of tagged objects) are checked,
+# so files without Voronoi rigs pay almost nothing per update.
+@persistent
+def voronoi_blinds_depsgraph_update_handler(scene, depsgraph=None):
+    global voronoi_blinds_updating
+    if voronoi_blinds_updating or not getattr(scene, "OLuminSL_VoronoiAutoUpdate", False):
+        return
+    # Blender 2.79 scene update handler has no depsgraph
+    if depsgraph is not None and not depsgraph.id_type_updated('OBJECT') and \
+            not depsgraph.id_type_updated('ARMATURE'):
+        return
+    voronoi_blinds_updating = True
+    try:
+        for ob in get_tagged_role_objects(SUNLIT_ROLE_ARMATURE):
+            if get_sunlit_blinds_mode(ob) != "VORONOI" or scene.objects.get(ob.name) is None:
+                continue
+            rig_id = ob.get(SUNLIT_RIG_ID_PROP)
+            fingerprint = get_sunlit_voronoi_blinds_fingerprint(ob)
+            if voronoi_blinds_fingerprints.get(rig_id) == fingerprint:
+                continue
+            update_sunlit_voronoi_blinds(ob)
+            voronoi_blinds_fingerprints[rig_id] = fingerprint
+    finally:
+        voronoi_blinds_updating = False
+
+def register_voronoi_blinds_handlers():
+    if voronoi_blinds_depsgraph_update_handler not in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.append(voronoi_blinds_depsgraph_update_handler)
+
+def unregister_voronoi_blinds_handlers():
+    voronoi_blinds_fingerprints.clear()
+    if voronoi_blinds_depsgraph_update_handler in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(voronoi_blinds_depsgraph_update_handler)
+
+# rig helper objects, only needed when angular diameters are computed (see sunlit_perf.py)
+SUNLIT_PERF_HELPER_ROLES = [ SUNLIT_ROLE_BASE_SPHERE, SUNLIT_ROLE_DIFF_CUBE, SUNLIT_ROLE_SUN_BLINDS,
+    SUNLIT_ROLE_ODISK_BLINDS ]
+
+def get_sunlit_rig_helper_objects(sl_armature):
+    helpers = []
+    for role in SUNLIT_PERF_HELPER_ROLES:
+        helpers = helpers + get_sunlit_rig_objects(sl_armature, role)
+    return helpers
+
+def is_sunlit_rig_perf_mode(sl_armature):
+    return any(is_object_perf_mode(ob) for ob in get_sunlit_rig_helper_objects(sl_armature))
+
+def set_sunlit_rig_perf_mode(sl_armature, enabled):
+    set_object_list_perf_mode(get_sunlit_rig_helper_objects(sl_armature), enabled)
+
+def set_scene_sunlit_rigs_perf_mode(scene, enabled):
+    for ob in scene.objects:
+        if is_sunlit_armature(ob):
+            set_sunlit_rig_perf_mode(ob, enabled)
+
+def update_sunlit_perf_mode(self, context):
+    set_scene_sunlit_rigs_perf_mode(context.scene, self.OLuminSL_PerfMode)
+
+# True if performance mode was turned on by playback, and last playback frames per second with / without
+# performance mode
+perf_mode_playback_state = { "auto": False, "fps": { True: None, False: None } }
+
+@persistent
+def perf_mode_playback_pre_handler(scene, *args):
+    if getattr(scene, "OLuminSL_PerfModeOnPlayback", False) and not getattr(scene, "OLuminSL_PerfMode", False):
+        set_scene_sunlit_rigs_perf_mode(scene, True)
+        perf_mode_playback_state["auto"] = True
+    start_playback_fps()
+
+@persistent
+def perf_mode_frame_change_handler(scene, *args):
+    add_playback_fps_frame()
+
+@persistent
+def perf_mode_playback_post_handler(scene, *args):
+    fps = stop_playback_fps()
+    perf_enabled = perf_mode_playback_state["auto"] or getattr(scene, "OLuminSL_PerfMode", False)
+    if perf_mode_playback_state["auto"]:
+        set_scene_sunlit_rigs_perf_mode(scene, False)
+        perf_mode_playback_state["auto"] = False
+    if fps is None:
+        return
+    perf_mode_playback_state["fps"][perf_enabled] = fps
+    other_fps = perf_mode_playback_state["fps"][not perf_enabled]
+    msg = "Sunlit playback: " + format(fps, ".1f") + " fps, rig performance mode " + ("on" if perf_enabled else "off")
+    if other_fps is not None:
+        gained = fps - other_fps if perf_enabled else other_fps - fps
+        msg = msg + ", performance mode gained " + format(gained, ".1f") + " fps"
+    print(msg)
+
+# animation playback handlers are not in older Blender versions, so performance mode is not automatic in those
+PERF_MODE_HANDLERS = [
+    ("animation_playback_pre", perf_mode_playback_pre_handler),
+    ("frame_change_post", perf_mode_frame_change_handler),
+    ("animation_playback_post", perf_mode_playback_post_handler),
+]
+
+def register_perf_mode_handlers():
+    for handler_list_name, handler in PERF_MODE_HANDLERS:
+        handler_list = getattr(bpy.app.handlers, handler_list_name, None)
+        if handler_list is not None and handler not in handler_list:
+            handler_list.append(handler)
+
+def unregister_perf_mode_handlers():
+    for handler_list_name, handler in PERF_MODE_HANDLERS:
+        handler_list = getattr(bpy.app.handlers, handler_list_name, None)
+        if handler_list is not None and handler in handler_list:
+            handler_list.remove(handler)
+
 def get_blinds_material():
     blinds_mat = bpy.data.materials.get(SUNLIT_BLINDS_MAT_NAME)
     if blinds_mat is None:
@@ -773,21 +1275,42 @@ def get_blinds_material():
         set_mat_diffuse_color(blinds_mat, (0, 0, 0, 0))
     return blinds_mat
 
+# blinds material is added to mesh once, because blinds may share mesh
 def add_blinds_material_to_obj(obj):
     blinds_mat = get_blinds_material()
-    obj.data.materials.append(blinds_mat)
+    if blinds_mat.name not in obj.data.materials:
+        obj.data.materials.append(blinds_mat)
 
 def add_blinds_material_to_obj_list(obj_list):
-    blinds_mat = get_blinds_material()
     for ob in obj_list:
-        ob.data.materials.append(blinds_mat)
+        add_blinds_material_to_obj(ob)
+
+# Set material in object's first material slot, with slot linked to object (not mesh), so that objects sharing a mesh
+# can each have their own material, e.g. each sensor has its own bake image.
+def set_object_linked_material(ob, mat):
+    if len(ob.data.materials) < 1:
+        ob.data.materials.append(None)
+    ob.material_slots[0].link = "OBJECT"
+    ob.material_slots[0].material = mat
 
 # Create a two-sided material for sensor, so this code can be used for regular sensors and "occluding disk sensor":
 #    -diffuse shader on front face
 #    -zero shader (disconnected shader) on back face
-def create_sensor_material_on_obj(ob, sun_sensor_image_width, sun_sensor_image_height):
+# If use_image is False then the material has no Image Texture node, e.g. for sensors baked to color attributes.
+def create_sensor_material_on_obj(ob, sun_sensor_image_width, sun_sensor_image_height, use_image=True):
     # new material for each object, because each sensor, or "bake plane", needs separate image for bake
-    new_bake_mat = bpy.data.materials.new(name=SUNLIT_BAKE_MAT_NAME)
+    bake_img = None
+    if use_image:
+        # new image for each new material
+        bake_img = bpy.data.images.new(name=SUNLIT_BAKE_IMG_NAME, width=sun_sensor_image_width,
+            height=sun_sensor_image_height, alpha=False)
+        image_pack_image(bake_img)
+    # add new sensor material to object
+    set_object_linked_material(ob, create_sensor_material(SUNLIT_BAKE_MAT_NAME, bake_img))
+
+# create sensor material with bake_img in Image Texture node, or no Image Texture node if bake_img is None
+def create_sensor_material(mat_name, bake_img):
+    new_bake_mat = bpy.data.materials.new(name=mat_name)
     new_bake_mat.use_nodes = True
 
     # ---
@@ -815,13 +1338,11 @@ def create_sensor_material_on_obj(ob, sun_sensor_image_width, sun_sensor_image_h
     node.location = (-752, 102)
     new_nodes["Texture Coordinate"] = node
 
-    node = tree_nodes.new(type="ShaderNodeTexImage")
-    node.location = (-552, 242)
-    # new image for each new material
-    node.image = bpy.data.images.new(name=SUNLIT_BAKE_IMG_NAME, width=sun_sensor_image_width,
-        height=sun_sensor_image_height, alpha=False)
-    image_pack_image(node.image)
-    new_nodes["Image Texture"] = node
+    if bake_img is not None:
+        node = tree_nodes.new(type="ShaderNodeTexImage")
+        node.location = (-552, 242)
+        node.image = bake_img
+        new_nodes["Image Texture"] = node
 
     node = tree_nodes.new(type="ShaderNodeMixShader")
     node.location = (150, 500)
@@ -832,12 +1353,39 @@ def create_sensor_material_on_obj(ob, sun_sensor_image_width, sun_sensor_image_h
     tree_links.new(new_nodes["Mix Shader"].outputs[0], new_nodes["Material Output"].inputs[0])
     tree_links.new(new_nodes["Geometry"].outputs[6], new_nodes["Mix Shader"].inputs[0])
     tree_links.new(new_nodes["Diffuse BSDF"].outputs[0], new_nodes["Mix Shader"].inputs[1])
-    tree_links.new(new_nodes["Texture Coordinate"].outputs[2], new_nodes["Image Texture"].inputs[0])
+    if bake_img is not None:
+        tree_links.new(new_nodes["Texture Coordinate"].outputs[2], new_nodes["Image Texture"].inputs[0])
     #
     # ---
 
-    # add new sensor material to object
-    ob.data.materials.append(new_bake_mat)
+    return new_bake_mat
+
+# Sensor bake target is either an image (one image per sensor), or a color attribute on the sensor's mesh. For color
+# attributes the sensor mesh is subdivided, so that there are about as many vertexes as there would be image pixels.
+def create_sensor_bake_target_on_obj(ob, sensor_image_width, sensor_image_height, sensor_bake_target):
+    if sensor_bake_target == "COLOR_ATTRIBUTE":
+        subdivide_sensor_mesh(ob, max(sensor_image_width, sensor_image_height) - 1)
+        create_object_color_attribute(ob, SUNLIT_SENSOR_ATTR_NAME)
+        create_sensor_material_on_obj(ob, sensor_image_width, sensor_image_height, False)
+    else:
+        create_sensor_material_on_obj(ob, sensor_image_width, sensor_image_height)
+
+# Subdivide faces of sensor mesh into a fine grid, n-gons (e.g. ODisk) are first split into triangles around center.
+def subdivide_sensor_mesh(ob, num_cuts):
+    if num_cuts < 1:
+        return
+    bm = bmesh.new()
+    bm.from_mesh(ob.data)
+    ngons = [f for f in bm.faces if len(f.verts) > 4]
+    if len(ngons) > 0:
+        bmesh.ops.poke(bm, faces=ngons)
+    bmesh.ops.subdivide_edges(bm, edges=bm.edges[:], cuts=num_cuts, use_grid_fill=True)
+    bm.to_mesh(ob.data)
+    bm.free()
+    ob.data.update()
+
+def get_sunlit_sensor_color_attribute(sensor):
+    return get_object_color_attribute(sensor, SUNLIT_SENSOR_ATTR_NAME)
 
 def get_shader_node_mat_output(nodes_list):
     for node in nodes_list:
@@ -846,27 +1394,37 @@ def get_shader_node_mat_output(nodes_list):
     return None
 
 def create_occluding_disks(context, sl_arm, odisk_bone_name_tuples, odisk_include_sun, odisk_sun_energy,
-        odisk_sun_angle, add_odisk_taper_driver, odisk_sensor_image_width, odisk_sensor_image_height, odisk_blinds_len):
+        odisk_sun_angle, add_odisk_taper_driver, odisk_sensor_image_width, odisk_sensor_image_height, odisk_blinds_len,
+        sensor_bake_target="IMAGE", share_sensor_mesh=True):
     odisk_list = []
     odisk_blinds_list = []
+    odisk_sun_list = []
+    num_odisks = len(odisk_bone_name_tuples)
+    odisk_names = reserve_object_names(SUNLIT_ODISK_PREPEND, num_odisks)
+    odisk_blinds_names = reserve_object_names(SUNLIT_ODISK_BLINDS_PREPEND, num_odisks)
+    odisk_sun_names = reserve_object_names(SUNLIT_ODISK_SUN_PREPEND, num_odisks)
+    # occluding disk is filled in circle, with UVs, and blinds are the same circle without UVs
+    odisk_pydata = get_circle_pydata(SUNLIT_ODISK_RADIUS, fill=True)
+    odisk_mesh = None
+    if share_sensor_mesh:
+        odisk_mesh = get_sunlit_shared_mesh(SUNLIT_MESH_ODISK_NAME, odisk_pydata)
+    odisk_blinds_mesh = get_sunlit_shared_mesh(SUNLIT_MESH_ODISK_BLINDS_NAME, odisk_pydata[0:3] + (None,))
 
     c = 0
     for odisk_pivot_bone_name, odisk_targ_bone_name, odisk_bone_name, odisk_lit_adjust_bone_name in odisk_bone_name_tuples:
         # create occluding disk from filled in circle
-        bpy.ops.mesh.primitive_circle_add(radius=SUNLIT_ODISK_RADIUS, calc_uvs=True, fill_type='NGON',
-            location=SUNLIT_ODISK_OFFSET)
-        odisk = context.active_object
-        odisk.name = obj_prepend_name_num(SUNLIT_ODISK_PREPEND, c)
+        if odisk_mesh is None:
+            odisk = create_pydata_object(odisk_names[c], odisk_pydata, SUNLIT_ODISK_OFFSET)
+        else:
+            odisk = create_mesh_object(odisk_names[c], odisk_mesh, SUNLIT_ODISK_OFFSET)
         odisk.rotation_euler = (math.radians(270), 0, 0)
         odisk.parent = sl_arm
         odisk.parent_type = "BONE"
         odisk.parent_bone = odisk_bone_name
-        create_sensor_material_on_obj(odisk, odisk_sensor_image_width, odisk_sensor_image_height)
+        create_sensor_bake_target_on_obj(odisk, odisk_sensor_image_width, odisk_sensor_image_height, sensor_bake_target)
 
         # create blinds to go with occluding disk
-        bpy.ops.mesh.primitive_circle_add(radius=SUNLIT_ODISK_RADIUS, fill_type='NGON', location=SUNLIT_ODISK_OFFSET)
-        odisk_blinds = context.active_object
-        odisk_blinds.name = obj_prepend_name_num(SUNLIT_ODISK_BLINDS_PREPEND, c)
+        odisk_blinds = create_mesh_object(odisk_blinds_names[c], odisk_blinds_mesh, SUNLIT_ODISK_OFFSET)
         odisk_blinds.rotation_euler = (math.radians(270), 0, 0)
         odisk_blinds.parent = sl_arm
         odisk_blinds.parent_type = "BONE"
@@ -884,7 +1442,7 @@ def create_occluding_disks(context, sl_arm, odisk_bone_name_tuples, odisk_includ
 
         if odisk_include_sun:
             # create Sun to attach to occluding disk
-            odisk_sun = create_object_light(context, obj_prepend_name_num(SUNLIT_ODISK_SUN_PREPEND, c), "SUN", 1, SUNLIT_ODISK_OFFSET)
+            odisk_sun = create_light_object(odisk_sun_names[c], "SUN", 1, SUNLIT_ODISK_OFFSET)
             odisk_sun.rotation_euler = (math.radians(270), 0, 0)
             odisk_sun.data.energy = odisk_sun_energy
             #odisk_sun.data.anle = odisk_sun_angle
@@ -892,12 +1450,14 @@ def create_occluding_disks(context, sl_arm, odisk_bone_name_tuples, odisk_includ
             odisk_sun.parent_type = "BONE"
             odisk_sun.parent_bone = odisk_lit_adjust_bone_name
             set_light_angular_diameter(odisk_sun, odisk_sun_angle)
+            odisk_sun_list.append(odisk_sun)
 
         odisk_list.append(odisk)
         odisk_blinds_list.append(odisk_blinds)
 
         c = c + 1
 
+    link_object_list(context, odisk_list + odisk_blinds_list + odisk_sun_list)
     return odisk_list, odisk_blinds_list
 
 def add_regular_blinds_drivers(solid_mod, armature, diff_cube_bone_name, blinds_length):
@@ -921,28 +1481,140 @@ def add_odisk_blinds_taper_driver(source_modifier, armature, odisk_bone_name, od
     # multiply by 11/300, verified this by scaling up the ODisk sensor bone
     d.expression = "sqrt("+v1.name+" * "+v1.name+" + "+v2.name+" * "+v2.name+") * " + str(odisk_blinds_len * 11 / 300)
 
-def set_odisk_point_at_locations(context, sl_arm, odisk_bone_name_tuples):
-    old_3dview_mode = context.object.mode
-    set_active_object(context, sl_arm)
-
-    bpy.ops.object.mode_set(mode='POSE')
+def get_odisk_point_at_locations(odisk_bone_name_tuples):
+    bone_locs = {}
     total = len(odisk_bone_name_tuples)
     c = 0
     for odisk_pivot_b_name, odisk_target_b_name, odisk_b_name, odisk_lit_adjust_bone_name in odisk_bone_name_tuples:
-        sl_arm.pose.bones[odisk_target_b_name].location[0] = math.cos(c / total * 2 * math.pi) * SUNLIT_ODISK_POINT_AT_RADIUS
-        sl_arm.pose.bones[odisk_target_b_name].location[1] = math.sin(c / total * 2 * math.pi) * SUNLIT_ODISK_POINT_AT_RADIUS
-        sl_arm.pose.bones[odisk_target_b_name].location[2] = 0
+        bone_locs[odisk_target_b_name] = (math.cos(c / total * 2 * math.pi) * SUNLIT_ODISK_POINT_AT_RADIUS,
+            math.sin(c / total * 2 * math.pi) * SUNLIT_ODISK_POINT_AT_RADIUS, 0)
         c = c + 1
-    bpy.ops.object.mode_set(mode=old_3dview_mode)
+    return bone_locs
 
-def bake_sunlit_sensors(context, sensors, sensor_bake_samples, lights_to_hide):
+# denoise is a tuple of (method, radius, sigma_range), method "NONE" (or denoise None) to skip denoise
+# If incremental is True then sensors with unchanged bake inputs (see get_sunlit_sensor_bake_fingerprint) are skipped.
+def bake_sunlit_sensors(context, sensors, sensor_bake_samples, lights_to_hide, denoise=None, incremental=False):
+    if len(sensors) < 1:
+        return
+    world_values = get_world_values(context.scene.world)
+    sensor_fingerprints = []
+    blinds_values_cache = {}
+    for s in sensors:
+        fingerprint = get_sunlit_sensor_bake_fingerprint(s, world_values, sensor_bake_samples, denoise,
+            blinds_values_cache)
+        if not incremental or s.get(SUNLIT_BAKE_FINGERPRINT_PROP) != fingerprint:
+            sensor_fingerprints.append((s, fingerprint))
+    sensors = [ s for s, _ in sensor_fingerprints ]
     if len(sensors) < 1:
         return
     render_hide_lit_data = hide_render_lights(True, lights_to_hide)
     bake_sunlit_sensor_images(context, sensors, sensor_bake_samples)
     undo_hide_render_lights(render_hide_lit_data)
-
-def bake_select_sunlit_sensors(context, sensor_bake_samples, hide_all_lights):
+    if denoise is not None:
+        denoise_sunlit_sensor_images(sensors, denoise)
+    for s, fingerprint in sensor_fingerprints:
+        set_sunlit_sensor_baked(s, fingerprint)
+
+# record fingerprint of sensor's bake inputs, and count the bake so that sun colors sampled from the sensor's previous
+# bake are known to be out of date
+def set_sunlit_sensor_baked(sensor, fingerprint):
+    sensor[SUNLIT_BAKE_FINGERPRINT_PROP] = fingerprint
+    sensor[SUNLIT_BAKE_SERIAL_PROP] = sensor.get(SUNLIT_BAKE_SERIAL_PROP, 0) + 1
+
+# get names of the bones that place the sensor of the sun, or ODisk, with bone number num
+SUNLIT_ODISK_BONE_ROLES = [ SUNLIT_BONE_ODISK_PIVOT, SUNLIT_BONE_ODISK_TARGET, SUNLIT_BONE_ODISK,
+    SUNLIT_BONE_ODISK_LIGHT ]
+SUNLIT_SUN_BONE_ROLES = [ SUNLIT_BONE_SUN_PIVOT, SUNLIT_BONE_SUN_TARGET, SUNLIT_BONE_DIFF_CUBE, SUNLIT_BONE_SENSOR,
+    SUNLIT_BONE_LIT_ADJUST ]
+
+def get_sunlit_sun_bone_names(sl_armature, num, is_odisk):
+    bone_names = [ get_sunlit_bone_name(sl_armature, SUNLIT_BONE_SPHERE, 0) ]
+    for bone_role in (SUNLIT_ODISK_BONE_ROLES if is_odisk else SUNLIT_SUN_BONE_ROLES):
+        bone_names.append(get_sunlit_bone_name(sl_armature, bone_role, num))
+    return [ b_name for b_name in bone_names if b_name is not None ]
+
+# Values of rig's blinds that change the bake of every regular sensor of the rig: boolean blinds of each sun are
+# carved by the diff cubes of all other suns, and Voronoi blinds walls follow the directions of all suns.
+SUNLIT_BLINDS_BONE_ROLES = [ SUNLIT_BONE_SUN_PIVOT, SUNLIT_BONE_SUN_TARGET, SUNLIT_BONE_DIFF_CUBE ]
+
+def get_sunlit_rig_blinds_values(sl_armature):
+    values = [ get_sunlit_blinds_mode(sl_armature), get_plain_value(sl_armature.get(SUNLIT_BLINDS_LEN_PROP)) ]
+    for bone_role in SUNLIT_BLINDS_BONE_ROLES:
+        for num, b_name in get_sunlit_bone_name_list(sl_armature, bone_role):
+            pose_bone = sl_armature.pose.bones.get(b_name)
+            if pose_bone is not None:
+                values.append((b_name, get_matrix_values(pose_bone.matrix)))
+    for blinds in get_sunlit_rig_objects(sl_armature, SUNLIT_ROLE_SUN_BLINDS):
+        s_mod = blinds.modifiers.get(SUNLIT_MODNAME_B_SOLID)
+        if s_mod is not None:
+            values.append((blinds.name, get_plain_value(s_mod.thickness)))
+    return tuple(values)
+
+# Fingerprint of everything that changes the bake result of sensor: pose matrices of the sun's bones (and ODisk bones,
+# which occlude regular sensors), the blinds of all suns of the rig (for regular sensors), sensor transform and
+# resolution, world shader and images, bake samples and denoise.
+# Optional blinds_values_cache is a dict to keep rig blinds values by armature name, when fingerprints of many sensors
+# are made together.
+def get_sunlit_sensor_bake_fingerprint(sensor, world_values, sensor_bake_samples, denoise, blinds_values_cache=None):
+    values = [ world_values, sensor_bake_samples, denoise, get_matrix_values(sensor.matrix_world),
+        get_sunlit_sensor_resolution(sensor) ]
+    sl_armature = sensor.parent
+    num = get_rig_bone_num_for_obj(sensor)
+    if sl_armature is not None and sl_armature.pose is not None and num is not None:
+        is_odisk = get_sunlit_role(sensor) == SUNLIT_ROLE_ODISK_SENSOR
+        bone_names = get_sunlit_sun_bone_names(sl_armature, num, is_odisk)
+        if not is_odisk:
+            for bone_role in SUNLIT_ODISK_BONE_ROLES:
+                bone_names = bone_names + [ b_name for i, b_name in get_sunlit_bone_name_list(sl_armature, bone_role) ]
+            if blinds_values_cache is None:
+                values.append(get_sunlit_rig_blinds_values(sl_armature))
+            else:
+                if sl_armature.name not in blinds_values_cache:
+                    blinds_values_cache[sl_armature.name] = get_sunlit_rig_blinds_values(sl_armature)
+                values.append(blinds_values_cache[sl_armature.name])
+        values.append(get_matrix_values(sl_armature.matrix_world))
+        for b_name in bone_names:
+            pose_bone = sl_armature.pose.bones.get(b_name)
+            if pose_bone is not None:
+                values.append((b_name, get_matrix_values(pose_bone.matrix)))
+    return get_fingerprint(values)
+
+def get_sunlit_sensor_resolution(sensor):
+    attr = get_sunlit_sensor_color_attribute(sensor)
+    if attr is not None:
+        return ("ATTRIBUTE", len(attr.data))
+    tile = get_sensor_atlas_tile(sensor)
+    if tile is not None:
+        return ("TILE", tile)
+    img = get_sunlit_bake_image_for_plane(sensor)
+    if img is None:
+        return None
+    return ("IMAGE", img.name, img.size[0], img.size[1])
+
+# Denoise baked sensor images, before the images are sampled for sun colors. Sensors in an atlas share one image, so
+# only the tiles of the given sensors are denoised (tiles of sensors not baked again are not blurred again), each
+# tile on its own.
+def denoise_sunlit_sensor_images(sensors, denoise):
+    method, radius, sigma_range = denoise
+    if method != "BILATERAL":
+        return
+    # images by name, with list of tiles to denoise, or None for the whole image
+    img_tiles = {}
+    for s in sensors:
+        img = get_sunlit_bake_image_for_plane(s)
+        if img is None:
+            continue
+        tile = get_sensor_atlas_tile(s)
+        if tile is None:
+            img_tiles[img.name] = (img, None)
+        elif img.name not in img_tiles:
+            img_tiles[img.name] = (img, [ tile ])
+        elif img_tiles[img.name][1] is not None and tile not in img_tiles[img.name][1]:
+            img_tiles[img.name][1].append(tile)
+    for img, tiles in img_tiles.values():
+        denoise_image_bilateral(img, radius, sigma_range, tiles)
+
+def bake_select_sunlit_sensors(context, sensor_bake_samples, hide_all_lights, denoise=None, incremental=False):
     if hide_all_lights:
         lights = get_all_lights()
     else:
@@ -956,10 +1628,11 @@ def bake_select_sunlit_sensors(context, sensor_bake_samples, hide_all_lights):
             warnings.append("Sunlit Image Sensor Mesh not baked, make mesh 'render visible' before baking, mesh named: " + s.name)
         else:
             vis_sensors.append(s)
-    bake_sunlit_sensors(context, vis_sensors, sensor_bake_samples, lights)
+    bake_sunlit_sensors(context, vis_sensors, sensor_bake_samples, lights, denoise, incremental)
     return warnings
 
-def bake_sunlit_armature_list_sensors(context, sensor_bake_samples, hide_all_lights, armature_list):
+def bake_sunlit_armature_list_sensors(context, sensor_bake_samples, hide_all_lights, armature_list, denoise=None,
+        incremental=False):
     if hide_all_lights:
         lights = get_all_lights()
     else:
@@ -974,9 +1647,13 @@ def bake_sunlit_armature_list_sensors(context, sensor_bake_samples, hide_all_lig
             warnings.append("Sunlit Image Sensor Mesh not baked, make mesh 'render visible' before baking, mesh named: " + s.name)
         else:
             vis_sensors.append(s)
-    bake_sunlit_sensors(context, sensors, sensor_bake_samples, lights)
+    bake_sunlit_sensors(context, sensors, sensor_bake_samples, lights, denoise, incremental)
     return warnings
 
+# get denoise settings of scene, as a tuple for bake_sunlit_sensors
+def get_sunlit_bake_denoise(scn):
+    return (scn.OLuminSL_BakeDenoise, scn.OLuminSL_DenoiseRadius, scn.OLuminSL_DenoiseStrength)
+
 def hide_render_lights(new_hide_state, lights):
     hide_light_data = []
 
@@ -1002,10 +1679,14 @@ def undo_hide_render_lights(hide_light_data):
 def bake_sunlit_sensor_images(context, obj_list, sensor_bake_samples):
     if len(obj_list) < 1:
         return
-    bpy.ops.object.select_all(action='DESELECT')
-    select_objects(obj_list)
-    # set active object to an object that will be baked, so that bpy,ops.object.bake does not error with 'incorrect context'
-    set_active_object(context, obj_list[0])
+    # sensors baked to color attributes need a separate bake, with a different bake target
+    image_obj_list = []
+    attr_obj_list = []
+    for ob in obj_list:
+        if get_sunlit_sensor_color_attribute(ob) is None:
+            image_obj_list.append(ob)
+        else:
+            attr_obj_list.append(ob)
 
     old_use_pass_direct = context.scene.render.bake.use_pass_direct
     old_use_pass_indirect = context.scene.render.bake.use_pass_indirect
@@ -1014,86 +1695,320 @@ def bake_sunlit_sensor_images(context, obj_list, sensor_bake_samples):
     context.scene.render.bake.use_pass_indirect = True
     context.scene.render.bake.use_pass_color = False
 
+    # sensors in an atlas share one image, so the bake must not clear tiles of sensors that are not being baked, and
+    # bake margin must not spill into neighbor tiles
+    old_use_clear = context.scene.render.bake.use_clear
+    old_margin = context.scene.render.bake.margin
+    if any(get_sensor_atlas_tile(ob) is not None for ob in image_obj_list):
+        context.scene.render.bake.use_clear = False
+        context.scene.render.bake.margin = min(old_margin, SUNLIT_ATLAS_TILE_PADDING)
+
     prev_samples = context.scene.cycles.samples
     context.scene.cycles.samples = sensor_bake_samples
-    bpy.ops.object.bake(type="DIFFUSE")
+    if len(image_obj_list) > 0:
+        select_bake_objects(context, image_obj_list)
+        bpy.ops.object.bake(type="DIFFUSE")
+    if len(attr_obj_list) > 0:
+        select_bake_objects(context, attr_obj_list)
+        bake_selected_to_color_attributes("DIFFUSE")
     context.scene.cycles.samples = prev_samples
 
     context.scene.render.bake.use_pass_direct = old_use_pass_direct
     context.scene.render.bake.use_pass_indirect = old_use_pass_indirect
     context.scene.render.bake.use_pass_color = old_use_pass_color
+    context.scene.render.bake.use_clear = old_use_clear
+    context.scene.render.bake.margin = old_margin
+
+    # baked images have new pixels, so cached sample data is no longer valid
+    for ob in image_obj_list:
+        img = get_sunlit_bake_image_for_plane(ob)
+        if img is not None:
+            invalidate_image_cache(img.name)
+
+def select_bake_objects(context, obj_list):
+    bpy.ops.object.select_all(action='DESELECT')
+    select_objects(obj_list)
+    # set active object to an object that will be baked, so that bpy,ops.object.bake does not error with 'incorrect context'
+    set_active_object(context, obj_list[0])
 
-def set_sun_color_data(keyframe_color, sample_width_pct, sample_height_pct, odisk_sample_width_pct, odisk_sample_height_pct, sun_lights):
+# If incremental is True then suns are skipped if their sensor was not baked again, and sample settings and sun color
+# are unchanged, since the sun's color was last set.
+def set_sun_color_data(keyframe_color, sample_width_pct, sample_height_pct, odisk_sample_width_pct, odisk_sample_height_pct,
+        sample_kernel, odisk_sample_kernel, sun_lights, incremental=False):
+    # plain box average samples are gathered per image, and done together as one vectorized pass per image, e.g. one
+    # pass for all suns of all rigs in a sensor atlas
+    box_samples = {}
     for light in sun_lights:
         sensor = get_sunlit_sensor_for_light(light)
         if sensor is None:
             continue
+        # set sun color, with the color estimator of the light's rig
+        estimator = get_sunlit_color_estimator(light.parent)
+        sensor_attr = get_sunlit_sensor_color_attribute(sensor)
+        if sensor_attr is not None:
+            sample_settings = (sample_width_pct, sample_height_pct, odisk_sample_width_pct, odisk_sample_height_pct,
+                sample_kernel, odisk_sample_kernel, estimator)
+            if incremental and not is_sunlit_light_color_dirty(light, sensor, sample_settings, keyframe_color):
+                continue
+            set_light_color(light, get_color_sample_from_attribute(sensor, sensor_attr, is_sunlit_odisk(light),
+                sample_width_pct, sample_height_pct, odisk_sample_width_pct, odisk_sample_height_pct, sample_kernel,
+                odisk_sample_kernel, estimator))
+            if keyframe_color:
+                keyframe_light_color(light)
+            set_sunlit_light_color_done(light, sensor, sample_settings, keyframe_color)
+            continue
         plane_img = get_sunlit_bake_image_for_plane(sensor)
         if plane_img is None:
             continue
-
-        # set sun color
-        if is_sunlit_odisk:
-            set_light_color(light, get_color_sample_from_image(plane_img,
-                math.floor(plane_img.size[0] * odisk_sample_width_pct),
-                math.floor(plane_img.size[1] * odisk_sample_height_pct)))
+        # sensor's pixels are the sensor's tile of an atlas image, or the whole image
+        tile = get_sensor_atlas_tile(sensor)
+        if tile is None:
+            tile = (0, 0, plane_img.size[0], plane_img.size[1])
+
+        if is_sunlit_odisk(light):
+            sample_w = math.floor(tile[2] * odisk_sample_width_pct)
+            sample_h = math.floor(tile[3] * odisk_sample_height_pct)
+            kernel = odisk_sample_kernel
         else:
-            set_light_color(light, get_color_sample_from_image(plane_img,
-                math.floor(plane_img.size[0] * sample_width_pct),
-                math.floor(plane_img.size[1] * sample_height_pct)))
+            sample_w = math.floor(tile[2] * sample_width_pct)
+            sample_h = math.floor(tile[3] * sample_height_pct)
+            kernel = sample_kernel
+        sample_settings = (plane_img.name, tile, sample_w, sample_h, kernel, estimator)
+        if incremental and not is_sunlit_light_color_dirty(light, sensor, sample_settings, keyframe_color):
+            continue
+        if kernel == "BOX" and (estimator is None or estimator[0] == "MEAN"):
+            if plane_img.name not in box_samples:
+                box_samples[plane_img.name] = (plane_img, [])
+            box_samples[plane_img.name][1].append((light, sensor, sample_settings))
+            continue
+        set_light_color(light, get_color_sample_from_image(plane_img, sample_w, sample_h, kernel, estimator, tile))
 
         # add keyframe if needed
         if keyframe_color:
             keyframe_light_color(light)
+        set_sunlit_light_color_done(light, sensor, sample_settings, keyframe_color)
+
+    for plane_img, samples in box_samples.values():
+        sun_colors = get_image_tiles_mean_colors(plane_img, [ ss[1] for _, _, ss in samples ],
+            [ (ss[2], ss[3]) for _, _, ss in samples ])
+        for (light, sensor, sample_settings), sun_color in zip(samples, sun_colors):
+            set_light_color(light, (float(sun_color[0]), float(sun_color[1]), float(sun_color[2])))
+            if keyframe_color:
+                keyframe_light_color(light)
+            set_sunlit_light_color_done(light, sensor, sample_settings, keyframe_color)
+
+# Fingerprint of sun color inputs: sensor's bake (by bake count), sample settings, and the light's current color (so
+# colors changed by hand are set again). If keyframing then the frame is included, so each frame gets its keyframe.
+def get_sunlit_light_color_fingerprint(light, sensor, sample_settings, keyframe_color):
+    frame = bpy.context.scene.frame_current if keyframe_color else None
+    return get_fingerprint((sensor.name, sensor.get(SUNLIT_BAKE_SERIAL_PROP), sensor.get(SUNLIT_BAKE_FINGERPRINT_PROP),
+        sample_settings, get_plain_value(light.data.color), frame))
+
+def is_sunlit_light_color_dirty(light, sensor, sample_settings, keyframe_color):
+    return light.get(SUNLIT_COLOR_FINGERPRINT_PROP) != get_sunlit_light_color_fingerprint(light, sensor,
+        sample_settings, keyframe_color)
+
+def set_sunlit_light_color_done(light, sensor, sample_settings, keyframe_color):
+    light[SUNLIT_COLOR_FINGERPRINT_PROP] = get_sunlit_light_color_fingerprint(light, sensor, sample_settings,
+        keyframe_color)
+
+# rectangle sample, sample width and height given in pixels, pixels weighted by sample kernel
+def get_color_sample_from_image(img, sample_w, sample_h, sample_kernel="BOX", estimator=None, tile=None):
+    # return sample average, from the image's cached pixel data
+    return get_image_sample_color(img, sample_w, sample_h, sample_kernel, estimator, tile)
+
+# sample sensor baked to color attribute, sample width and height given as fraction of sensor size
+def get_color_sample_from_attribute(sensor, sensor_attr, is_odisk, sample_width_pct, sample_height_pct,
+        odisk_sample_width_pct, odisk_sample_height_pct, sample_kernel, odisk_sample_kernel, estimator):
+    co, rgb = get_mesh_color_attribute_buffer(sensor.data, sensor_attr, get_color_attribute_domain(sensor_attr))
+    if is_odisk:
+        return get_mesh_attribute_sample_color(co, rgb, odisk_sample_width_pct, odisk_sample_height_pct,
+            odisk_sample_kernel, estimator)
+    return get_mesh_attribute_sample_color(co, rgb, sample_width_pct, sample_height_pct, sample_kernel, estimator)
+
+# get color estimator settings of Sunlit armature, as a tuple for get_color_sample_from_image
+def get_sunlit_color_estimator(sl_armature):
+    if sl_armature is None or not hasattr(sl_armature, "OLuminSL_ColorEstimator"):
+        return None
+    return (sl_armature.OLuminSL_ColorEstimator, sl_armature.OLuminSL_EstimatorTrimPct,
+        sl_armature.OLuminSL_EstimatorGroups, sl_armature.OLuminSL_EstimatorClampPct)
+
+# get world space direction (unit vector) that the sun's sensor is "looking" toward, from the pointing direction
+# (pose Y axis) of the sun's pivot bone, i.e. the bone that is the parent of the light's parent bone
+def get_sunlit_sun_view_direction(light):
+    if light.parent is None or light.parent_type != "BONE":
+        return None
+    light_pose_bone = light.parent.pose.bones.get(light.parent_bone)
+    if light_pose_bone is None or light_pose_bone.parent is None:
+        return None
+    pivot_mat = matrix_vector_mult(light.parent.matrix_world, light_pose_bone.parent.matrix)
+    return Vector((pivot_mat[0][1], pivot_mat[1][1], pivot_mat[2][1])).normalized()
+
+# get (direction, half_angle) cone of environment occluded by an ODisk sensor, as seen from the rig's center
+def get_sunlit_odisk_cone(sl_armature, odisk_sensor):
+    odisk_loc = odisk_sensor.matrix_world.to_translation()
+    delta = odisk_loc - sl_armature.matrix_world.to_translation()
+    if delta.length == 0:
+        return None
+    odisk_radius = SUNLIT_ODISK_RADIUS * max(odisk_sensor.matrix_world.to_scale())
+    return delta.normalized(), math.atan2(odisk_radius, delta.length)
+
+# Get environment cones sampled by suns in Direct mode, as list of (light, direction, half_angle, exclude_cones).
+# Regular suns sample the environment inside their angular diameter cone, leaving out the cones occluded by the
+# rig's ODisks. ODisk suns sample the environment occluded by their ODisk.
+def get_sunlit_direct_sample_cones(sun_lights):
+    sample_cones = []
+    # ODisk cones of each armature, by armature name
+    odisk_cones = {}
+    for light in sun_lights:
+        if light.parent is None or not is_sunlit_armature(light.parent):
+            continue
+        view_dir = get_sunlit_sun_view_direction(light)
+        if view_dir is None:
+            continue
+        sl_armature = light.parent
+        rig_cones = odisk_cones.get(sl_armature.name)
+        if rig_cones is None:
+            rig_cones = {}
+            for odisk_sensor in get_sunlit_odisk_sensors_from_armature(sl_armature):
+                cone = get_sunlit_odisk_cone(sl_armature, odisk_sensor)
+                if cone is not None:
+                    rig_cones[get_rig_bone_num_for_obj(odisk_sensor)] = cone
+            odisk_cones[sl_armature.name] = rig_cones
+
+        if is_sunlit_odisk(light):
+            cone = rig_cones.get(get_rig_bone_num_for_obj(light))
+            if cone is None:
+                continue
+            sample_cones.append((light, cone[0], cone[1], None))
+        else:
+            sample_cones.append((light, view_dir, light.data.angle / 2, list(rig_cones.values())))
+    return sample_cones
+
+# Set sun colors by sampling the world's environment image directly, instead of sampling baked sensor images.
+# Returns False if the world has no environment image to sample.
+def set_sun_color_data_direct(context, keyframe_color, sun_lights):
+    env_img = get_world_environment_image(context.scene.world)
+    if env_img is None:
+        return False
+    env_buf = get_env_sample_buffer(env_img)
+    for light, direction, half_angle, exclude_cones in get_sunlit_direct_sample_cones(sun_lights):
+        set_light_color(light, get_env_cone_mean_color(env_buf, direction, half_angle, exclude_cones))
 
-# rectangle sample, sample width and height given in pixels
-def get_color_sample_from_image(img, sample_w, sample_h):
-    # prevent error of sampling outside image pixels
-    if sample_w > img.size[0]:
-        sample_w = img.size[0]
-    if sample_h > img.size[1]:
-        sample_h = img.size[1]
-    num_pixels = sample_w * sample_h
-
-    # sample centered at middle of image pixels
-    mid_x = math.floor(img.size[0] / 2)
-    mid_y = math.floor(img.size[1] / 2)
-
-    # get average color sample from image pixels, and average to get avg_sample_color
-    asc = (0, 0, 0)
-    low_x = mid_x-math.floor(sample_w/2)
-    low_y = mid_y-math.floor(sample_h/2)
-    for y in range(low_y, low_y+sample_h):
-        for x in range(low_x, low_x+sample_w):
-            # multiply by 4 because RGBA
-            px_offset = (y * img.size[0] + x) * 4
-            asc = (asc[0]+img.pixels[px_offset], asc[1]+img.pixels[px_offset+1], asc[2]+img.pixels[px_offset+2])
-    # return sample average
-    return (asc[0] / num_pixels, asc[1] / num_pixels, asc[2] / num_pixels)
+        # add keyframe if needed
+        if keyframe_color:
+            keyframe_light_color(light)
+    return True
 
 def set_select_sun_color_data(context, keyframe_color, sample_width_pct, sample_height_pct, odisk_sample_width_pct,
-        odisk_sample_height_pct):
+        odisk_sample_height_pct, sample_kernel, odisk_sample_kernel, incremental=False):
     set_sun_color_data(keyframe_color, sample_width_pct, sample_height_pct, odisk_sample_width_pct, odisk_sample_height_pct,
-        get_sunlit_suns_from_selected(context))
+        sample_kernel, odisk_sample_kernel, get_sunlit_suns_from_selected(context), incremental)
 
-def set_sunlit_armature_sun_color_data(keyframe_color, sample_width_pct, sample_height_pct, odisk_sample_width_pct,
-        odisk_sample_height_pct, armature):
+# suns of all armatures in list are done together, so that sensors sharing an atlas are sampled in one pass
+def set_sunlit_armature_list_sun_color_data(keyframe_color, sample_width_pct, sample_height_pct, odisk_sample_width_pct,
+        odisk_sample_height_pct, sample_kernel, odisk_sample_kernel, armature_list, incremental=False):
+    sun_lights = []
+    for armature in armature_list:
+        sun_lights = sun_lights + get_sunlit_suns_from_armature(armature)
     set_sun_color_data(keyframe_color, sample_width_pct, sample_height_pct, odisk_sample_width_pct, odisk_sample_height_pct,
-        get_sunlit_suns_from_armature(armature))
+        sample_kernel, odisk_sample_kernel, sun_lights, incremental)
 
-def set_sunlit_sun_angular_diameter(context, light_list, keyframe_angular_diameter):
+# get rigs of lights in list that are in performance mode
+def get_sunlit_perf_mode_rigs(light_list):
+    perf_rigs = []
     for light in light_list:
-        # if center point is not found, then skip this light
-        if light.parent is None or is_sunlit_armature(light.parent) == False:
-            continue
-        center_point = light.parent.matrix_world.to_translation()
-        blinds = get_sunlit_blinds_for_light(light)
-        if blinds is None:
+        if light.parent is not None and light.parent not in perf_rigs and is_sunlit_armature(light.parent) and \
+                is_sunlit_rig_perf_mode(light.parent):
+            perf_rigs.append(light.parent)
+    return perf_rigs
+
+# Set angular diameter of all lights in list (lights may be from many rigs). Depsgraph is evaluated once, and then
+# every blinds object's mesh after modifiers is read from it. If toggle_perf_mode is False then the caller turns off
+# performance mode of the lights' rigs, e.g. once around many calls.
+def set_sunlit_sun_angular_diameter(context, light_list, keyframe_angular_diameter, brute_force=False,
+                                    toggle_perf_mode=True):
+    # rig helpers in performance mode are evaluated again while angular diameters are computed
+    perf_rigs = get_sunlit_perf_mode_rigs(light_list) if toggle_perf_mode else []
+    for sl_armature in perf_rigs:
+        set_sunlit_rig_perf_mode(sl_armature, False)
+    try:
+        depsgraph = get_evaluated_depsgraph(context)
+        voronoi_cells = {}
+        for light in light_list:
+            # if center point is not found, then skip this light
+            if light.parent is None or is_sunlit_armature(light.parent) == False:
+                continue
+            # angular diameter of Voronoi blinds comes straight from the sun's cell
+            if get_sunlit_blinds_mode(light.parent) == "VORONOI" and not is_sunlit_odisk(light) and not brute_force:
+                if light.parent.name not in voronoi_cells:
+                    voronoi_cells[light.parent.name] = get_sunlit_voronoi_cells(light.parent)
+                cell_dirs = voronoi_cells[light.parent.name].get(get_rig_bone_num_for_obj(light))
+                if cell_dirs is not None:
+                    set_light_angular_diameter(light, get_max_pairwise_angle(cell_dirs))
+                    if keyframe_angular_diameter:
+                        keyframe_light_angular_diameter(light)
+                    continue
+            center_point = light.parent.matrix_world.to_translation()
+            blinds = get_sunlit_blinds_for_light(light)
+            if blinds is None:
+                continue
+            ad = get_light_angular_diameter_from_blinds(depsgraph, center_point, blinds, brute_force)
+            set_light_angular_diameter(light, ad)
+            if keyframe_angular_diameter:
+                keyframe_light_angular_diameter(light)
+    finally:
+        for sl_armature in perf_rigs:
+            set_sunlit_rig_perf_mode(sl_armature, True)
+
+# Set values of lights at every frame of the scene frame range, by calling set_func() once per frame (with keyframing
+# off), and keyframe data_path (e.g. "color", "angle") of the lights' data with the values of all frames at once: each
+# F-curve is written once, instead of one keyframe_insert (and F-curve update) per light per frame. Keyframes outside
+# the frame range are kept. Returns number of frames.
+def set_sunlit_lights_frame_range(context, light_list, data_path, set_func):
+    scene = context.scene
+    light_data_list = []
+    for light in light_list:
+        if light.data not in light_data_list:
+            light_data_list.append(light.data)
+    frames = list(range(scene.frame_start, max(scene.frame_start, scene.frame_end) + 1))
+    values = [ [] for light_data in light_data_list ]
+    old_frame = scene.frame_current
+    try:
+        for frame in frames:
+            scene.frame_set(frame)
+            set_func()
+            for light_data, data_values in zip(light_data_list, values):
+                value = light_data.path_resolve(data_path)
+                data_values.append(value[:] if hasattr(value, "__len__") else value)
+    finally:
+        scene.frame_set(old_frame)
+    for light_data, data_values in zip(light_data_list, values):
+        action = get_id_action(light_data, light_data.name + "Action")
+        data_values = np.array(data_values, dtype=np.float32)
+        if data_values.ndim > 1:
+            set_fcurve_array_keyframes(action, data_path, frames, data_values, keep_outside_range=True)
+        else:
+            set_fcurve_keyframes(action, data_path, 0, frames, data_values, keep_outside_range=True)
+    return len(frames)
+
+# Compact keyframes of color and angle F-curves of the lights' data, removing keys that linear interpolation of the
+# other keys gives within tolerance. Returns (number of keyframes removed, number of keyframes before).
+def compact_sunlit_sun_keyframes(light_list, tolerance):
+    num_removed = 0
+    num_keys = 0
+    light_data_list = []
+    for light in light_list:
+        if light.data not in light_data_list:
+            light_data_list.append(light.data)
+    for light_data in light_data_list:
+        if light_data.animation_data is None or light_data.animation_data.action is None:
             continue
-        ad = get_light_angular_diameter_from_blinds(context, center_point, blinds)
-        set_light_angular_diameter(light, ad)
-        if keyframe_angular_diameter:
-            keyframe_light_angular_diameter(light)
+        action = light_data.animation_data.action
+        for fcurve in [ fc for fc in action.fcurves if fc.data_path in SUNLIT_COMPACT_DATA_PATHS ]:
+            num_keys = num_keys + len(fcurve.keyframe_points)
+            num_removed = num_removed + compact_fcurve_keyframes(action, fcurve, tolerance)
+    return num_removed, num_keys
 
 def get_sunlit_center_for_light(light):
     # if no armature from which to get center point, then skip this light
@@ -1108,31 +2023,25 @@ def get_sunlit_center_for_light(light):
 #     Also, improve the process by getting vectors for directions of vertexes from the center_point, and calculating
 #     the distance halfway between min and max in order to filter out unneeded/error-causing vertexes. Halfway is just
 #     a good, easy way to filter between wrong vertexes (near vertexes), and correct vertexes (far away vertexes).
-def get_light_angular_diameter_from_blinds(context, center_point, mesh_obj):
-    obj_mod_mesh = get_mesh_post_modifiers(context, mesh_obj)
+#     Vertex locations are read with foreach_get, and the max angle is found with a spherical convex hull (see
+#     sunlit_angle.py). If brute_force is True then all pairs of directions are compared one by one, for verification.
+def get_light_angular_diameter_from_blinds(depsgraph, center_point, mesh_obj, brute_force=False):
+    v_co = get_mesh_post_modifiers_coords(depsgraph, mesh_obj)
+    if len(v_co) < 3:
+        return 0.0
     # calculate delta for each vertex, and get statistical min/max magnitudes
-    v_deltas = []
-    min_delta_mag = -1
-    max_delta_mag = -1
-    for v in obj_mod_mesh.vertices:
-        vert_world_location = matrix_vector_mult(mesh_obj.matrix_world, v.co)
-        delta = vert_world_location - center_point
-        if min_delta_mag == -1 or delta.magnitude <= min_delta_mag:
-            min_delta_mag = delta.magnitude
-        if max_delta_mag == -1 or delta.magnitude >= max_delta_mag:
-            max_delta_mag = delta.magnitude
-        v_deltas.append(delta)
-    bpy.data.meshes.remove(obj_mod_mesh)
+    mat = np.array(mesh_obj.matrix_world)
+    v_deltas = v_co.reshape((-1, 3)) @ mat[0:3, 0:3].T + mat[0:3, 3] - np.array(center_point)
+    delta_mags = np.linalg.norm(v_deltas, axis=1)
     # filter out vertexes that are too close to be usable for angle calcs
-    final_deltas = []
-    filter_mag = (min_delta_mag + max_delta_mag) / 2
-    for delta in v_deltas:
-        # filter out vertexes that are too close
-        if delta.magnitude < filter_mag:
-            continue
-        final_deltas.append(delta.normalized())
-    # get dot products between all combinations of deltas, and find the lowest dot product
-    # TODO improve efficiency because currently this is a O(n^2) solution; terrible
+    filter_mag = (delta_mags.min() + delta_mags.max()) / 2
+    final_deltas = v_deltas[delta_mags >= filter_mag]
+    if brute_force:
+        return get_max_angle_brute_force([ Vector(d).normalized() for d in final_deltas ])
+    return get_max_pairwise_angle(final_deltas)
+
+# get dot products between all combinations of deltas, and find the lowest dot product - O(n^2), for verification only
+def get_max_angle_brute_force(final_deltas):
     lowest_dot = 1
     for first_delta in final_deltas:
         for second_delta in final_deltas:
@@ -1140,7 +2049,7 @@ def get_light_angular_diameter_from_blinds(context, center_point, mesh_obj):
             if d < lowest_dot:
                 lowest_dot = d
     # return the inverse cosine of the lowest dot product value; this is the highest angle value
-    return math.acos(lowest_dot)
+    return math.acos(max(-1, lowest_dot))
 
 def get_sunlit_objects_from_selected(context, name_prepend_str):
     obj_list = []
@@ -1161,25 +2070,23 @@ def get_sunlit_objects_from_armature(armature, bone_name, obj_name_prepend):
     for bone in armature.data.bones:
         if not bone.name.startswith(bone_name):
             continue
-        obj_list = get_objects_parented_to_bone(armature, bone.name, obj_name_prepend)
-        total_obj_list = total_obj_list + obj_list
+        total_obj_list.extend(get_objects_parented_to_bone(armature, bone.name, obj_name_prepend))
     return total_obj_list
 
 def get_sunlit_suns_from_armature(armature):
-    return get_sunlit_objects_from_armature(armature, SUNLIT_BONE_LIT_ADJUST, SUNLIT_SUN_PREPEND) + \
-        get_sunlit_objects_from_armature(armature, SUNLIT_BONE_ODISK_LIGHT, SUNLIT_ODISK_SUN_PREPEND)
+    return get_sunlit_rig_objects(armature, SUNLIT_ROLE_SUN) + get_sunlit_rig_objects(armature, SUNLIT_ROLE_ODISK_SUN)
 
 def get_sunlit_regular_sensors_from_armature(armature):
-    return get_sunlit_objects_from_armature(armature, SUNLIT_BONE_SENSOR, SUNLIT_SENSOR_PLANE_PREPEND)
+    return get_sunlit_rig_objects(armature, SUNLIT_ROLE_SENSOR)
 
 def get_sunlit_odisk_sensors_from_armature(armature):
-    return get_sunlit_objects_from_armature(armature, SUNLIT_BONE_ODISK, SUNLIT_ODISK_PREPEND)
+    return get_sunlit_rig_objects(armature, SUNLIT_ROLE_ODISK_SENSOR)
 
 def get_sunlit_regular_lights_from_armature(armature):
-    return get_sunlit_objects_from_armature(armature, SUNLIT_BONE_LIT_ADJUST, SUNLIT_SUN_PREPEND)
+    return get_sunlit_rig_objects(armature, SUNLIT_ROLE_SUN)
 
 def get_sunlit_odisk_lights_from_armature(armature):
-    return get_sunlit_objects_from_armature(armature, SUNLIT_BONE_ODISK, SUNLIT_ODISK_SUN_PREPEND)
+    return get_sunlit_rig_objects(armature, SUNLIT_ROLE_ODISK_SUN)
 
 # pack all images with names that contain the bake image prepend name
 def pack_all_sunlit_images():
@@ -1209,6 +2116,74 @@ def get_sunlit_bake_image_for_plane(plane):
         if SUNLIT_BAKE_IMG_NAME in node.image.name:
             return node.image
 
+# Move image sensors of Sunlit armatures into one new atlas image, with one shared material, and give each sensor its
+# own tile of the atlas. Previously baked sensor pixels are copied into the atlas. Sensors baked to color attributes
+# are skipped. Returns number of sensors moved into atlas.
+def create_sunlit_sensor_atlas(armature_list):
+    sensors = []
+    for armature in armature_list:
+        sensors = sensors + get_sunlit_regular_sensors_from_armature(armature) + get_sunlit_odisk_sensors_from_armature(armature)
+    atlas_sources = []
+    for s in sensors:
+        img = get_sunlit_bake_image_for_plane(s)
+        if img is None or get_sunlit_sensor_color_attribute(s) is not None:
+            continue
+        # sensor already in an atlas keeps its tile size
+        old_tile = get_sensor_atlas_tile(s)
+        if old_tile is None:
+            old_tile = (0, 0, img.size[0], img.size[1])
+        atlas_sources.append((s, img, old_tile))
+    if len(atlas_sources) < 1:
+        return 0
+
+    atlas_w, atlas_h, tiles = get_atlas_tile_layout([ (t[2], t[3]) for _, _, t in atlas_sources ])
+    atlas_img = bpy.data.images.new(name=SUNLIT_ATLAS_IMG_NAME, width=atlas_w, height=atlas_h, alpha=False)
+    atlas_buf = build_atlas_pixels(atlas_w, atlas_h, tiles,
+        [ get_tile_pixels(get_cached_image_pixels(img), old_tile) for _, img, old_tile in atlas_sources ])
+    set_image_pixel_buffer(atlas_img, atlas_buf)
+    image_pack_image(atlas_img)
+    invalidate_image_cache(atlas_img.name)
+    atlas_mat = create_sensor_material(SUNLIT_ATLAS_MAT_NAME, atlas_img)
+
+    old_mat_names = set()
+    for (s, _, _), tile in zip(atlas_sources, tiles):
+        # UVs are changed, so sensor mesh must not be shared with other objects
+        if s.data.users > 1:
+            s.data = s.data.copy()
+        set_mesh_uv_atlas_tile(s.data, tile, atlas_w, atlas_h)
+        # sensor material may be linked to object, and atlas material is linked to mesh
+        for slot in s.material_slots:
+            if slot.material is not None:
+                old_mat_names.add(slot.material.name)
+            if slot.link == "OBJECT":
+                slot.material = None
+                slot.link = "DATA"
+        for mat in s.data.materials:
+            if mat is not None:
+                old_mat_names.add(mat.name)
+        s.data.materials.clear()
+        s.data.materials.append(atlas_mat)
+        set_sensor_atlas_tile(s, tile)
+    remove_unused_sensor_materials(old_mat_names)
+    return len(atlas_sources)
+
+# remove sensor materials, and their sensor images, that are no longer used
+def remove_unused_sensor_materials(mat_names):
+    for mat_name in mat_names:
+        mat = bpy.data.materials.get(mat_name)
+        if mat is None or mat.users > 0:
+            continue
+        mat_imgs = []
+        if mat.node_tree is not None:
+            for node in mat.node_tree.nodes:
+                if node.type == "TEX_IMAGE" and node.image is not None and SUNLIT_BAKE_IMG_NAME in node.image.name:
+                    mat_imgs.append(node.image)
+        bpy.data.materials.remove(mat)
+        for img in mat_imgs:
+            if img.users == 0:
+                invalidate_image_cache(img.name)
+                bpy.data.images.remove(img)
+
 class OLuminSL_CreateRig(bpy.types.Operator):
     """Create Sunlit rig based on the following rig create options"""
     bl_idname = "olumin_sl.create_sunlit_rig"
@@ -1218,15 +2193,55 @@ class OLuminSL_CreateRig(bpy.types.Operator):
     def execute(self, context):
         # materials creation errors occur in Blender Render, so only works in Cycles
         scn = context.scene
+        if scn.OLuminSL_SensorBakeTarget == "COLOR_ATTRIBUTE" and bpy.app.version < (2,92,0):
+            self.report({'ERROR'}, "Sensor Bake Target 'Color Attribute' needs Blender 2.92 or later.")
+            return {'CANCELLED'}
+        if scn.OLuminSL_BlindsMode == "VORONOI" and bpy.app.version < (2,81,0):
+            self.report({'ERROR'}, "Blinds Mode 'Voronoi' needs Blender 2.81 or later.")
+            return {'CANCELLED'}
         if bpy.app.version < (2,80,0) and (scn.render.engine == "BLENDER_RENDER" or scn.render.engine == "BLENDER_GAME"):
             self.report({'ERROR'}, "Cannot create Sunlig Rig in Blender Render or Blender Game render modes, change " +
                 "render engine to Cycles or EEVEE and try again.")
             return {'CANCELLED'}
-        create_sunlit_rig(context, scn.OLuminSL_Hemisphere, scn.OLuminSL_SunCount, scn.OLuminSL_BaseSphereSubdiv,
+        start_time = time.time()
+        rig_options = (scn.OLuminSL_Hemisphere, scn.OLuminSL_SunCount, scn.OLuminSL_BaseSphereSubdiv,
             scn.OLuminSL_ODiskCount, scn.OLuminSL_ODiskIncludeSun, scn.OLuminSL_SunEnergy, scn.OLuminSL_SunInitAngle,
             scn.OLuminSL_ODiskSunEnergy, scn.OLuminSL_ODiskSunInitAngle, scn.OLuminSL_AllowDrivers,
             scn.OLuminSL_SunImageWidth, scn.OLuminSL_SunImageHeight, scn.OLuminSL_ODiskSunImageWidth,
-            scn.OLuminSL_ODiskSunImageHeight, scn.OLuminSL_SunBlindsLen, scn.OLuminSL_ODiskSunBlindsLen)
+            scn.OLuminSL_ODiskSunImageHeight, scn.OLuminSL_SunBlindsLen, scn.OLuminSL_ODiskSunBlindsLen,
+            scn.OLuminSL_SensorBakeTarget, scn.OLuminSL_BlindsMode)
+        from_template = False
+        if scn.OLuminSL_UseRigTemplates:
+            sl_armature, from_template = create_sunlit_rig_with_template(context, rig_options)
+        else:
+            sl_armature = create_sunlit_rig(context, *rig_options)
+        if scn.OLuminSL_PerfMode:
+            set_sunlit_rig_perf_mode(sl_armature, True)
+        if from_template:
+            self.report({'INFO'}, "Sunlit Rig created from template in " + format(time.time() - start_time, ".3f") +
+                " seconds.")
+        else:
+            self.report({'INFO'}, "Sunlit Rig created in " + format(time.time() - start_time, ".3f") + " seconds.")
+        return {'FINISHED'}
+
+class OLuminSL_MeasurePerfMode(bpy.types.Operator):
+    """Measure frames per second of scene evaluation with and without rig performance mode, by stepping through """ \
+    """frames after the current frame (viewport drawing is not included)"""
+    bl_idname = "olumin_sl.measure_perf_mode"
+    bl_label = "Measure Performance Mode"
+    bl_options = {'REGISTER'}
+
+    num_frames = 24
+
+    def execute(self, context):
+        scn = context.scene
+        set_scene_sunlit_rigs_perf_mode(scn, False)
+        fps_off = measure_scene_frame_fps(scn, self.num_frames)
+        set_scene_sunlit_rigs_perf_mode(scn, True)
+        fps_on = measure_scene_frame_fps(scn, self.num_frames)
+        set_scene_sunlit_rigs_perf_mode(scn, scn.OLuminSL_PerfMode)
+        self.report({'INFO'}, "Sunlit rig performance mode: " + format(fps_off, ".1f") + " fps off, " +
+            format(fps_on, ".1f") + " fps on, gained " + format(fps_on - fps_off, ".1f") + " fps.")
         return {'FINISHED'}
 
 class OLuminSL_FixRigVisibility(bpy.types.Operator):
@@ -1241,43 +2256,64 @@ class OLuminSL_FixRigVisibility(bpy.types.Operator):
         scn = context.scene
         all_obj_list = get_all_objects_list(context)
         for obj in all_obj_list:
-            # hide any Sunlig Rig widget objects that are found
-            if is_sunlit_rig_widget(obj):
+            # hide any Sunlig Rig widget objects that are found, shared widgets (not parented to a rig) are hidden by
+            # their collection
+            if is_sunlit_rig_widget(obj) and obj.parent is not None:
                 set_object_hide_view(obj, True)
                 set_object_hide_render(obj, True)
             # the rest of the code in this for loop is for Sunlit Rig armatures only
             if not is_sunlit_armature(obj):
                 continue
             # get objects and hide them from view
-            sphere_list = get_sunlit_objects_from_armature(obj, SUNLIT_BONE_SPHERE, SUNLIT_BASE_SPHERE_PREPEND)
+            sphere_list = get_sunlit_rig_objects(obj, SUNLIT_ROLE_BASE_SPHERE)
             set_object_list_hide_view(sphere_list, True)
             set_object_list_hide_render(sphere_list, True)
-            cube_list = get_sunlit_objects_from_armature(obj, SUNLIT_BONE_DIFF_CUBE, SUNLIT_DCUBE_PREPEND)
+            cube_list = get_sunlit_rig_objects(obj, SUNLIT_ROLE_DIFF_CUBE)
             set_object_list_hide_view(cube_list, True)
             set_object_list_hide_render(cube_list, True)
             # if hiding blinds, then hide regular blinds and ODisk blinds
             # this code will also un-hide blinds if "Hide Blinds Too" is disabled
-            blinds_list = get_sunlit_objects_from_armature(obj, SUNLIT_BONE_DIFF_CUBE, SUNLIT_SUN_BLINDS_PREPEND)
+            blinds_list = get_sunlit_rig_objects(obj, SUNLIT_ROLE_SUN_BLINDS)
             set_object_list_hide_view(blinds_list, scn.OLuminSL_HideBlindsToo)
             set_object_list_hide_render(blinds_list, False)
-            od_blinds_list = get_sunlit_objects_from_armature(obj, SUNLIT_BONE_ODISK, SUNLIT_ODISK_BLINDS_PREPEND)
+            od_blinds_list = get_sunlit_rig_objects(obj, SUNLIT_ROLE_ODISK_BLINDS)
             set_object_list_hide_view(od_blinds_list, scn.OLuminSL_HideBlindsToo)
             set_object_list_hide_render(od_blinds_list, False)
 
-            sensor_list = get_sunlit_objects_from_armature(obj, SUNLIT_BONE_SENSOR, SUNLIT_SENSOR_PLANE_PREPEND)
+            sensor_list = get_sunlit_rig_objects(obj, SUNLIT_ROLE_SENSOR)
             set_object_list_hide_view(sensor_list, False)
             set_object_list_hide_render(sensor_list, False)
 
-            od_sensor_list = get_sunlit_objects_from_armature(obj, SUNLIT_BONE_ODISK, SUNLIT_ODISK_PREPEND)
+            od_sensor_list = get_sunlit_rig_objects(obj, SUNLIT_ROLE_ODISK_SENSOR)
             set_object_list_hide_view(od_sensor_list, False)
             set_object_list_hide_render(od_sensor_list, False)
 
-            rig_cam_list = get_objects_parented_to(obj, SUNLIT_CAMERA_PREPEND)
+            rig_cam_list = get_sunlit_rig_objects(obj, SUNLIT_ROLE_CAMERA)
             for rig_cam in rig_cam_list:
                 set_object_hide_view(rig_cam, True)
 
         return {'FINISHED'}
 
+class OLuminSL_ConvertLegacyRigs(bpy.types.Operator):
+    """Tag bones and objects of all Sunlit Rigs created by older versions of OLumination, so that rig parts are """ \
+    """found by tags instead of by names (rig parts can then be renamed). Duplicated rigs are given their own rig ID"""
+    bl_idname = "olumin_sl.convert_legacy_rigs"
+    bl_label = "Convert Legacy Rigs"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        convert_count = 0
+        for ob in list(bpy.data.objects):
+            if not is_sunlit_armature(ob):
+                continue
+            rig_id = ob.get(SUNLIT_RIG_ID_PROP)
+            if rig_id is not None and not is_sunlit_rig_id_shared(ob, rig_id):
+                continue
+            tag_sunlit_rig(ob)
+            convert_count += 1
+        self.report({'INFO'}, "Converted " + str(convert_count) + " Sunlit Rigs.")
+        return {'FINISHED'}
+
 class OLuminSL_BakeSelectedSensors(bpy.types.Operator):
     """Bake Sunlit Rig sensor images for selected sensors only. These images will be sampled when computing the """ \
     """light color of the rig's suns"""
@@ -1290,7 +2326,8 @@ class OLuminSL_BakeSelectedSensors(bpy.types.Operator):
         if scn.render.engine != "CYCLES":
             self.report({'ERROR'}, "Change render engine to CYCLES, and try again.")
             return {'CANCELLED'}
-        warn_list = bake_select_sunlit_sensors(context, scn.OLuminSL_BakeSamples, scn.OLuminSL_BakeHideAllLights)
+        warn_list = bake_select_sunlit_sensors(context, scn.OLuminSL_BakeSamples, scn.OLuminSL_BakeHideAllLights,
+            get_sunlit_bake_denoise(scn), scn.OLuminSL_Incremental)
         if len(warn_list) == 0:
             for warn in warn_list:
                 self.report({'WARNING'}, warn)
@@ -1313,7 +2350,7 @@ class OLuminSL_BakeRigSensors(bpy.types.Operator):
             if is_sunlit_armature(ob):
                 sunlit_arms.append(ob)
         warn_list = bake_sunlit_armature_list_sensors(context, scn.OLuminSL_BakeSamples,
-            scn.OLuminSL_BakeHideAllLights, sunlit_arms)
+            scn.OLuminSL_BakeHideAllLights, sunlit_arms, get_sunlit_bake_denoise(scn), scn.OLuminSL_Incremental)
         if len(warn_list) == 0:
             for warn in warn_list:
                 self.report({'WARNING'}, warn)
@@ -1330,6 +2367,48 @@ class OLuminSL_SensorImagePack(bpy.types.Operator):
         pack_all_sunlit_images()
         return {'FINISHED'}
 
+class OLuminSL_CreateSensorAtlas(bpy.types.Operator):
+    """Move image sensors of selected Sunlit Rigs into one shared atlas image and material, with each sensor """ \
+    """using its own tile of the atlas. Sensors are then baked, packed and sampled as one image"""
+    bl_idname = "olumin_sl.create_sensor_atlas"
+    bl_label = "Create Sensor Atlas"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        sunlit_arms = []
+        for ob in context.selected_objects:
+            if is_sunlit_armature(ob):
+                sunlit_arms.append(ob)
+        if len(sunlit_arms) == 0:
+            self.report({'ERROR'}, "Select one or more Sunlit Rigs and try again.")
+            return {'CANCELLED'}
+        num_sensors = create_sunlit_sensor_atlas(sunlit_arms)
+        if num_sensors == 0:
+            self.report({'WARNING'}, "No sensor images found in selected Sunlit Rigs, atlas not created.")
+            return {'CANCELLED'}
+        self.report({'INFO'}, "Sensor atlas created with " + str(num_sensors) + " sensors.")
+        return {'FINISHED'}
+
+class OLuminSL_UpdateVoronoiBlinds(bpy.types.Operator):
+    """Rebuild Voronoi blinds of selected Sunlit Rigs from current sun directions and blinds lengths. Rigs with """ \
+    """boolean blinds are not changed"""
+    bl_idname = "olumin_sl.update_voronoi_blinds"
+    bl_label = "Update Rig Blinds"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        sunlit_arms = []
+        for ob in context.selected_objects:
+            if is_sunlit_armature(ob) and get_sunlit_blinds_mode(ob) == "VORONOI":
+                sunlit_arms.append(ob)
+        if len(sunlit_arms) == 0:
+            self.report({'ERROR'}, "Select one or more Sunlit Rigs with Voronoi blinds and try again.")
+            return {'CANCELLED'}
+        context.view_layer.update()
+        for arm in sunlit_arms:
+            update_sunlit_voronoi_blinds(arm)
+        return {'FINISHED'}
+
 class OLuminSL_SetSelectSunColor(bpy.types.Operator):
     """Set color of suns attached to selected sensor planes"""
     bl_idname = "olumin_sl.select_sensors_to_sun_color"
@@ -1338,9 +2417,15 @@ class OLuminSL_SetSelectSunColor(bpy.types.Operator):
 
     def execute(self, context):
         scn = context.scene
+        if scn.OLuminSL_SunColorSource == "DIRECT":
+            if not set_sun_color_data_direct(context, scn.OLuminSL_KeyframeColor, get_sunlit_suns_from_selected(context)):
+                self.report({'ERROR'}, "Cannot set sun color with Direct source, world has no Environment Texture image.")
+                return {'CANCELLED'}
+            return {'FINISHED'}
         set_select_sun_color_data(context, scn.OLuminSL_KeyframeColor, scn.OLuminSL_SensorSampleWidthPct,
             scn.OLuminSL_SensorSampleHeightPct, scn.OLuminSL_ODiskSensorSampleWidthPct,
-            scn.OLuminSL_ODiskSensorSampleHeightPct)
+            scn.OLuminSL_ODiskSensorSampleHeightPct, scn.OLuminSL_SensorSampleKernel,
+            scn.OLuminSL_ODiskSensorSampleKernel, scn.OLuminSL_Incremental)
         return {'FINISHED'}
 
 class OLuminSL_SetRigSunColor(bpy.types.Operator):
@@ -1351,11 +2436,36 @@ class OLuminSL_SetRigSunColor(bpy.types.Operator):
 
     def execute(self, context):
         scn = context.scene
+        sunlit_arms = []
+        sun_lights = []
         for ob in context.selected_objects:
             if is_sunlit_armature(ob):
-                set_sunlit_armature_sun_color_data(scn.OLuminSL_KeyframeColor, scn.OLuminSL_SensorSampleWidthPct,
-                    scn.OLuminSL_SensorSampleHeightPct, scn.OLuminSL_ODiskSensorSampleWidthPct,
-                    scn.OLuminSL_ODiskSensorSampleHeightPct, ob)
+                sunlit_arms.append(ob)
+                sun_lights = sun_lights + get_sunlit_suns_from_armature(ob)
+        if scn.OLuminSL_SunColorSource == "DIRECT" and get_world_environment_image(scn.world) is None:
+            self.report({'ERROR'}, "Cannot set sun color with Direct source, world has no Environment Texture image.")
+            return {'CANCELLED'}
+        # in frame range mode, keyframes of all frames are written together after colors are set
+        keyframe_color = scn.OLuminSL_KeyframeColor and not scn.OLuminSL_KeyframeFrameRange
+        def set_color():
+            if scn.OLuminSL_SunColorSource == "DIRECT":
+                set_sun_color_data_direct(context, keyframe_color, sun_lights)
+                return
+            set_sunlit_armature_list_sun_color_data(keyframe_color, scn.OLuminSL_SensorSampleWidthPct,
+                scn.OLuminSL_SensorSampleHeightPct, scn.OLuminSL_ODiskSensorSampleWidthPct,
+                scn.OLuminSL_ODiskSensorSampleHeightPct, scn.OLuminSL_SensorSampleKernel,
+                scn.OLuminSL_ODiskSensorSampleKernel, sunlit_arms, scn.OLuminSL_Incremental)
+        if scn.OLuminSL_KeyframeFrameRange:
+            # sensors are not baked again at each frame, so Bake source would key the same colors at every frame
+            if scn.OLuminSL_SunColorSource != "DIRECT":
+                self.report({'ERROR'}, "Keyframe Frame Range needs Direct sun color source, use Set Rig Sun Color " +
+                    "Animated to bake sensors at every frame.")
+                return {'CANCELLED'}
+            num_frames = set_sunlit_lights_frame_range(context, sun_lights, "color", set_color)
+            self.report({'INFO'}, "Keyframed color of " + str(len(sun_lights)) + " suns over " + str(num_frames) +
+                " frames.")
+            return {'FINISHED'}
+        set_color()
         return {'FINISHED'}
 
 class OLuminSL_SetSelectSunAngle(bpy.types.Operator):
@@ -1368,7 +2478,7 @@ class OLuminSL_SetSelectSunAngle(bpy.types.Operator):
 
     def execute(self, context):
         set_sunlit_sun_angular_diameter(context, get_sunlit_suns_from_selected(context),
-            context.scene.OLuminSL_KeyframeAngle)
+            context.scene.OLuminSL_KeyframeAngle, context.scene.OLuminSL_AngleBruteForce)
         return {'FINISHED'}
 
 class OLuminSL_SetRigSunAngle(bpy.types.Operator):
@@ -1380,10 +2490,51 @@ class OLuminSL_SetRigSunAngle(bpy.types.Operator):
     bl_options = {'REGISTER', 'UNDO'}
 
     def execute(self, context):
+        scn = context.scene
+        # lights of all selected rigs are set together, with one depsgraph evaluation
+        sun_lights = []
         for ob in context.selected_objects:
             if is_sunlit_armature(ob):
-                set_sunlit_sun_angular_diameter(context, get_sunlit_suns_from_armature(ob),
-                    context.scene.OLuminSL_KeyframeAngle)
+                sun_lights = sun_lights + get_sunlit_suns_from_armature(ob)
+        if scn.OLuminSL_KeyframeFrameRange:
+            if bpy.app.version < (2,80,0):
+                self.report({'ERROR'}, "Sun light angular diameter not supported in Blender 2.79.")
+                return {'CANCELLED'}
+            # performance mode is turned off once for all frames, instead of once per frame
+            perf_rigs = get_sunlit_perf_mode_rigs(sun_lights)
+            for sl_armature in perf_rigs:
+                set_sunlit_rig_perf_mode(sl_armature, False)
+            try:
+                num_frames = set_sunlit_lights_frame_range(context, sun_lights, "angle",
+                    lambda: set_sunlit_sun_angular_diameter(context, sun_lights, False, scn.OLuminSL_AngleBruteForce,
+                        False))
+            finally:
+                for sl_armature in perf_rigs:
+                    set_sunlit_rig_perf_mode(sl_armature, True)
+            self.report({'INFO'}, "Keyframed angular diameter of " + str(len(sun_lights)) + " suns over " +
+                str(num_frames) + " frames.")
+            return {'FINISHED'}
+        set_sunlit_sun_angular_diameter(context, sun_lights, scn.OLuminSL_KeyframeAngle, scn.OLuminSL_AngleBruteForce)
+        return {'FINISHED'}
+
+class OLuminSL_CompactSunKeyframes(bpy.types.Operator):
+    """Remove color and angular diameter keyframes of suns of selected Sunlit Rigs (and of selected suns) that are """ \
+    """not needed, i.e. keyframes that the curve between the other keyframes gives within Compact Tolerance. E.g. """ \
+    """keyframes set at every frame, where sun colors and angles are mostly constant or linear"""
+    bl_idname = "olumin_sl.compact_sun_keyframes"
+    bl_label = "Compact Sun Keyframes"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def execute(self, context):
+        sun_lights = get_sunlit_suns_from_selected(context)
+        for ob in context.selected_objects:
+            if is_sunlit_armature(ob):
+                sun_lights = sun_lights + get_sunlit_suns_from_armature(ob)
+        if len(sun_lights) < 1:
+            self.report({'ERROR'}, "Select one or more Sunlit Rigs or suns and try again.")
+            return {'CANCELLED'}
+        num_removed, num_keys = compact_sunlit_sun_keyframes(sun_lights, context.scene.OLuminSL_CompactTolerance)
+        self.report({'INFO'}, "Removed " + str(num_removed) + " of " + str(num_keys) + " sun keyframes.")
         return {'FINISHED'}
 
 class OLuminSL_SelectVisibleRigs(bpy.types.Operator):
@@ -1541,9 +2692,9 @@ class OLuminSL_PointCamAtODisk(bpy.types.Operator):
 
 def set_sunlit_cam_odisk_target(sl_armature, odisk_num):
     # get the test camera object parented to the Sunlit armature
-    cam_list = get_objects_parented_to(sl_armature, SUNLIT_CAMERA_PREPEND)
+    cam_list = get_sunlit_rig_objects(sl_armature, SUNLIT_ROLE_CAMERA)
     # get the ODisk sensor plane object parented to the Sunlit armature
-    obj_list = get_objects_parented_to_bone(sl_armature, any_prepend_name_num(SUNLIT_BONE_ODISK, odisk_num), SUNLIT_ODISK_PREPEND)
+    obj_list = get_sunlit_rig_objects(sl_armature, SUNLIT_ROLE_ODISK_SENSOR, odisk_num)
     if len(cam_list) < 1 or len(obj_list) < 1:
         print("cam is None or obj_target is None")
         return
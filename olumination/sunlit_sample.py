@@ -0,0 +1,400 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Sensor image sampling engine.
+# Image pixels are copied once (with foreach_get, from Blender 2.83) into a NumPy float32 buffer, and color samples are
+# computed as NumPy reductions over that buffer - instead of indexing 'img.pixels' one value at a time from Python.
+# Pixel buffers, and data computed from them (e.g. summed-area tables), are cached per image until the image is
+# re-baked or edited, so re-sampling with different sample sizes does not read the image again.
+
+import math
+from functools import lru_cache
+import numpy as np
+import bpy
+from bpy.app.handlers import persistent
+
+# number of float values per pixel in Blender image pixel buffers
+IMG_PIXEL_CHANNELS = 4
+
+# Copy all image pixels into a NumPy buffer, shaped (height, width, RGBA). Image pixels have foreach_get/foreach_set
+# from Blender 2.83, older versions copy pixels with a slice (slower).
+def get_image_pixel_buffer(img):
+    img_w, img_h = img.size[0], img.size[1]
+    if hasattr(img.pixels, "foreach_get"):
+        px_buf = np.empty(img_w * img_h * IMG_PIXEL_CHANNELS, dtype=np.float32)
+        img.pixels.foreach_get(px_buf)
+    else:
+        px_buf = np.array(img.pixels[:], dtype=np.float32)
+    return px_buf.reshape((img_h, img_w, IMG_PIXEL_CHANNELS))
+
+# write NumPy pixel buffer (any shape, with same number of values as image pixels) to image pixels
+def set_image_pixel_buffer(img, px_buf):
+    if hasattr(img.pixels, "foreach_set"):
+        img.pixels.foreach_set(px_buf.reshape(-1))
+    else:
+        img.pixels[:] = px_buf.reshape(-1).tolist()
+
+# get (low_x, low_y, sample_w, sample_h) of the sample rectangle, centered at middle of image pixels,
+# sample width and height given in pixels
+def get_sample_rect(img_w, img_h, sample_w, sample_h):
+    # prevent error of sampling outside image pixels, and prevent sampling zero pixels
+    sample_w = max(1, min(sample_w, img_w))
+    sample_h = max(1, min(sample_h, img_h))
+    # sample centered at middle of image pixels
+    low_x = math.floor(img_w / 2) - math.floor(sample_w / 2)
+    low_y = math.floor(img_h / 2) - math.floor(sample_h / 2)
+    return low_x, low_y, sample_w, sample_h
+
+# Summed-area table (integral image) of the RGB channels of pixel buffer, in double precision, with an extra row and
+# column of zeros at the start so that sat[y, x] is the sum of all pixels below row y and left of column x.
+def build_summed_area_table(px_buf):
+    img_h, img_w = px_buf.shape[0], px_buf.shape[1]
+    sat = np.zeros((img_h+1, img_w+1, 3), dtype=np.float64)
+    np.cumsum(px_buf[:, :, 0:3], axis=0, dtype=np.float64, out=sat[1:, 1:])
+    np.cumsum(sat[1:, 1:], axis=1, out=sat[1:, 1:])
+    return sat
+
+# average RGB color of a rectangle of pixels (rectangle centered in image), computed in constant time from the
+# image's summed-area table, returned as a tuple of 3 floats
+def get_rect_mean_color(sat, sample_w, sample_h):
+    img_h, img_w = sat.shape[0] - 1, sat.shape[1] - 1
+    if img_w < 1 or img_h < 1:
+        return (0.0, 0.0, 0.0)
+    low_x, low_y, sample_w, sample_h = get_sample_rect(img_w, img_h, sample_w, sample_h)
+    high_x = low_x + sample_w
+    high_y = low_y + sample_h
+    rect_sum = sat[high_y, high_x] - sat[low_y, high_x] - sat[high_y, low_x] + sat[low_y, low_x]
+    avg = rect_sum / (sample_w * sample_h)
+    return (float(avg[0]), float(avg[1]), float(avg[2]))
+
+# Sampling kernel weights at normalized sample coordinates, where (-1, -1) and (1, 1) are the corners of the sample
+# rectangle. Kernels other than BOX are disk shaped (ellipse shaped, for non-square samples), with zero weight outside
+# the disk:
+#     BOX: all pixels in sample rectangle have equal weight
+#     DISK: equal weight for pixels inside the disk
+#     GAUSSIAN: Gaussian falloff from center, sigma is half the disk radius
+#     COSINE: cosine weighted, i.e. weight is the cosine of the angle to a hemisphere point projected onto the disk
+def get_kernel_weights(kernel, norm_x, norm_y):
+    if kernel == "BOX":
+        return np.ones(np.broadcast(norm_x, norm_y).shape, dtype=np.float32)
+    r_sq = norm_x * norm_x + norm_y * norm_y
+    in_disk = r_sq <= 1.0
+    if kernel == "DISK":
+        weights = in_disk.astype(np.float32)
+    elif kernel == "GAUSSIAN":
+        weights = np.where(in_disk, np.exp(-r_sq / (2 * 0.5 * 0.5)), 0.0)
+    elif kernel == "COSINE":
+        weights = np.sqrt(np.clip(1.0 - r_sq, 0.0, 1.0))
+    else:
+        raise ValueError("Unknown sampling kernel: " + str(kernel))
+    return weights.astype(np.float32)
+
+# Precomputed kernel mask for a centered sample rectangle of an image, normalized so that weights sum to 1.
+# Returns (low_x, low_y, mask), where mask is shaped (sample_h, sample_w) and must not be modified.
+# Masks are kept in an LRU cache, by image resolution, kernel, and sample size.
+@lru_cache(maxsize=64)
+def get_kernel_mask(img_w, img_h, kernel, sample_w, sample_h):
+    low_x, low_y, sample_w, sample_h = get_sample_rect(img_w, img_h, sample_w, sample_h)
+    # normalized coordinates of pixel centers
+    norm_x = (np.arange(sample_w, dtype=np.float32) + 0.5) / sample_w * 2 - 1
+    norm_y = (np.arange(sample_h, dtype=np.float32) + 0.5) / sample_h * 2 - 1
+    mask = get_kernel_weights(kernel, norm_x[None, :], norm_y[:, None])
+    mask_sum = mask.sum(dtype=np.float64)
+    # fall back to box average if no pixel centers are inside the kernel
+    if mask_sum <= 0:
+        mask = np.ones((sample_h, sample_w), dtype=np.float32)
+        mask_sum = sample_w * sample_h
+    mask = (mask / mask_sum).astype(np.float32)
+    mask.flags.writeable = False
+    return low_x, low_y, mask
+
+# kernel weighted average RGB color of a centered sample rectangle of pixel buffer, as one vectorized weighted sum
+def get_kernel_mean_color(px_buf, kernel, sample_w, sample_h):
+    img_h, img_w = px_buf.shape[0], px_buf.shape[1]
+    if img_w < 1 or img_h < 1:
+        return (0.0, 0.0, 0.0)
+    low_x, low_y, mask = get_kernel_mask(img_w, img_h, kernel, sample_w, sample_h)
+    rect = px_buf[low_y:low_y+mask.shape[0], low_x:low_x+mask.shape[1], 0:3]
+    avg = np.tensordot(mask.astype(np.float64), rect, axes=((0, 1), (0, 1)))
+    return (float(avg[0]), float(avg[1]), float(avg[2]))
+
+# Rec. 709 luminance of RGB colors, colors shaped (N, 3)
+def get_luminance(rgb):
+    return rgb[:, 0] * 0.2126 + rgb[:, 1] * 0.7152 + rgb[:, 2] * 0.0722
+
+# weighted average of RGB colors, colors shaped (N, 3) and weights shaped (N)
+def get_weighted_mean_color(rgb, weights):
+    weight_sum = weights.sum(dtype=np.float64)
+    if weight_sum <= 0:
+        return rgb.mean(axis=0, dtype=np.float64)
+    return (weights.astype(np.float64) @ rgb) / weight_sum
+
+# weighted percentile (pct in range 0 to 1) of values
+def get_weighted_percentile(values, weights, pct):
+    order = np.argsort(values, kind="stable")
+    cum_weights = np.cumsum(weights[order], dtype=np.float64)
+    if cum_weights[-1] <= 0:
+        return float(values[order[-1]])
+    idx = np.searchsorted(cum_weights, pct * cum_weights[-1], side="left")
+    return float(values[order[min(idx, len(order)-1)]])
+
+# Robust (firefly resistant) estimate of average color of RGB colors (shaped (N, 3)) with weights (shaped (N)).
+#     MEAN: plain weighted mean
+#     TRIMMED: weighted mean after dropping darkest and brightest (by luminance) trim_pct of the total weight
+#     MEDIAN_OF_MEANS: colors are split into num_groups interleaved groups, and the group mean with median luminance
+#                      is returned
+#     LUMA_CLAMP: colors brighter than clamp_pct luminance percentile are scaled down to that luminance (keeping
+#                 hue), then weighted mean
+def get_robust_mean_color(rgb, weights, estimator, trim_pct=0.1, num_groups=8, clamp_pct=0.99):
+    if len(rgb) == 0:
+        return np.zeros(3, dtype=np.float64)
+    if estimator == "MEAN" or len(rgb) < 3:
+        return get_weighted_mean_color(rgb, weights)
+    lum = get_luminance(rgb)
+    if estimator == "TRIMMED":
+        order = np.argsort(lum, kind="stable")
+        sorted_weights = weights[order].astype(np.float64)
+        cum_weights = np.cumsum(sorted_weights)
+        total = cum_weights[-1]
+        # keep colors whose weight mid-point is inside the un-trimmed part of the weight range
+        mid_weights = cum_weights - sorted_weights / 2
+        keep = (mid_weights >= trim_pct * total) & (mid_weights <= (1 - trim_pct) * total)
+        if not keep.any():
+            keep[len(keep) // 2] = True
+        return get_weighted_mean_color(rgb[order[keep]], sorted_weights[keep])
+    elif estimator == "MEDIAN_OF_MEANS":
+        num_groups = max(1, min(num_groups, len(rgb)))
+        group_ids = np.arange(len(rgb)) % num_groups
+        group_weights = np.bincount(group_ids, weights=weights, minlength=num_groups)
+        group_sums = np.stack([np.bincount(group_ids, weights=weights * rgb[:, c], minlength=num_groups)
+            for c in range(3)], axis=1)
+        valid = group_weights > 0
+        if not valid.any():
+            return get_weighted_mean_color(rgb, weights)
+        group_means = group_sums[valid] / group_weights[valid, None]
+        order = np.argsort(get_luminance(group_means), kind="stable")
+        mid = len(order) // 2
+        if len(order) % 2 == 1:
+            return group_means[order[mid]]
+        return (group_means[order[mid-1]] + group_means[order[mid]]) / 2
+    elif estimator == "LUMA_CLAMP":
+        clamp_lum = get_weighted_percentile(lum, weights, clamp_pct)
+        scale = np.ones(len(lum), dtype=np.float64)
+        over = lum > clamp_lum
+        scale[over] = clamp_lum / lum[over]
+        return get_weighted_mean_color(rgb * scale[:, None], weights)
+    raise ValueError("Unknown color estimator: " + str(estimator))
+
+# Edge-preserving bilateral filter of RGB channels of pixel buffer (height, width, RGBA), alpha is not changed.
+# Range weights compare each neighbor's log luminance with the 3x3 median log luminance around the center pixel
+# (instead of the center pixel itself), so HDR fireflies (very bright single pixels) are replaced by their neighbors,
+# while edges between sky / ground / blinds are kept.
+def bilateral_filter_pixels(px_buf, radius, sigma_range):
+    if radius < 1:
+        return px_buf
+    img_h, img_w = px_buf.shape[0], px_buf.shape[1]
+    rgb = px_buf[:, :, 0:3].astype(np.float32)
+    log_lum = np.log1p(np.maximum(get_luminance(rgb.reshape((-1, 3))), 0)).reshape((img_h, img_w))
+    pad_rgb = np.pad(rgb, ((radius, radius), (radius, radius), (0, 0)), mode="edge")
+    pad_lum = np.pad(log_lum, radius, mode="edge")
+    guide_lum = np.median(np.stack([pad_lum[radius+dy:radius+dy+img_h, radius+dx:radius+dx+img_w]
+        for dy in (-1, 0, 1) for dx in (-1, 0, 1)]), axis=0)
+    sigma_spatial = max(radius / 2.0, 0.5)
+    sum_rgb = np.zeros_like(rgb)
+    sum_weights = np.zeros((img_h, img_w), dtype=np.float32)
+    for dy in range(-radius, radius+1):
+        for dx in range(-radius, radius+1):
+            spatial_w = math.exp(-(dx*dx + dy*dy) / (2 * sigma_spatial * sigma_spatial))
+            lum_diff = pad_lum[radius+dy:radius+dy+img_h, radius+dx:radius+dx+img_w] - guide_lum
+            weights = spatial_w * np.exp(-(lum_diff * lum_diff) / (2 * sigma_range * sigma_range))
+            sum_rgb += weights[:, :, None] * pad_rgb[radius+dy:radius+dy+img_h, radius+dx:radius+dx+img_w]
+            sum_weights += weights
+    out_buf = px_buf.astype(np.float32, copy=True)
+    out_buf[:, :, 0:3] = sum_rgb / np.maximum(sum_weights, 1e-20)[:, :, None]
+    return out_buf
+
+# cached image data, by image name, each entry is a dictionary:
+#     "size": image size when pixels were copied
+#     "pixels": pixel buffer from get_image_pixel_buffer
+#     other keys: data computed from pixels, e.g. "sat" for summed-area table
+image_sample_cache = {}
+
+# get cache entry for image, copying image pixels if image is not in cache (or image was resized)
+def get_image_cache_entry(img):
+    entry = image_sample_cache.get(img.name)
+    img_size = (img.size[0], img.size[1])
+    if entry is None or entry["size"] != img_size:
+        entry = { "size": img_size, "pixels": get_image_pixel_buffer(img) }
+        image_sample_cache[img.name] = entry
+    return entry
+
+def get_cached_image_pixels(img):
+    return get_image_cache_entry(img)["pixels"]
+
+# summed-area table is built lazily, on first use, and re-used until image is invalidated
+def get_cached_image_sat(img):
+    entry = get_image_cache_entry(img)
+    sat = entry.get("sat")
+    if sat is None:
+        sat = build_summed_area_table(entry["pixels"])
+        entry["sat"] = sat
+    return sat
+
+# Average color of centered sample rectangle of image, weighted by kernel, sample width and height given in pixels.
+# BOX kernel uses the image's summed-area table, other kernels use precomputed kernel masks.
+# Optional estimator is a tuple of (estimator, trim_pct, num_groups, clamp_pct), see get_robust_mean_color.
+# Optional tile is (x, y, width, height) in pixels, e.g. a sensor's tile of an atlas image, and the sample rectangle is
+# centered in the tile instead of the whole image.
+def get_image_sample_color(img, sample_w, sample_h, kernel="BOX", estimator=None, tile=None):
+    if estimator is None or estimator[0] == "MEAN":
+        if kernel == "BOX":
+            if tile is None:
+                return get_rect_mean_color(get_cached_image_sat(img), sample_w, sample_h)
+            avg = get_image_tiles_mean_colors(img, [tile], [(sample_w, sample_h)])[0]
+            return (float(avg[0]), float(avg[1]), float(avg[2]))
+        return get_kernel_mean_color(get_tile_pixels(get_cached_image_pixels(img), tile), kernel, sample_w, sample_h)
+    px_buf = get_tile_pixels(get_cached_image_pixels(img), tile)
+    if px_buf.shape[0] < 1 or px_buf.shape[1] < 1:
+        return (0.0, 0.0, 0.0)
+    low_x, low_y, mask = get_kernel_mask(px_buf.shape[1], px_buf.shape[0], kernel, sample_w, sample_h)
+    rect = px_buf[low_y:low_y+mask.shape[0], low_x:low_x+mask.shape[1], 0:3]
+    avg = get_robust_mean_color(rect.reshape((-1, 3)), mask.reshape(-1), *estimator)
+    return (float(avg[0]), float(avg[1]), float(avg[2]))
+
+# get view of pixel buffer inside tile (x, y, width, height), or whole pixel buffer if tile is None
+def get_tile_pixels(px_buf, tile):
+    if tile is None:
+        return px_buf
+    return px_buf[tile[1]:tile[1]+tile[3], tile[0]:tile[0]+tile[2]]
+
+# Box average colors of many sample rectangles of one image, each centered in its tile (x, y, width, height), as one
+# vectorized lookup of the image's summed-area table. Returns array shaped (number of tiles, 3).
+def get_image_tiles_mean_colors(img, tiles, sample_sizes):
+    sat = get_cached_image_sat(img)
+    if len(tiles) < 1 or sat.shape[0] < 2 or sat.shape[1] < 2:
+        return np.zeros((len(tiles), 3))
+    rects = []
+    for tile, (sample_w, sample_h) in zip(tiles, sample_sizes):
+        low_x, low_y, sample_w, sample_h = get_sample_rect(tile[2], tile[3], sample_w, sample_h)
+        rects.append((tile[0] + low_x, tile[1] + low_y, sample_w, sample_h))
+    # clip to image, in case a tile is outside of a resized image
+    rects = np.array(rects, dtype=np.int64)
+    img_h, img_w = sat.shape[0] - 1, sat.shape[1] - 1
+    low_x = np.clip(rects[:, 0], 0, img_w - 1)
+    low_y = np.clip(rects[:, 1], 0, img_h - 1)
+    high_x = np.clip(rects[:, 0] + rects[:, 2], low_x + 1, img_w)
+    high_y = np.clip(rects[:, 1] + rects[:, 3], low_y + 1, img_h)
+    rect_sums = sat[high_y, high_x] - sat[low_y, high_x] - sat[high_y, low_x] + sat[low_y, low_x]
+    return rect_sums / ((high_x - low_x) * (high_y - low_y))[:, None]
+
+# Denoise image pixels in place (e.g. noisy sensor image, just after bake), and keep the denoised pixels in cache so
+# the image does not need to be read again for sampling.
+# If tiles, list of (x, y, width, height), is given then only those tiles are denoised (e.g. tiles of an atlas image
+# that were just baked), each filtered on its own so no pixels are blended across tile edges.
+def denoise_image_bilateral(img, radius, sigma_range, tiles=None):
+    px_buf = get_image_pixel_buffer(img)
+    if tiles is None:
+        px_buf = bilateral_filter_pixels(px_buf, radius, sigma_range)
+    else:
+        for tile in tiles:
+            tile_px = get_tile_pixels(px_buf, tile)
+            tile_px[:] = bilateral_filter_pixels(tile_px, radius, sigma_range)
+    set_image_pixel_buffer(img, px_buf)
+    img.update()
+    image_sample_cache[img.name] = { "size": (img.size[0], img.size[1]), "pixels": px_buf }
+
+# Get vertex locations (shape (N, 3)) and vertex RGB colors (shape (N, 3)) of mesh color attribute, read with
+# foreach_get. Face corner colors are averaged per vertex.
+def get_mesh_color_attribute_buffer(mesh, attr, domain):
+    num_verts = len(mesh.vertices)
+    co = np.empty(num_verts * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    colors = np.empty(len(attr.data) * 4, dtype=np.float32)
+    attr.data.foreach_get("color", colors)
+    colors = colors.reshape((-1, 4))[:, 0:3]
+    if domain == "CORNER":
+        loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+        mesh.loops.foreach_get("vertex_index", loop_verts)
+        corner_counts = np.maximum(np.bincount(loop_verts, minlength=num_verts), 1)
+        colors = np.stack([np.bincount(loop_verts, weights=colors[:, c], minlength=num_verts) for c in range(3)],
+            axis=1) / corner_counts[:, None]
+    return co.reshape((-1, 3)), colors
+
+# Average color of color attribute vertexes inside the sample rectangle centered in the mesh's local X/Y bounds, with
+# sample width and height given as fraction of bounds width and height. Vertexes are weighted by kernel, and averaged
+# with optional estimator (see get_image_sample_color).
+def get_mesh_attribute_sample_color(co, rgb, sample_width_pct, sample_height_pct, kernel="BOX", estimator=None):
+    if len(co) == 0:
+        return (0.0, 0.0, 0.0)
+    low = co[:, 0:2].min(axis=0)
+    high = co[:, 0:2].max(axis=0)
+    half_size = np.where(high > low, (high - low) / 2, 1.0)
+    sample_half = np.maximum(half_size * np.array((sample_width_pct, sample_height_pct)), 1e-9)
+    # vertex locations normalized to sample rectangle, (-1, -1) to (1, 1)
+    norm = (co[:, 0:2] - (low + high) / 2) / sample_half
+    in_rect = (np.abs(norm[:, 0]) <= 1) & (np.abs(norm[:, 1]) <= 1)
+    if not in_rect.any():
+        in_rect[np.argmin((norm * norm).sum(axis=1))] = True
+    weights = get_kernel_weights(kernel, norm[in_rect, 0], norm[in_rect, 1])
+    if weights.sum() <= 0:
+        weights = np.ones(len(weights), dtype=np.float32)
+    if estimator is None:
+        estimator = ("MEAN",)
+    avg = get_robust_mean_color(rgb[in_rect].astype(np.float64), weights, *estimator)
+    return (float(avg[0]), float(avg[1]), float(avg[2]))
+
+# remove image from cache, e.g. after image is baked, or remove all images from cache if img_name is None
+def invalidate_image_cache(img_name=None):
+    if img_name is None:
+        image_sample_cache.clear()
+    else:
+        image_sample_cache.pop(img_name, None)
+
+# images edited by user (e.g. texture paint, reload, new source file) are sent as depsgraph updates
+@persistent
+def image_cache_depsgraph_update_handler(scene, depsgraph=None):
+    if depsgraph is None or len(image_sample_cache) == 0:
+        return
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Image):
+            invalidate_image_cache(update.id.name)
+
+# pixels in cache are no longer valid after loading another file, or after undo / redo
+@persistent
+def image_cache_clear_handler(*args):
+    invalidate_image_cache()
+
+IMAGE_CACHE_HANDLERS = [
+    ("depsgraph_update_post", image_cache_depsgraph_update_handler),
+    ("load_post", image_cache_clear_handler),
+    ("undo_post", image_cache_clear_handler),
+    ("redo_post", image_cache_clear_handler),
+]
+
+def register_image_cache_handlers():
+    for handler_list_name, handler in IMAGE_CACHE_HANDLERS:
+        handler_list = getattr(bpy.app.handlers, handler_list_name, None)
+        if handler_list is not None and handler not in handler_list:
+            handler_list.append(handler)
+
+def unregister_image_cache_handlers():
+    invalidate_image_cache()
+    for handler_list_name, handler in IMAGE_CACHE_HANDLERS:
+        handler_list = getattr(bpy.app.handlers, handler_list_name, None)
+        if handler_list is not None and handler in handler_list:
+            handler_list.remove(handler)
@@ -0,0 +1,112 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Sunlit rig templates: the first rig built with a set of Create Rig options is written to a template .blend file, in
+# the add-on's folder of the user config folder, and later rigs with the same options are appended from the template
+# file instead of being built again (see create_sunlit_rig_with_template in sunlit_rig.py).
+# Template file name is a fingerprint of the options, the template format, and the Blender version (files saved by a
+# newer Blender may not load in an older Blender, and data of older files may be converted on every load).
+
+import os
+import bpy
+
+from .sunlit_fingerprint import get_fingerprint, get_plain_value
+
+RIG_TEMPLATE_DIR_NAME = "olumination_rig_templates"
+RIG_TEMPLATE_PREPEND = "sunlit_rig_"
+# change when rigs are built differently, so that old template files are not used
+RIG_TEMPLATE_FORMAT = 1
+
+def get_rig_template_dir(create=False):
+    return bpy.utils.user_resource('CONFIG', path=RIG_TEMPLATE_DIR_NAME, create=create)
+
+def get_rig_template_filepath(rig_options):
+    key = get_fingerprint((RIG_TEMPLATE_FORMAT, tuple(bpy.app.version), get_plain_value(rig_options)))
+    return os.path.join(get_rig_template_dir(), RIG_TEMPLATE_PREPEND + key[:16] + ".blend")
+
+# Write objects, and the data they use (e.g. meshes, materials, images, bone custom shape objects), to template file.
+# File is written under a temporary name first, so a partly written file is never loaded. Returns True if written.
+def write_rig_template(filepath, obj_list):
+    tmp_filepath = filepath + ".tmp"
+    try:
+        get_rig_template_dir(True)
+        bpy.data.libraries.write(tmp_filepath, set(obj_list))
+        os.replace(tmp_filepath, filepath)
+    except (OSError, RuntimeError, ValueError) as e:
+        print("Unable to write Sunlit rig template file " + filepath + ", error: " + str(e))
+        return False
+    return True
+
+# Append all data-blocks of the given types (e.g. "objects", "meshes") from template file. Returns dict of type ->
+# list of (name in template file, appended data-block), or None if file could not be loaded.
+def load_rig_template(filepath, data_attrs):
+    template_names = {}
+    try:
+        with bpy.data.libraries.load(filepath, link=False) as (data_from, data_to):
+            for attr in data_attrs:
+                template_names[attr] = list(getattr(data_from, attr))
+                setattr(data_to, attr, list(template_names[attr]))
+    except (OSError, RuntimeError) as e:
+        print("Unable to load Sunlit rig template file " + filepath + ", error: " + str(e))
+        return None
+    template = {}
+    for attr in data_attrs:
+        template[attr] = [ (name, new_id) for name, new_id in zip(template_names[attr], getattr(data_to, attr))
+            if new_id is not None ]
+    return template
+
+# Replace appended data-blocks by data-blocks already in this file with the same name as in the template file, e.g.
+# data shared by all rigs. is_shared_func(local_id) tells if a local data-block can be used instead. Replaced
+# data-blocks are removed.
+def remap_shared_template_ids(id_pairs, data_collection, is_shared_func):
+    for template_name, new_id in id_pairs:
+        # appended data-block was not renamed, so there is no local data-block with this name
+        if new_id.name == template_name:
+            continue
+        local_id = data_collection.get(template_name)
+        if local_id is None or not is_shared_func(local_id):
+            continue
+        new_id.user_remap(local_id)
+        data_collection.remove(new_id)
+
+def clear_rig_templates():
+    template_dir = get_rig_template_dir()
+    if not os.path.isdir(template_dir):
+        return 0
+    count = 0
+    for filename in os.listdir(template_dir):
+        if filename.startswith(RIG_TEMPLATE_PREPEND) and filename.endswith(".blend"):
+            os.remove(os.path.join(template_dir, filename))
+            count = count + 1
+    return count
+
+class OLuminSL_ClearRigTemplates(bpy.types.Operator):
+    """Delete all Sunlit Rig template files. Template files are written the first time a rig is created with a """ \
+    """set of options, and are used to create rigs faster the next time"""
+    bl_idname = "olumin_sl.clear_rig_templates"
+    bl_label = "Clear Rig Templates"
+    bl_options = {'REGISTER'}
+
+    def execute(self, context):
+        try:
+            count = clear_rig_templates()
+        except OSError as e:
+            self.report({'ERROR'}, "Unable to delete Sunlit Rig template files, error: " + str(e))
+            return {'CANCELLED'}
+        self.report({'INFO'}, "Deleted " + str(count) + " Sunlit Rig template files.")
+        return {'FINISHED'}
@@ -0,0 +1,92 @@
+# ##### BEGIN GPL LICENSE BLOCK #####
+#
+#  This program is free software; you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation; either version 3
+#  of the License, or (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program; if not, write to the Free Software Foundation,
+#  Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+#
+# ##### END GPL LICENSE BLOCK #####
+
+# Spherical Voronoi cells of sun directions, for "Voronoi" blinds (no boolean modifiers).
+# The cell of a sun is the part of the sphere that is closer (in angle) to the sun's direction than to any other sun's
+# direction. Each cell is found in the tangent plane at its sun's direction (gnomonic projection, where great circles
+# are straight lines), by clipping a cap polygon with the half-planes of the great circles halfway to the other suns.
+# The cap limits cells of suns without neighbors on some side (e.g. rigs with 1 or 2 suns) to just under 90 degrees.
+
+import math
+import numpy as np
+
+SPHERICAL_CELL_CAP_ANGLE = math.radians(89.0)
+SPHERICAL_CELL_CAP_SEGMENTS = 32
+
+# clip convex polygon (list of (x, y), counter-clockwise) by half-plane a*x + b*y + c >= 0 (Sutherland-Hodgman)
+def clip_polygon_half_plane(poly, a, b, c):
+    clipped = []
+    for k in range(len(poly)):
+        p = poly[k]
+        q = poly[(k+1) % len(poly)]
+        p_val = a * p[0] + b * p[1] + c
+        q_val = a * q[0] + b * q[1] + c
+        if p_val >= 0:
+            clipped.append(p)
+        # edge crosses the half-plane's line, so add crossing point
+        if (p_val >= 0) != (q_val >= 0):
+            t = p_val / (p_val - q_val)
+            clipped.append((p[0] + t * (q[0] - p[0]), p[1] + t * (q[1] - p[1])))
+    return clipped
+
+# orthonormal basis (u, v) of tangent plane at unit direction d, with u cross v = d
+def get_tangent_basis(d):
+    helper = np.array((1.0, 0.0, 0.0)) if abs(d[0]) < 0.9 else np.array((0.0, 1.0, 0.0))
+    axis_u = np.cross(helper, d)
+    axis_u /= np.linalg.norm(axis_u)
+    axis_v = np.cross(d, axis_u)
+    return axis_u, axis_v
+
+# Spherical Voronoi cell of each direction (directions shaped (N, 3)), capped at cap_angle from the direction.
+# Returns list of arrays of cell vertex directions (unit vectors, counter-clockwise seen from outside the sphere).
+def get_spherical_voronoi_cells(dirs, cap_angle=SPHERICAL_CELL_CAP_ANGLE, cap_segments=SPHERICAL_CELL_CAP_SEGMENTS):
+    dirs = np.asarray(dirs, dtype=np.float64)
+    dirs = dirs / np.linalg.norm(dirs, axis=1)[:, None]
+    cap_radius = math.tan(cap_angle)
+    cap_poly = [ (cap_radius * math.cos(2 * math.pi * k / cap_segments),
+        cap_radius * math.sin(2 * math.pi * k / cap_segments)) for k in range(cap_segments) ]
+    cells = []
+    for i in range(len(dirs)):
+        d = dirs[i]
+        axis_u, axis_v = get_tangent_basis(d)
+        # tangent plane point (x, y) is direction d + x*u + y*v, and it is in the cell of d (not of e) if
+        # (d - e) . (d + x*u + y*v) >= 0
+        normals = d - np.delete(dirs, i, axis=0)
+        normals = normals[np.linalg.norm(normals, axis=1) > 1e-9]
+        half_planes = np.stack((normals @ axis_u, normals @ axis_v, normals @ d), axis=1).tolist()
+        poly = cap_poly
+        for a, b, c in half_planes:
+            poly = clip_polygon_half_plane(poly, a, b, c)
+            if len(poly) < 3:
+                break
+        if len(poly) < 3:
+            cells.append(np.empty((0, 3)))
+            continue
+        poly = np.array(poly)
+        cell = d + poly[:, 0:1] * axis_u + poly[:, 1:2] * axis_v
+        cells.append(cell / np.linalg.norm(cell, axis=1)[:, None])
+    return cells
+
+# Radial wall quads along the edges of spherical cell, from inner to outer radius, e.g. blinds around a sun's cell.
+# Returns (vertexes shaped (2 * num cell vertexes, 3), list of faces), inner vertexes first.
+def get_cell_wall_pydata(cell_dirs, inner_radius, outer_radius):
+    num_cell_verts = len(cell_dirs)
+    verts = np.concatenate((cell_dirs * inner_radius, cell_dirs * outer_radius))
+    faces = [ (k, (k+1) % num_cell_verts, num_cell_verts + (k+1) % num_cell_verts, num_cell_verts + k)
+        for k in range(num_cell_verts) ]
+    return verts, faces